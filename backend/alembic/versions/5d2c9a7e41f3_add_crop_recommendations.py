@@ -0,0 +1,38 @@
+"""add crop recommendations precompute table
+
+Revision ID: 5d2c9a7e41f3
+Revises: bf39c94b85f6
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c9a7e41f3'
+down_revision: Union[str, None] = 'bf39c94b85f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "crop_recommendations",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("cell", sa.String(), nullable=False),
+        sa.Column("season", sa.String(), nullable=False),
+        sa.Column("rotation", sa.String(), nullable=False, server_default=""),
+        sa.Column("latitude", sa.Float(), nullable=False),
+        sa.Column("longitude", sa.Float(), nullable=False),
+        sa.Column("recommendations", sa.JSON().with_variant(sa.Text(), "sqlite"), nullable=False),
+        sa.Column("weather_signature", sa.String(), nullable=True),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("cell", "season", "rotation", name="uq_crop_recommendations_key"),
+    )
+
+
+def downgrade():
+    op.drop_table("crop_recommendations")
@@ -2,9 +2,10 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
-import asyncio, httpx, json, re
+import asyncio, json, re, time
 
-from backend.app.config import get_settings
+from backend.app.services.gemini import agenerate
+from backend.app.services.streaming import emit_progress
 from backend.app.agents.tools import (
     WeatherArgs, SoilArgs, MarketArgs, SatelliteArgs, RagArgs,            # + RagArgs
     tool_weather, tool_soil, tool_market,  tool_satellite, tool_rag,     # + tool_rag
@@ -13,28 +14,11 @@ from backend.app.agents.tools import (
 
 
 # ---------------- Gemini caller (plain text, no MIME tricks) ----------------
+PLANNER_CONFIG = {"temperature": 0.1, "topP": 0.9, "maxOutputTokens": 512}
+
 async def _gemini_text_call(prompt: str, *, timeout: float = 15.0) -> str:
-    s = get_settings()
-    model = "gemini-2.5-flash"  # per request
-    endpoint = f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent"
-    params = {"key": s.gemini_api_key}
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.1,
-            "topP": 0.9,
-            "maxOutputTokens": 512
-        }
-    }
-    async with httpx.AsyncClient(timeout=timeout, headers=headers) as client:
-        r = await client.post(endpoint, params=params, json=payload)
-        r.raise_for_status()
-        data = r.json()
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
-    except Exception as e:
-        raise RuntimeError(f"planner LLM unexpected schema: {e}")
+    return await agenerate(prompt, model="gemini-2.5-flash", generation_config=PLANNER_CONFIG,
+                           timeout=timeout, purpose="planner")
 
 # --------------- Loose JSON extraction (fence or brace-scan) ----------------
 def _extract_json_loose(text: str) -> dict:
@@ -120,7 +104,17 @@ JSON only—no explanations.
 """
 
 # ----------------------------- Execute one step -----------------------------
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
 async def _run_tool(name: str, args: dict) -> Dict[str, Any] | List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    res = await _call_tool(name, args)
+    failed = isinstance(res, dict) and "error" in res
+    emit_progress(name or "tool", "error" if failed else "done", ms=_ms_since(t0))
+    return res
+
+async def _call_tool(name: str, args: dict) -> Dict[str, Any] | List[Dict[str, Any]]:
     try:
         if name == "weather":
             return await tool_weather(WeatherArgs(**args))
@@ -141,12 +135,15 @@ async def _run_tool(name: str, args: dict) -> Dict[str, Any] | List[Dict[str, An
 
 
 async def execute_one(state: AgentState) -> AgentState:
+    t0 = time.perf_counter()
     plan_text = await _gemini_text_call(planner_prompt(state), timeout=15.0)
     try:
         obj = _extract_json_loose(plan_text)
     except Exception as e:
         state.error = f"planner_parse_failed: {e}"
+        emit_progress("planner", "error", ms=_ms_since(t0))
         return state
+    emit_progress("planner", "done", ms=_ms_since(t0), action=obj.get("action"))
 
     if obj.get("action") == "final":
         state.final_answer = str(obj.get("answer") or "").strip()
@@ -274,17 +271,49 @@ def _summarize_steps(steps: List[Dict[str, Any]]) -> str:
                 parts.append("RAG: " + ", ".join(t for t in titles if t))
     return "; ".join(parts) if parts else "no tool data"
 
-async def _finalize_answer(state: AgentState) -> str:
-    # Use your existing prose caller (from crop_recommendation)
-    from backend.app.services.crop_recommendation import _gemini_call as gemini_call
+def finalize_prompt(state: AgentState) -> str:
     context = _summarize_steps(state.steps)
-    prompt = f"""You are KrishiMitra. The user asked: {state.question}
+    return f"""You are KrishiMitra. The user asked: {state.question}
 Use these tool results: {context}
 Answer concisely in {state.target_language}. If some data is missing, state assumptions briefly."""
-    # run in thread as it's sync httpx in your service
-    return await asyncio.wait_for(asyncio.to_thread(gemini_call, prompt), timeout=25.0)
+
+FINAL_CONFIG = {"temperature": 0.2}
+
+async def _finalize_answer(state: AgentState) -> str:
+    return await agenerate(finalize_prompt(state), generation_config=FINAL_CONFIG, timeout=25.0, purpose="agent_final")
 
 # ------------------------------- Public API --------------------------------
+SORRY = "Sorry, I couldn't complete the task."
+
+def new_state(
+    question: str,
+    *,
+    target_language: str = "en",
+    lat: float | None = None, lon: float | None = None,
+    district: str | None = None, commodity: str | None = None, mandi: str | None = None,
+    preferred_commodities: list[str] | None = None,
+    preferred_mandi: str | None = None,
+    max_steps: int = 3,
+) -> AgentState:
+    return AgentState(
+        question=question, target_language=target_language,
+        lat=lat, lon=lon, district=district, commodity=commodity, mandi=mandi,
+        preferred_commodities=preferred_commodities, preferred_mandi=preferred_mandi,
+        max_steps=max_steps,
+    )
+
+async def plan(state: AgentState) -> AgentState:
+    """
+    Planner/tool rounds until the planner answers directly, fails, or some tool
+    results exist. Then either state.final_answer is set, or state.steps should be
+    summarized (finalize_prompt), or state.error explains why there is nothing.
+    """
+    for _ in range(state.max_steps):
+        state = await execute_one(state)
+        if state.error or state.final_answer or state.steps:
+            break
+    return state
+
 async def run_agent_once(
     question: str,
     *,
@@ -295,42 +324,24 @@ async def run_agent_once(
     preferred_mandi: str | None = None,               # NEW
     max_steps: int = 3,
 ) -> Dict[str, Any]:
-    state = AgentState(
-        question=question, target_language=target_language,
+    state = await plan(new_state(
+        question, target_language=target_language,
         lat=lat, lon=lon, district=district, commodity=commodity, mandi=mandi,
         preferred_commodities=preferred_commodities, preferred_mandi=preferred_mandi,  # NEW
         max_steps=max_steps,
-    )
+    ))
 
-    for _ in range(state.max_steps):
-        state = await execute_one(state)
-        if state.error:
-            # graceful fallback: summarize whatever we have (if any), otherwise message
-            if state.steps:
-                try:
-                    ans = await _finalize_answer(state)
-                    return {"answer": ans, "used_steps": state.steps, "error": None}
-                except Exception:
-                    pass
-            return {"answer": "Sorry, I couldn't complete the task.", "used_steps": state.steps, "error": state.error}
-        if state.final_answer:
-            return {"answer": state.final_answer, "used_steps": state.steps, "error": None}
-
-        # After at least one tool step, try to finalize
-        if state.steps:
-            try:
-                ans = await _finalize_answer(state)
-                return {"answer": ans, "used_steps": state.steps, "error": None}
-            except Exception as e:
-                state.error = f"final_llm_failed: {e}"
-                return {"answer": "Sorry, I couldn't complete the task.", "used_steps": state.steps, "error": state.error}
-
-    # safety net
+    if state.final_answer and not state.error:
+        return {"answer": state.final_answer, "used_steps": state.steps, "error": None}
+
+    # summarize whatever tools returned, even when the planner failed afterwards
     if state.steps:
         try:
             ans = await _finalize_answer(state)
             return {"answer": ans, "used_steps": state.steps, "error": None}
         except Exception as e:
-            return {"answer": "Sorry, I couldn't complete the task.", "used_steps": state.steps, "error": f"final_llm_failed: {e}"}
+            return {"answer": SORRY, "used_steps": state.steps, "error": state.error or f"final_llm_failed: {e}"}
 
-    return {"answer": "Sorry, I couldn't complete the task.", "used_steps": [], "error": "no_steps"}
+    if state.error:
+        return {"answer": SORRY, "used_steps": state.steps, "error": state.error}
+    return {"answer": SORRY, "used_steps": [], "error": "no_steps"}
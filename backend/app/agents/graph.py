@@ -3,21 +3,22 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 from langgraph.graph import StateGraph, END
 import asyncio
+import time
 
 # Existing services (unchanged)
 from backend.app.services.weather import (
     get_weather, to_response_dict as wx_to_dict
 )
 from backend.app.services.soil import (
-    resilient_soil_fetcher, get_soil, to_response_dict as soil_to_dict
+    get_soil_async, to_response_dict as soil_to_dict
 )
 from backend.app.services.market import (
     fetch_prices, agmarknet_http_fetcher
 )
-from backend.app.services.crop_recommendation import (
-    recommend_top3_crops, _gemini_call as gemini_call
-)
+from backend.app.services.crop_recommendation import arecommend_top3_crops
+from backend.app.services.gemini import agenerate
 from backend.app.services.satellite import sentinel_summary  # NEW location
+from backend.app.services.streaming import emit_progress
 
 class AskState(BaseModel):
     question: str
@@ -44,9 +45,9 @@ async def _to_thread(func, *args, timeout: float = 20.0, **kwargs):
 async def _soil_with_retry(lat: float, lon: float, tries: int = 3, per_try_timeout: float = 12.0):
     for i in range(1, tries + 1):
         try:
-            raw = await _to_thread(resilient_soil_fetcher, lat, lon, timeout=per_try_timeout)
-            bundle = get_soil(lat, lon, lambda _a, _b: raw)
-            return soil_to_dict(bundle)
+            # runs on this loop; the timeout cancels any SoilGrids probes still in flight
+            resolved = await asyncio.wait_for(get_soil_async(lat, lon), timeout=per_try_timeout)
+            return soil_to_dict(resolved.bundle)
         except Exception:
             if i == tries:
                 return None
@@ -89,7 +90,9 @@ async def node_gather(state: AskState) -> AskState:
     async def t_recos():
         if state.lat is None or state.lon is None: return
         try:
-            state.recos = await _to_thread(recommend_top3_crops, lat=state.lat, lon=state.lon, rotation_history=None, timeout=GATHER_TIMEOUT_S)
+            state.recos = await asyncio.wait_for(
+                arecommend_top3_crops(lat=state.lat, lon=state.lon, rotation_history=None), timeout=GATHER_TIMEOUT_S
+            )
         except Exception:
             state.recos = None
 
@@ -100,32 +103,48 @@ async def node_gather(state: AskState) -> AskState:
         except Exception:
             state.sat = None
 
-    tasks.extend([t_weather(), t_soil(), t_market(), t_recos(), t_sat()])
+    async def reported(step: str, fn, field: str):
+        # progress for streamed answers; the t_* helpers swallow their own errors
+        t0 = time.perf_counter()
+        try:
+            await fn()
+        finally:
+            ok = getattr(state, field) is not None
+            emit_progress(step, "done" if ok else "unavailable", ms=round((time.perf_counter() - t0) * 1000, 1))
+
+    tasks.extend([
+        reported("weather", t_weather, "weather"),
+        reported("soil", t_soil, "soil"),
+        reported("market", t_market, "prices"),
+        reported("recos", t_recos, "recos"),
+        reported("satellite", t_sat, "sat"),
+    ])
     await asyncio.gather(*tasks, return_exceptions=True)
     return state
 
-async def node_llm(state: AskState) -> AskState:
-    try:
-        pieces = []
-        if state.weather:
-            pieces.append(f"Weather(now): {state.weather.get('current')}")
-            if state.weather.get("daily"):
-                d0 = state.weather["daily"][0]
-                rain0 = d0.get("rain_mm", d0.get("precip_mm"))
-                pieces.append(f"Weather(day1): tmax={d0.get('tmax_c')} tmin={d0.get('tmin_c')} rain={rain0}mm RH={d0.get('humidity_mean_pct')}")
-        if state.wx24:
-            pieces.append(f"Rain next 24h: {state.wx24.get('total_rain_next_24h_mm')} mm (max wind {state.wx24.get('max_wind_next_24h_kmh')} km/h)")
-        if state.soil and state.soil.get("topsoil"):
-            pieces.append(f"Soil(top): {state.soil['topsoil']}")
-        if state.sat:
-            pieces.append(f"Satellite: NDVI={state.sat.get('ndvi_mean')} NDMI={state.sat.get('ndmi_mean')} NDWI={state.sat.get('ndwi_mean')} LAI={state.sat.get('lai_mean')} ({state.sat.get('reliability')})")
-        if state.prices:
-            sample = [f"{p['commodity']}:{p['price']}" for p in state.prices[:5]]
-            pieces.append(f"Market: {sample}")
-        if state.recos:
-            pieces.append(f"Top crops: {state.recos}")
-
-        prompt = f"""You are KrishiMitra. Answer the farmer's question concisely.
+LLM_CONFIG = {"temperature": 0.2}
+
+def build_llm_prompt(state: AskState) -> str:
+    pieces = []
+    if state.weather:
+        pieces.append(f"Weather(now): {state.weather.get('current')}")
+        if state.weather.get("daily"):
+            d0 = state.weather["daily"][0]
+            rain0 = d0.get("rain_mm", d0.get("precip_mm"))
+            pieces.append(f"Weather(day1): tmax={d0.get('tmax_c')} tmin={d0.get('tmin_c')} rain={rain0}mm RH={d0.get('humidity_mean_pct')}")
+    if state.wx24:
+        pieces.append(f"Rain next 24h: {state.wx24.get('total_rain_next_24h_mm')} mm (max wind {state.wx24.get('max_wind_next_24h_kmh')} km/h)")
+    if state.soil and state.soil.get("topsoil"):
+        pieces.append(f"Soil(top): {state.soil['topsoil']}")
+    if state.sat:
+        pieces.append(f"Satellite: NDVI={state.sat.get('ndvi_mean')} NDMI={state.sat.get('ndmi_mean')} NDWI={state.sat.get('ndwi_mean')} LAI={state.sat.get('lai_mean')} ({state.sat.get('reliability')})")
+    if state.prices:
+        sample = [f"{p['commodity']}:{p['price']}" for p in state.prices[:5]]
+        pieces.append(f"Market: {sample}")
+    if state.recos:
+        pieces.append(f"Top crops: {state.recos}")
+
+    return f"""You are KrishiMitra. Answer the farmer's question concisely.
 Question: {state.question}
 
 Context (JSON-like):
@@ -136,7 +155,11 @@ Rules:
 - If some signals are missing, state assumptions briefly.
 Respond in {state.target_language}.
 """
-        text = await _to_thread(gemini_call, prompt, timeout=45.0)
+
+async def node_llm(state: AskState) -> AskState:
+    try:
+        prompt = build_llm_prompt(state)
+        text = await agenerate(prompt, generation_config=LLM_CONFIG, timeout=45.0, purpose="ai2")
         state.answer = text
     except Exception as e:
         state.error = f"llm failed: {e}"
@@ -44,15 +44,14 @@ async def tool_weather(args: WeatherArgs) -> Dict[str, Any]:
     return wx_to_dict(wb)
 
 # Soil
-from backend.app.services.soil import resilient_soil_fetcher, get_soil, to_response_dict as soil_to_dict
+from backend.app.services.soil import get_soil_async, to_response_dict as soil_to_dict
 
 async def tool_soil(args: SoilArgs) -> Dict[str, Any]:
     # quick retry 2x
     for i in range(2):
         try:
-            raw = await _to_thread(resilient_soil_fetcher, args.lat, args.lon, timeout=10.0)
-            bundle = get_soil(args.lat, args.lon, lambda _a, _b: raw)
-            return soil_to_dict(bundle)
+            resolved = await asyncio.wait_for(get_soil_async(args.lat, args.lon), timeout=10.0)
+            return soil_to_dict(resolved.bundle)
         except Exception:
             if i == 1:
                 raise
@@ -0,0 +1,135 @@
+# backend/app/jobs/precompute_recos.py
+"""
+Nightly precompute of crop recommendations into the crop_recommendations table:
+one LLM call per (weather-grid cell, current season, recent rotation) seen among
+registered farms (and optionally a CSV of district centroids, with no rotation),
+so /api/recos answers from the table instead of a live Gemini round-trip.
+
+    python -m backend.app.jobs.precompute_recos
+    python -m backend.app.jobs.precompute_recos --centroids districts.csv --concurrency 4
+    python -m backend.app.jobs.precompute_recos --force
+
+Rows that are still fresh (see services/reco_precompute.py) are skipped unless
+--force is given. The centroid CSV needs `lat` and `lon` columns.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from backend.app.jobs.prewarm_soil import centroid_points
+from backend.app.services import http_clients, reco_precompute
+from backend.app.services.crop_recommendation import season_of
+
+Target = Tuple[float, float, List[str]]     # lat, lon, rotation history (recent first)
+
+
+def farm_targets() -> List[Target]:
+    from sqlalchemy import select
+    from backend.app.db import session_scope
+    from backend.app.models.farms import Farm
+
+    with session_scope() as s:
+        rows = s.execute(
+            select(Farm.latitude, Farm.longitude, Farm.crop_rotation_history)
+            .where(Farm.latitude.is_not(None), Farm.longitude.is_not(None))
+        ).all()
+    return [(float(la), float(lo), [str(c) for c in rot or []]) for la, lo, rot in rows]
+
+def unique_targets(targets: Iterable[Target]) -> List[Target]:
+    """One representative per (cell, rotation) key (first one wins)."""
+    seen: Dict[Tuple[str, str], Target] = {}
+    for la, lo, rot in targets:
+        seen.setdefault((reco_precompute.cell_key(la, lo)[0], reco_precompute.rotation_key(rot)), (la, lo, rot))
+    return list(seen.values())
+
+
+@dataclass
+class PrecomputeReport:
+    season: str = ""
+    targets: int = 0
+    keys: int = 0
+    fresh: int = 0
+    computed: int = 0
+    failed: int = 0
+    elapsed_s: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        done = self.fresh + self.computed + self.failed
+        return {
+            "season": self.season,
+            "targets": self.targets,
+            "keys": self.keys,
+            "already_fresh": self.fresh,
+            "computed": self.computed,
+            "failed": self.failed,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "keys_per_s": round(done / self.elapsed_s, 2) if self.elapsed_s > 0 else None,
+            "sample_errors": self.errors[:5],
+        }
+
+
+async def precompute(targets: List[Target], *, concurrency: int = 4, force: bool = False) -> PrecomputeReport:
+    """
+    Compute and store recommendations for each unique key with at most
+    `concurrency` LLM calls in flight (the Gemini client caps the process as well).
+    """
+    season = season_of()
+    keys = unique_targets(targets)
+    rep = PrecomputeReport(season=season, targets=len(targets), keys=len(keys))
+    sem = asyncio.Semaphore(max(1, concurrency))
+    now = reco_precompute._utcnow()
+    t0 = time.perf_counter()
+
+    async def one(lat: float, lon: float, rot: List[str]) -> None:
+        if not force:
+            cell, _, _ = reco_precompute.cell_key(lat, lon)
+            try:
+                row = await asyncio.to_thread(reco_precompute.load, cell, season, reco_precompute.rotation_key(rot))
+            except Exception:
+                row = None
+            if row is not None and row["recommendations"] and reco_precompute.classify(
+                row["computed_at"], row["weather_signature"], now=now
+            ) == "fresh":
+                rep.fresh += 1
+                return
+        async with sem:
+            try:
+                await reco_precompute.compute_and_store(lat, lon, rot)
+                rep.computed += 1
+            except Exception as e:
+                rep.failed += 1
+                rep.errors.append(f"({lat:.4f},{lon:.4f},{'|'.join(rot)}): {e}")
+
+    await asyncio.gather(*(one(la, lo, rot) for la, lo, rot in keys))
+    rep.elapsed_s = time.perf_counter() - t0
+    return rep
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute crop recommendations per weather cell and season")
+    parser.add_argument("--centroids", type=str, default=None, help="CSV with lat,lon columns (district centroids)")
+    parser.add_argument("--no-farms", action="store_true", help="skip the farms table")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="recompute rows that are still fresh")
+    args = parser.parse_args()
+
+    tgts: List[Target] = []
+    if not args.no_farms:
+        tgts.extend(farm_targets())
+    if args.centroids:
+        tgts.extend((la, lo, []) for la, lo in centroid_points(args.centroids))
+
+    async def main() -> PrecomputeReport:
+        try:
+            return await precompute(tgts, concurrency=args.concurrency, force=args.force)
+        finally:
+            await http_clients.shutdown()
+
+    report = asyncio.run(main())
+    print(json.dumps({"precompute": report.as_dict(), "table": reco_precompute.stats()}, indent=2))
@@ -0,0 +1,157 @@
+# backend/app/jobs/prewarm_soil.py
+"""
+Pre-warm the persistent soil store for every registered farm (and optionally a
+CSV of district centroids) so interactive /api/soil and crop recommendation
+calls hit warm cells instead of cold SoilGrids ring probes.
+
+    python -m backend.app.jobs.prewarm_soil
+    python -m backend.app.jobs.prewarm_soil --centroids districts.csv --concurrency 4
+    python -m backend.app.jobs.prewarm_soil --no-farms --centroids districts.csv
+
+The centroid CSV needs `lat` and `lon` columns (anything else is ignored).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.app.services import http_clients
+from backend.app.services.soil import get_soil_async
+from backend.app.services import soil_store
+from backend.app.services.soil_store import SoilStore, cell_of, get_store, set_store
+
+Point = Tuple[float, float]
+
+
+def farm_points() -> List[Point]:
+    from sqlalchemy import select
+    from backend.app.db import session_scope
+    from backend.app.models.farms import Farm
+
+    with session_scope() as s:
+        rows = s.execute(
+            select(Farm.latitude, Farm.longitude).where(Farm.latitude.is_not(None), Farm.longitude.is_not(None))
+        ).all()
+    return [(float(la), float(lo)) for la, lo in rows]
+
+def centroid_points(path: str) -> List[Point]:
+    out: List[Point] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                out.append((float(row["lat"]), float(row["lon"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return out
+
+def unique_cells(points: Iterable[Point]) -> List[Point]:
+    """One representative point per soil cell (first one wins)."""
+    seen: Dict[Tuple[int, int], Point] = {}
+    for la, lo in points:
+        seen.setdefault(cell_of(la, lo), (la, lo))
+    return list(seen.values())
+
+
+@dataclass
+class PrewarmReport:
+    points: int = 0
+    cells: int = 0
+    warm: int = 0
+    local: int = 0          # resolved from the store / a stored neighbour, no upstream call
+    fetched: int = 0        # needed at least one SoilGrids request
+    negative: int = 0       # of all cells: known to have no data of their own
+    failed: int = 0
+    elapsed_s: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        done = self.warm + self.local + self.fetched + self.failed
+        return {
+            "points": self.points,
+            "cells": self.cells,
+            "already_warm": self.warm,
+            "resolved_locally": self.local,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "negative": self.negative,
+            "hit_ratio": round((self.warm + self.local) / done, 3) if done else None,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "cells_per_s": round(done / self.elapsed_s, 2) if self.elapsed_s > 0 else None,
+            "sample_errors": self.errors[:5],
+        }
+
+
+async def prewarm(points: List[Point], *, concurrency: int = 8, store: Optional[SoilStore] = None) -> PrewarmReport:
+    """
+    Resolve soil for each unique cell with at most `concurrency` lookups in flight.
+    Cells already holding data count as hits and cost nothing. Other cells are
+    resolved; only lookups that reached SoilGrids count as fetched (a negative
+    cell answered by a stored neighbour is resolved locally).
+    `store` is installed as the process-wide store for the run (get_soil_async
+    reads and writes only that one), then the previous store is put back.
+    """
+    if store is not None:
+        previous = soil_store._STORE
+        set_store(store)
+        try:
+            return await prewarm(points, concurrency=concurrency)
+        finally:
+            set_store(previous)
+    store = get_store()
+    cells = unique_cells(points)
+    rep = PrewarmReport(points=len(points), cells=len(cells))
+    sem = asyncio.Semaphore(max(1, concurrency))
+    t0 = time.perf_counter()
+
+    async def one(lat: float, lon: float) -> None:
+        known = store.lookup(lat, lon)
+        if known is not None and known.has_data:
+            rep.warm += 1
+            return
+        if known is not None:
+            rep.negative += 1
+        async with sem:
+            try:
+                res = await get_soil_async(lat, lon)
+                if res.probe_count > 0:
+                    rep.fetched += 1
+                else:
+                    rep.local += 1
+            except Exception as e:
+                rep.failed += 1
+                rep.errors.append(f"({lat:.4f},{lon:.4f}): {e}")
+
+    await asyncio.gather(*(one(la, lo) for la, lo in cells))
+    rep.elapsed_s = time.perf_counter() - t0
+    return rep
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the SoilGrids cell store")
+    parser.add_argument("--centroids", type=str, default=None, help="CSV with lat,lon columns (district centroids)")
+    parser.add_argument("--no-farms", action="store_true", help="skip the farms table")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--store", type=str, default=None, help="SQLite file (defaults to KM_SOIL_STORE_PATH)")
+    args = parser.parse_args()
+
+    store = SoilStore(args.store) if args.store else get_store()
+
+    pts: List[Point] = []
+    if not args.no_farms:
+        pts.extend(farm_points())
+    if args.centroids:
+        pts.extend(centroid_points(args.centroids))
+
+    async def main() -> PrewarmReport:
+        try:
+            return await prewarm(pts, concurrency=args.concurrency, store=store)
+        finally:
+            await http_clients.shutdown()
+
+    report = asyncio.run(main())
+    print(json.dumps({"prewarm": report.as_dict(), "store": store.stats()}, indent=2))
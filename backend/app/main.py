@@ -1,6 +1,9 @@
 # backend/app/main.py
+import sys
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from backend.app.config import get_settings
 from backend.app.routers.users import router as users_router
@@ -16,6 +19,21 @@ from backend.app.routers.ai_graph import router as ai_graph_router
 from backend.app.routers.ai_agentic import router as ai_agent_router
 from backend.app.routers.rag import router as rag_router
 from backend.app.routers.market_meta import router as market_meta_router
+from backend.app.services import http_clients
+from backend.app.services.model_registry import REGISTRY as MODELS
+from backend.app.services.vision.vit_disease import VIT_BATCHER
+from backend.app.services.vision.diagnosis_cache import DIAGNOSIS_CACHE
+from backend.app.services.vision.diagnosis_templates import TEMPLATES as DIAGNOSIS_TEMPLATES
+from backend.app.services.weather import WEATHER_CACHE
+from backend.app.services.soil_store import get_store as get_soil_store
+from backend.app.services.soil import PROBE_TOTALS as SOIL_PROBES
+from backend.app.services.price_forecast import forecast_cache_stats
+from backend.app.rag.embedding_cache import embedding_cache_stats
+from backend.app.services.streaming import STREAM_STATS
+from backend.app.services.gemini import llm_stats
+from backend.app.services.structured import structured_stats
+from backend.app.services.llm_cache import LLM_CACHE
+from backend.app.services import reco_precompute
 
 
 
@@ -24,6 +42,7 @@ load_dotenv()
 
 from backend.app.db import Base  # wherever your declarative_base() lives
 from backend.app.db import engine  # your SQLAlchemy engine factory
+from backend.app.models import crop_recommendations as _crop_recommendations  # noqa: F401  (table for create_all)
 
 APP_NAME = "KrishiMitra API"
 APP_VERSION = "0.0.1"
@@ -47,6 +66,44 @@ def create_app() -> FastAPI:
         if db_url.startswith("sqlite:///"):
             Base.metadata.create_all(bind=engine)
 
+    # pooled upstream HTTP clients (open-meteo, soilgrids, agmarknet, gemini)
+    @app.on_event("startup")
+    def _start_http_clients():
+        http_clients.startup()
+
+    @app.on_event("shutdown")
+    async def _close_http_clients():
+        await http_clients.shutdown()
+
+    # price forecast + ViT models (KM_MODEL_LOAD_MODE=eager|background|lazy)
+    @app.on_event("startup")
+    def _load_models():
+        MODELS.start()
+
+    @app.on_event("shutdown")
+    def _stop_vit_batcher():
+        VIT_BATCHER.stop()
+
+    @app.on_event("shutdown")
+    def _stop_model_retries():
+        MODELS.stop()
+
+    # RAG index: re-sync in the background when seed files change (KM_RAG_WATCH_S, 0 = off)
+    @app.on_event("startup")
+    def _start_rag_watcher():
+        try:
+            from backend.app.rag.index import MANAGER as RAG_INDEX
+        except ImportError as e:
+            print(f"[rag-index] watcher not started: {e}")
+            return
+        RAG_INDEX.start_watcher()
+
+    @app.on_event("shutdown")
+    def _stop_rag_watcher():
+        mod = sys.modules.get("backend.app.rag.index")
+        if mod is not None:
+            mod.MANAGER.stop_watcher()
+
     @app.get("/", tags=["system"])
     def root():
         return {"name": APP_NAME, "version": APP_VERSION, "status": "ok"}
@@ -55,6 +112,42 @@ def create_app() -> FastAPI:
     def health():
         return {"status": "healthy"}
 
+    @app.get("/health/http", tags=["system"])
+    def health_http():
+        return http_clients.pool_stats()
+
+    @app.get("/health/models", tags=["system"])
+    def health_models():
+        # 503 until every required model is loaded and warmed, so load balancers hold traffic;
+        # optional models (price forecaster) only show up under "degraded"
+        status = MODELS.status()
+        status["vit_batcher"] = VIT_BATCHER.stats()
+        return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+    @app.get("/health/caches", tags=["system"])
+    def health_caches():
+        return {
+            "weather": WEATHER_CACHE.stats(),
+            "soil": get_soil_store().stats(),
+            "soil_probes": SOIL_PROBES.snapshot(),
+            "forecast": forecast_cache_stats(),
+            "diagnosis": DIAGNOSIS_CACHE.stats(),
+            "diagnosis_templates": DIAGNOSIS_TEMPLATES.stats(),
+            "embeddings": embedding_cache_stats(),
+            "llm": LLM_CACHE.stats(),
+            "crop_recommendations": reco_precompute.stats(),
+        }
+
+    @app.get("/health/llm", tags=["system"])
+    def health_llm():
+        # per-purpose calls/latency/tokens, plus JSON parse outcomes (repair rate) for structured calls
+        return {**llm_stats(), "structured": structured_stats()}
+
+    @app.get("/health/streams", tags=["system"])
+    def health_streams():
+        # time to first answer token per streaming endpoint (/api/*/ask/stream, /api/rag/answer/stream)
+        return STREAM_STATS.snapshot()
+
     @app.get("/version", tags=["system"])
     def version():
         return {"version": APP_VERSION}
@@ -0,0 +1,35 @@
+# backend/app/models/crop_recommendations.py
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Float, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.app.db import Base
+
+
+class CropRecommendation(Base):
+    """
+    Precomputed top-3 crops for one weather-grid cell, sowing season and
+    (normalized) rotation history. Written by jobs/precompute_recos.py and by
+    live fallbacks; read by the recommendations endpoint.
+    """
+    __tablename__ = "crop_recommendations"
+    __table_args__ = (UniqueConstraint("cell", "season", "rotation", name="uq_crop_recommendations_key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    cell: Mapped[str] = mapped_column(String, nullable=False)          # "<grid>:<lat_idx>:<lon_idx>"
+    season: Mapped[str] = mapped_column(String, nullable=False)        # e.g. "rabi-2025"
+    rotation: Mapped[str] = mapped_column(String, nullable=False, default="")   # "rice|wheat" (recent first)
+    latitude: Mapped[float] = mapped_column(Float, nullable=False)     # cell centre the LLM was asked about
+    longitude: Mapped[float] = mapped_column(Float, nullable=False)
+
+    recommendations: Mapped[list] = mapped_column(SQLITE_JSON, nullable=False, default=list)  # [{crop, probability}]
+    weather_signature: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<CropRecommendation cell={self.cell} season={self.season} rotation={self.rotation!r}>"
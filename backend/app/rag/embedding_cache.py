@@ -0,0 +1,185 @@
+# backend/app/rag/embedding_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.app.services.cache import TTLCache
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:     # the cache itself only needs numpy + sqlite
+    _EmbeddingsBase = object
+
+# -----------------------------------------------------------------------------
+# Content-addressed embedding cache shared by ingestion and queries.
+# Key = sha256(model, text); value = float32 vector in SQLite (WAL, one
+# connection per thread, so uvicorn workers and the ingestion CLI can share
+# the file). Misses are deduplicated and embedded in batches; repeated
+# queries are also answered from a small in-process LRU.
+# -----------------------------------------------------------------------------
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]    # .../backend
+ENABLED = os.getenv("KM_EMBED_CACHE", "1").strip().lower() not in ("0", "false", "no")
+CACHE_PATH = os.getenv("KM_EMBED_CACHE_PATH", str(BACKEND_DIR / "cache" / "embeddings.sqlite"))
+BATCH_SIZE = int(os.getenv("KM_EMBED_BATCH", "128"))
+QUERY_MEMO_SIZE = int(os.getenv("KM_EMBED_QUERY_MEMO", "2048"))
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {}
+        conn = self._conn()
+        for i in range(0, len(keys), 500):          # stay under SQLite's bound-parameter limit
+            part = keys[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for k, blob in rows:
+                out[k] = np.frombuffer(blob, dtype=np.float32)
+        return out
+
+    def put_many(self, items: Iterable[tuple]) -> None:
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, dim, vec) VALUES (?, ?, ?)",
+            [(k, int(v.shape[0]), np.asarray(v, dtype=np.float32).tobytes()) for k, v in items],
+        )
+        conn.commit()
+
+    def __len__(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+
+
+class CachedEmbeddings(_EmbeddingsBase):
+    """Drop-in LangChain Embeddings wrapper (embed_documents / embed_query)."""
+
+    def __init__(
+        self,
+        inner,
+        model: str,
+        store: Optional[EmbeddingStore] = None,
+        *,
+        batch_size: int = BATCH_SIZE,
+        query_memo_size: int = QUERY_MEMO_SIZE,
+    ):
+        self.inner = inner
+        self.model = model
+        self.store = store if store is not None else EmbeddingStore()
+        self.batch_size = max(1, batch_size)
+        self._memo: TTLCache[np.ndarray] = TTLCache(maxsize=query_memo_size, default_ttl_s=float("inf"))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+
+    def _count(self, hits: int, misses: int, calls: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.api_calls += calls
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model, t) for t in texts]
+        found = self.store.get_many(list(dict.fromkeys(keys)))
+        todo: Dict[str, str] = {}            # key -> text, first occurrence only
+        for k, t in zip(keys, texts):
+            if k not in found:
+                todo.setdefault(k, t)
+        pending = list(todo.items())
+        for i in range(0, len(pending), self.batch_size):
+            part = pending[i:i + self.batch_size]
+            vecs = self.inner.embed_documents([t for _, t in part])
+            fresh = [(k, np.asarray(v, dtype=np.float32)) for (k, _), v in zip(part, vecs)]
+            self.store.put_many(fresh)
+            found.update(fresh)
+        self._count(len(texts) - len(pending), len(pending), -(-len(pending) // self.batch_size))
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        k = embedding_key(self.model, text)
+        v = self._memo.get(k)
+        if v is None:
+            v = self.store.get_many([k]).get(k)
+            if v is None:
+                v = np.asarray(self.inner.embed_query(text), dtype=np.float32)
+                self.store.put_many([(k, v)])
+                self._count(0, 1, 1)
+            else:
+                self._count(1, 0, 0)
+            self._memo.set(k, v)
+        else:
+            self._count(1, 0, 0)
+        return v.tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.hits + self.misses
+            return {
+                "model": self.model,
+                "path": self.store.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "api_calls": self.api_calls,
+                "hit_ratio": round(self.hits / n, 3) if n else None,
+                "query_memo_size": len(self._memo),
+            }
+
+
+_BY_MODEL: Dict[str, CachedEmbeddings] = {}
+_EMBEDDERS: Dict[str, Any] = {}
+_EMBEDDERS_LOCK = threading.Lock()
+
+
+def cached(inner, model: str):
+    """Wrap `inner` unless KM_EMBED_CACHE=0; instances are listed in embedding_cache_stats()."""
+    if not ENABLED:
+        return inner
+    emb = CachedEmbeddings(inner, model)
+    _BY_MODEL[model] = emb
+    return emb
+
+
+def get_embeddings(model: str):
+    """One OpenAIEmbeddings(model) per process, behind the cache (used by Chroma and the local index)."""
+    with _EMBEDDERS_LOCK:
+        emb = _EMBEDDERS.get(model)
+        if emb is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            emb = cached(OpenAIEmbeddings(model=model, api_key=os.getenv("OPENAI_API_KEY")), model)
+            _EMBEDDERS[model] = emb
+        return emb
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    return {"enabled": ENABLED, "models": {m: e.stats() for m, e in _BY_MODEL.items()}}
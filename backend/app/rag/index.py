@@ -1,14 +1,17 @@
 # backend/app/rag/index.py
-import os, json, hashlib
+import os, json, time, hashlib, threading, uuid
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from langchain.docstore.document import Document
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 
+from backend.app.rag.embedding_cache import get_embeddings
+from backend.app.rag import local_index
+from backend.app.rag.loader import CHUNK_OVERLAP, CHUNK_SIZE, SEED_EXTS, iter_parsed
+from backend.app.rag.manifest import FileEntry, Manifest, file_sha256
+
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -25,10 +28,8 @@ HERE = Path(__file__).resolve()
 BACKEND_DIR = HERE.parents[2]                     # .../backend
 SEEDS_DIR = BACKEND_DIR / "ingestion" / "seeds"
 PERSIST_DIR = BACKEND_DIR / "chroma"
-META_PATH = PERSIST_DIR / ".build_meta.json"
 
 EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 
 # add near the top:
@@ -39,121 +40,341 @@ CHROMA_SETTINGS = Settings(
     allow_reset=True
 )
 
-# singletons
-_DB: Chroma | None = None
-_EMB: OpenAIEmbeddings | None = None
+COLLECTION = "krishi_rag"
+# chunks per add_documents call, so one huge PDF never becomes one giant request
+EMBED_BATCH = int(os.getenv("KM_RAG_EMBED_BATCH", "256"))
+MANIFEST_PATH = PERSIST_DIR / ".ingest_manifest.json"
+STAGING_MANIFEST_PATH = PERSIST_DIR / ".ingest_manifest.building.json"
+# replaced collections waiting to be dropped: {name: drop-after epoch seconds}
+RETIRED_PATH = PERSIST_DIR / ".retired_collections.json"
+# cross-process lock serializing syncs (and drops) across workers / the CLI
+SYNC_LOCK_PATH = PERSIST_DIR / ".sync.lock"
+# seconds between seed-directory checks by the background watcher; 0 = only sync on first use
+WATCH_INTERVAL_S = float(os.getenv("KM_RAG_WATCH_S", "300"))
+# a replaced collection stays readable this long, so other workers (which only
+# notice the swap on their watcher tick) never query a dropped collection
+RETIRE_GRACE_S = max(float(os.getenv("KM_RAG_RETIRE_GRACE_S", "60")), 2 * WATCH_INTERVAL_S)
+
+
+class IndexManager:
+    """
+    Owns this process's Chroma handle.
+      get()      lock-free once open; the first caller opens + syncs under a lock
+                 while concurrent first callers wait for that one result
+      refresh()  incremental sync in place (a file's new chunks are added before
+                 its old ones are deleted); a full rebuild goes into a fresh
+                 collection and is swapped in with one reference assignment, so
+                 readers never block and never see a half-built index
+      watcher    daemon thread that stats the seed files every WATCH_INTERVAL_S
+                 and refreshes only when something changed, or when another
+                 worker/process synced (the manifest signature moved), so every
+                 worker follows a swapped collection / re-exported local index
+    Syncs run under a cross-process file lock, so N workers starting on a
+    changed manifest embed once; the others wait and find it up to date.
+    A replaced collection is recorded in RETIRED_PATH and dropped by whichever
+    process syncs or ticks after RETIRE_GRACE_S (also when the CLI rebuilt it
+    and exited long before).
+    """
+
+    def __init__(self):
+        self._db: Optional[Chroma] = None
+        self._name: Optional[str] = None
+        self._open_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._seen_fp: Optional[str] = None
+        self._seen_sig: Optional[str] = None     # manifest signature after our last sync
+        self.syncs = 0
+        self.last_sync: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    def get(self) -> Chroma:
+        db = self._db
+        if db is not None:
+            return db
+        with self._open_lock:
+            if self._db is None:
+                self.refresh()
+            return self._db
+
+    def refresh(self, rebuild: bool = False) -> Dict[str, Any]:
+        with self._sync_lock, sync_lock():
+            fp = _stat_fingerprint()     # taken first: edits made during the sync show up next tick
+            db, name, report, retired = _sync(self._db, self._name, rebuild)
+            self._db, self._name = db, name
+            self._seen_fp = fp
+            self._seen_sig = manifest_signature()
+            self.syncs += 1
+            self.last_sync = {k: v for k, v in report.items() if k != "files"}
+            if retired and retired != name:
+                retire_collection(retired)
+            drop_retired()
+        if report["embedded_chunks"] or report["deleted_chunks"]:
+            print(f"🧱 RAG index synced: +{report['embedded_chunks']} / -{report['deleted_chunks']} chunks "
+                  f"({report['total_chunks']} total, collection={name}) in {report['seconds']}s")
+        else:
+            print(f"📦 RAG index loaded from {PERSIST_DIR} ({report['total_chunks']} chunks)")
+        if local_index.RAG_BACKEND == "local":
+            out = local_index.export_if_stale()
+            if out is not None:
+                print(f"🧮 Local RAG index exported: {out['count']} x {out['dim']} → {out['path']}")
+            local_index.get_local_index()       # swap in whichever export is current
+        return report
+
+    def stale(self) -> bool:
+        """Seeds changed on disk, or another manager synced since we last did."""
+        return _stat_fingerprint() != self._seen_fp or manifest_signature() != self._seen_sig
+
+    # ---- watcher ----
+    def start_watcher(self, interval_s: float = WATCH_INTERVAL_S) -> None:
+        if interval_s <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval_s,), name="rag-index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout)
+            self._watcher = None
+
+    def _watch(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                # nothing has opened Chroma yet: the first get() syncs anyway. The
+                # local backend may never open it, so the watcher does it there.
+                if self._db is None and local_index.RAG_BACKEND != "local":
+                    continue
+                if self.stale():
+                    if self._db is None:
+                        self.get()
+                    else:
+                        self.refresh()
+                elif _load_retired():
+                    with sync_lock():
+                        drop_retired()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[rag-index] background sync failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "open": self._db is not None,
+            "collection": self._name,
+            "watch_interval_s": WATCH_INTERVAL_S,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "syncs": self.syncs,
+            "retired_pending": sorted(_load_retired()),
+            "last_sync": self.last_sync,
+            "last_error": self.last_error,
+        }
+
+
+MANAGER = IndexManager()
+
 
 def build_or_load_index(rebuild: bool = False) -> Chroma:
     """
-    Build once, then reuse the same Chroma instance (and embeddings) in-process.
-    Rebuild only if seeds changed or rebuild=True.
+    The process-wide Chroma instance (opened and synced once; see IndexManager).
+    rebuild=True re-embeds everything into a new collection and swaps it in.
     """
-    global _DB, _EMB
+    if rebuild:
+        MANAGER.refresh(rebuild=True)
+    return MANAGER.get()
 
-    if _DB is not None and not rebuild:
-        return _DB
+def sync_index(rebuild: bool = False) -> Dict[str, Any]:
+    """Sync now (normally the watcher does this); returns the per-file report."""
+    return MANAGER.refresh(rebuild=rebuild)
 
+def _open_db(name: str = COLLECTION) -> Chroma:
     PERSIST_DIR.mkdir(parents=True, exist_ok=True)
-    if _EMB is None:
-        _EMB = OpenAIEmbeddings(model=EMBED_MODEL, api_key=OPENAI_API_KEY)
-
-    if _need_rebuild(rebuild):
-        docs = load_corpus()
-        _DB = Chroma.from_documents(
-            docs,
-            _EMB,
-            collection_name="krishi_rag",
-            persist_directory=str(PERSIST_DIR),
-            collection_metadata={"hnsw:space": "cosine"},
-            client_settings=CHROMA_SETTINGS,     # <- important
-        )
-        _save_meta()
-        print(f"🧱 RAG index built: {len(docs)} chunks → {PERSIST_DIR}")
-    else:
-        _DB = Chroma(
-            embedding_function=_EMB,
-            collection_name="krishi_rag",
-            persist_directory=str(PERSIST_DIR),
-            client_settings=CHROMA_SETTINGS,     # <- important
-        )
-        print(f"📦 RAG index loaded from {PERSIST_DIR}")
+    return Chroma(
+        embedding_function=get_embeddings(EMBED_MODEL),
+        collection_name=name,
+        persist_directory=str(PERSIST_DIR),
+        collection_metadata={"hnsw:space": "cosine"},
+        client_settings=CHROMA_SETTINGS,     # <- important
+    )
+
+@contextmanager
+def sync_lock():
+    """Cross-process lock (fcntl) around index syncs; no-op where fcntl is missing."""
+    try:
+        import fcntl
+    except ImportError:         # Windows: only the in-process lock applies
+        yield
+        return
+    PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    with open(SYNC_LOCK_PATH, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
-    return _DB
+def _load_retired() -> Dict[str, float]:
+    try:
+        return {str(k): float(v) for k, v in json.loads(RETIRED_PATH.read_text(encoding="utf-8")).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def _save_retired(retired: Dict[str, float]) -> None:
+    if not retired:
+        RETIRED_PATH.unlink(missing_ok=True)
+        return
+    tmp = RETIRED_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(retired, indent=2), encoding="utf-8")
+    os.replace(tmp, RETIRED_PATH)
+
+def retire_collection(name: str, grace_s: float = RETIRE_GRACE_S) -> None:
+    """Schedule `name` to be dropped after grace_s (call under sync_lock())."""
+    retired = _load_retired()
+    retired[name] = time.time() + grace_s
+    _save_retired(retired)
+
+def drop_retired(now: Optional[float] = None) -> List[str]:
+    """Drop retired collections whose grace period is over (call under sync_lock())."""
+    now = time.time() if now is None else now
+    retired = _load_retired()
+    dropped = []
+    for name, due in sorted(retired.items()):
+        if due > now:
+            continue
+        try:
+            _open_db(name).delete_collection()
+        except Exception as e:
+            print(f"[rag-index] could not drop old collection {name}: {e}")
+            continue
+        del retired[name]
+        dropped.append(name)
+    if dropped:
+        _save_retired(retired)
+    return dropped
 
 def _find_seed_files() -> List[Path]:
     SEEDS_DIR.mkdir(parents=True, exist_ok=True)
-    return [p for p in SEEDS_DIR.rglob("*") if p.suffix.lower() in {".pdf",".txt",".md"} and p.stat().st_size > 0]
+    return [p for p in SEEDS_DIR.rglob("*") if p.suffix.lower() in SEED_EXTS and p.stat().st_size > 0]
+
+def _seed_key(path: Path) -> str:
+    return path.relative_to(SEEDS_DIR).as_posix()
 
-def _fingerprint(files: List[Path]) -> str:
+def _stat_fingerprint() -> str:
+    # cheap change detector for the watcher (names + sizes + mtimes, no reads)
     h = hashlib.sha256()
-    for p in sorted(files, key=lambda x: x.as_posix()):
+    for p in sorted(_find_seed_files(), key=lambda x: x.as_posix()):
         st = p.stat()
-        h.update(p.name.encode())
-        h.update(str(st.st_size).encode())
-        h.update(str(int(st.st_mtime)).encode())
+        h.update(f"{_seed_key(p)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
     return h.hexdigest()
 
-def _load_one(path: Path) -> List[Document]:
-    if path.suffix.lower() == ".pdf":
-        loader = PyPDFLoader(str(path))
-        pages = loader.load()
-        for d in pages:
-            d.metadata["source"] = path.name
-            d.metadata.setdefault("title", path.stem.replace("_"," ").title())
-        return pages
-    else:
-        loader = TextLoader(str(path), encoding="utf-8")
-        docs = loader.load()
-        for d in docs:
-            d.metadata["source"] = path.name
-            d.metadata.setdefault("title", path.stem.replace("_"," ").title())
-        return docs
+def manifest_signature() -> str | None:
+    """Content hash of the ingestion manifest; changes whenever the collection does."""
+    return file_sha256(MANIFEST_PATH) if MANIFEST_PATH.exists() else None
 
-def load_corpus() -> List[Document]:
+def _manifest_settings() -> Dict[str, Any]:
+    # any change here invalidates every stored chunk -> full rebuild
+    return {"collection": COLLECTION, "embed_model": EMBED_MODEL, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+def iter_corpus() -> Iterator[Document]:
+    """Every chunk of every seed file, parsed in the worker pool and streamed file by file."""
     files = _find_seed_files()
     if not files:
         raise RuntimeError(f"No seed files found in {SEEDS_DIR}. Put PDFs/TXT there first.")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=["\n\n","\n"," ",""])
-    docs: List[Document] = []
-    for f in files:
-        docs.extend(_load_one(f))
-    return splitter.split_documents(docs)
+    jobs = [(_seed_key(p), str(p), file_sha256(p)) for p in files]
+    for parsed in iter_parsed(jobs):
+        yield from parsed.docs
 
-def _need_rebuild(force: bool) -> bool:
-    files = _find_seed_files()
-    fp = _fingerprint(files)
-    if force or not PERSIST_DIR.exists() or not META_PATH.exists():
-        return True
-    try:
-        meta = json.loads(META_PATH.read_text())
-        return meta.get("fingerprint") != fp
-    except Exception:
-        return True
+def load_corpus() -> List[Document]:
+    return list(iter_corpus())
 
-def _save_meta():
-    files = _find_seed_files()
-    META_PATH.parent.mkdir(parents=True, exist_ok=True)
-    META_PATH.write_text(json.dumps({"fingerprint": _fingerprint(files)}, indent=2))
+def _sync(
+    current: Optional[Chroma], current_name: Optional[str], rebuild: bool
+) -> Tuple[Chroma, str, Dict[str, Any], Optional[str]]:
+    """
+    Bring the collection in line with the seed files, file by file:
+      unchanged (same sha256)  -> nothing, its chunk ids are already stored
+      new / changed            -> embed + add the new chunks, then delete the file's old ids
+      removed                  -> delete its ids
+    The manifest is saved after every file, so an interrupted run resumes where
+    it stopped (worst case a file's old chunks linger until the next sync).
+    Without a usable manifest (or rebuild=True) everything goes into a new
+    collection with a staged manifest; the old collection is returned as
+    `retired` once the new one is complete.
+    Returns (db, collection name, report with per-file timings, retired name).
+    Callers hold sync_lock(), so concurrent workers never share the staged manifest.
+    """
+    t_start = time.perf_counter()
+    files = {_seed_key(p): p for p in _find_seed_files()}
+    if not files:
+        raise RuntimeError(f"No seed files found in {SEEDS_DIR}. Put PDFs/TXT there first.")
 
-def build_or_load_index(rebuild: bool = False) -> Chroma:
-    embeddings = OpenAIEmbeddings(model=EMBED_MODEL, api_key=OPENAI_API_KEY)
-    if _need_rebuild(rebuild):
-        # fresh build
-        docs = load_corpus()
-        vectordb = Chroma.from_documents(
-            docs, embeddings,
-            collection_name="krishi_rag",
-            persist_directory=str(PERSIST_DIR),
-            collection_metadata={"hnsw:space":"cosine"}
-        )
-        _save_meta()
-        return vectordb
-    # load existing
-    return Chroma(
-        embedding_function=embeddings,
-        collection_name="krishi_rag",
-        persist_directory=str(PERSIST_DIR),
-    )
+    manifest = Manifest.load(MANIFEST_PATH, _manifest_settings())
+    retired: Optional[str] = None
+    fresh = rebuild or manifest.is_empty
+    if fresh:
+        # whatever the live collection holds has unknown/unwanted ids: build next to it
+        retired = manifest.collection or COLLECTION
+        name = f"{COLLECTION}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        manifest = Manifest(STAGING_MANIFEST_PATH, _manifest_settings(), collection=name)
+        db = _open_db(name)
+    else:
+        name = manifest.collection or COLLECTION
+        db = current if current is not None and current_name == name else _open_db(name)
+
+    plan = manifest.plan(files)
+    per_file: List[Dict[str, Any]] = [
+        {"file": k, "status": "unchanged", "chunks": len(manifest.files[k].ids)} for k in plan.unchanged
+    ]
+    embedded = deleted = 0
+    jobs = [(key, str(files[key]), sha) for key, sha in plan.changed.items()]
+    # workers parse upcoming files while this loop embeds the current one
+    for parsed in iter_parsed(jobs):
+        key, ids = parsed.key, parsed.ids
+        path = files[key]
+        old = manifest.files.get(key)
+        t1 = time.perf_counter()
+        for i in range(0, len(ids), EMBED_BATCH):
+            db.add_documents(parsed.docs[i:i + EMBED_BATCH], ids=ids[i:i + EMBED_BATCH])
+        t2 = time.perf_counter()
+        parsed.docs = []                # drop the file's text before the next one arrives
+        keep = set(ids)
+        stale = [i for i in (old.ids if old else []) if i not in keep]
+        if stale:
+            db.delete(ids=stale)
+        st = path.stat()
+        manifest.files[key] = FileEntry(sha256=parsed.sha256, size=st.st_size, mtime_ns=st.st_mtime_ns, ids=ids)
+        manifest.save()
+        embedded += len(ids)
+        deleted += len(stale)
+        per_file.append({
+            "file": key, "status": "changed" if old else "added", "chunks": len(ids), "deleted": len(stale),
+            "load_split_s": round(parsed.parse_s, 2), "embed_s": round(t2 - t1, 2),
+        })
+    for key in plan.removed:
+        old_ids = manifest.files.pop(key).ids
+        if old_ids:
+            db.delete(ids=old_ids)
+        manifest.save()
+        deleted += len(old_ids)
+        per_file.append({"file": key, "status": "removed", "deleted": len(old_ids)})
+    if fresh:
+        # publish: from here on the new collection is the live one
+        manifest.path = MANIFEST_PATH
+        manifest.save()
+        STAGING_MANIFEST_PATH.unlink(missing_ok=True)
+    elif not plan.changed and not plan.removed:
+        manifest.save()     # persist refreshed mtimes of touched-but-identical files
+
+    return db, name, {
+        "files": sorted(per_file, key=lambda r: r["file"]),
+        "embedded_chunks": embedded,
+        "deleted_chunks": deleted,
+        "total_chunks": sum(len(e.ids) for e in manifest.files.values()),
+        "seconds": round(time.perf_counter() - t_start, 2),
+        "rebuilt": fresh,
+    }, retired
 
 def search(query: str, k: int = 4) -> List[Tuple[float, Document]]:
     db = build_or_load_index(rebuild=False)
@@ -191,6 +412,6 @@ if __name__ == "__main__":
             })
         print(json.dumps({"query": args.ask, "results": json_ready}, indent=2, ensure_ascii=False))
     else:
-        print(f"Index ready: {PERSIST_DIR} (collection=krishi_rag)")
+        print(f"Index ready: {PERSIST_DIR} (collection={MANAGER.status()['collection']})")
 
 
@@ -0,0 +1,122 @@
+# backend/app/rag/loader.py
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Sequence, Tuple, TypeVar
+
+from backend.app.rag.manifest import chunk_id
+
+# -----------------------------------------------------------------------------
+# Seed-file parsing + chunking for RAG ingestion.
+# Kept free of Chroma/OpenAI imports (LangChain loaders are imported lazily) so
+# the spawned parse workers start fast. Files are parsed in a process pool and
+# handed back one file at a time, in order. A worker returns a whole file's
+# chunks, so memory is bounded per file rather than flat: at most
+# `max_in_flight` (2 x workers) parsed files exist at once, i.e. peak memory
+# grows with the largest seeds and the worker count, not with the number of
+# seeds. The caller embeds each file in bounded batches.
+# -----------------------------------------------------------------------------
+
+PARSE_WORKERS = int(os.getenv("KM_RAG_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+CHUNK_SIZE, CHUNK_OVERLAP = 1000, 200
+SEED_EXTS = {".pdf", ".txt", ".md"}
+
+T = TypeVar("T")
+R = TypeVar("R")
+_END = object()
+
+
+@dataclass
+class ParsedFile:
+    key: str
+    sha256: str
+    docs: list          # langchain Documents
+    ids: List[str]
+    parse_s: float
+
+
+def splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=["\n\n","\n"," ",""],
+        add_start_index=True,
+    )
+
+
+def load_pages(path: Path) -> Iterator[Any]:
+    """Documents of one seed file, page by page for PDFs."""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
+    loader = PyPDFLoader(str(path)) if path.suffix.lower() == ".pdf" else TextLoader(str(path), encoding="utf-8")
+    for d in loader.lazy_load():
+        d.metadata["source"] = path.name
+        d.metadata.setdefault("title", path.stem.replace("_"," ").title())
+        yield d
+
+
+def iter_chunks(path: Path, file_sha: str, key: str) -> Iterator[Tuple[str, Any]]:
+    """(stable chunk id, Document) for one file; pages are split as they are read."""
+    split = splitter()
+    seen = set()
+    n = 0
+    for page in load_pages(path):
+        for d in split.split_documents([page]):
+            cid = chunk_id(key, file_sha, d.metadata.get("page"), int(d.metadata.get("start_index", n)))
+            if cid in seen:             # start_index is -1 when the splitter can't locate a chunk
+                cid = f"{cid}#{n}"
+            seen.add(cid)
+            d.metadata["file_sha256"] = file_sha
+            n += 1
+            yield cid, d
+
+
+def parse_file(job: Tuple[str, str, str]) -> ParsedFile:
+    """Worker entry point: job = (key, path, sha256)."""
+    key, path, sha = job
+    t0 = time.perf_counter()
+    ids, docs = [], []
+    for cid, d in iter_chunks(Path(path), sha, key):
+        ids.append(cid)
+        docs.append(d)
+    return ParsedFile(key=key, sha256=sha, docs=docs, ids=ids, parse_s=time.perf_counter() - t0)
+
+
+def bounded_imap(fn: Callable[[T], R], items: Iterable[T], pool: Executor, max_in_flight: int) -> Iterator[R]:
+    """
+    pool.map that keeps at most `max_in_flight` submitted-but-unconsumed tasks
+    and yields results in submission order (so a slow consumer throttles parsing).
+    """
+    pending: Deque[Future] = deque()
+    it = iter(items)
+    for item in it:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max(1, max_in_flight):
+            break
+    while pending:
+        yield pending.popleft().result()
+        nxt = next(it, _END)
+        if nxt is not _END:
+            pending.append(pool.submit(fn, nxt))
+
+
+def iter_parsed(jobs: Sequence[Tuple[str, str, str]], workers: int = PARSE_WORKERS) -> Iterator[ParsedFile]:
+    """
+    ParsedFile per job, in order. Peak memory is about workers * 2 fully parsed
+    files (one file with a single worker); lower KM_RAG_PARSE_WORKERS when the
+    seed set holds very large PDFs.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield parse_file(job)
+        return
+    # spawn: the parent may hold sqlite/chroma threads that must not be forked
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        yield from bounded_imap(parse_file, jobs, pool, max_in_flight=workers * 2)
+
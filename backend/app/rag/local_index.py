@@ -0,0 +1,348 @@
+# backend/app/rag/local_index.py
+"""
+In-process vector index for RAG retrieval (KM_RAG_BACKEND=local).
+
+The Chroma collection is exported into KM_RAG_LOCAL_DIR as
+    vectors.f32    L2-normalized float32 matrix (count x dim), memory-mapped read-only
+    meta.json      embed model, dim/count, manifest signature + per-row id/text/source/title/page
+    hnsw.bin       optional hnswlib graph over the same rows (when hnswlib is installed)
+and queried with one matrix-vector product + argpartition (exact cosine top-k),
+or hnswlib when KM_RAG_LOCAL_ANN=hnsw. Retrieval then needs neither Chroma
+nor LangChain, only the (cached) query embedding.
+
+    python -m backend.app.rag.local_index export
+    python -m backend.app.rag.local_index bench --queries questions.txt --k 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]    # .../backend
+# chroma (LangChain + Chroma, default) | local (this module; exported after every index sync)
+RAG_BACKEND = os.getenv("KM_RAG_BACKEND", "chroma").strip().lower()
+LOCAL_DIR = os.getenv("KM_RAG_LOCAL_DIR", str(BACKEND_DIR / "chroma" / "local"))
+# brute (exact NumPy top-k) | hnsw (hnswlib, falls back to brute when unavailable)
+ANN = os.getenv("KM_RAG_LOCAL_ANN", "brute").strip().lower()
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.json"
+HNSW_FILE = "hnsw.bin"
+
+DEFAULT_BENCH_QUERIES = [
+    "PM-KISAN eligibility",
+    "KCC interest rate",
+    "Kisan Credit Card repayment period",
+    "minimum support price for wheat",
+    "crop insurance claim under PMFBY",
+    "soil health card sampling",
+    "how to sell on eNAM",
+    "NFSM seed subsidy for pulses",
+]
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def top_k(matrix: np.ndarray, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(row indices, cosine scores) of the k best rows; `matrix` rows and `q` are unit vectors."""
+    scores = matrix @ q
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    idx = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+
+def _meta_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of the export on disk (inode, mtime, size of meta.json); every export writes a new file."""
+    try:
+        st = os.stat(os.path.join(path, META_FILE))
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class LocalIndex:
+    def __init__(self, vectors: np.ndarray, meta: Dict[str, Any], hnsw=None, stamp=None):
+        self.vectors = vectors
+        self.meta = meta
+        self.items: List[Dict[str, Any]] = meta["items"]
+        self.hnsw = hnsw
+        self.signature: Optional[str] = meta.get("signature")    # manifest signature it was exported from
+        self.stamp = stamp
+
+    @classmethod
+    def load(cls, path: str = LOCAL_DIR, ann: str = ANN) -> "LocalIndex":
+        stamp = _meta_stamp(path)
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        count, dim = int(meta["count"]), int(meta["dim"])
+        if count:
+            vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, dim))
+        else:       # numpy cannot map an empty file
+            vectors = np.zeros((0, dim), dtype=np.float32)
+        hnsw = None
+        if ann == "hnsw" and os.path.exists(os.path.join(path, HNSW_FILE)):
+            try:
+                import hnswlib
+
+                hnsw = hnswlib.Index(space="ip", dim=dim)
+                hnsw.load_index(os.path.join(path, HNSW_FILE), max_elements=count)
+            except ImportError:
+                print("[rag-local] hnswlib not installed, using brute-force top-k")
+        return cls(vectors, meta, hnsw, stamp)
+
+    @property
+    def embed_model(self) -> str:
+        return self.meta["embed_model"]
+
+    def search_vector(self, q: Sequence[float], k: int = 4) -> List[Tuple[float, Dict[str, Any]]]:
+        qv = normalize_rows(np.asarray(q, dtype=np.float32))
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(50, 2 * k))
+            labels, dists = self.hnsw.knn_query(qv, k=min(k, len(self.items)))
+            idx, scores = labels[0], 1.0 - dists[0]          # "ip" distance = 1 - dot
+        else:
+            idx, scores = top_k(self.vectors, qv, k)
+        return [(float(s), self.items[int(i)]) for i, s in zip(idx, scores)]
+
+
+_LOCAL: Optional[LocalIndex] = None
+_LOCAL_LOCK = threading.Lock()
+
+
+def get_local_index(path: Optional[str] = None) -> LocalIndex:
+    """
+    The loaded export, reloaded when the one on disk has been replaced (by any
+    worker or process; one stat per call). Raises FileNotFoundError until
+    `export` has been run.
+    """
+    global _LOCAL
+    path = path or LOCAL_DIR
+    with _LOCAL_LOCK:
+        if _LOCAL is None or _LOCAL.stamp != _meta_stamp(path):
+            # readers still holding the old index keep its (unlinked) memmap alive
+            _LOCAL = LocalIndex.load(path)
+        return _LOCAL
+
+
+def reset_local_index() -> None:
+    global _LOCAL
+    with _LOCAL_LOCK:
+        _LOCAL = None
+
+
+def get_embeddings_for(idx: LocalIndex):
+    # query vectors must come from the model the export was built with
+    from backend.app.rag.embedding_cache import get_embeddings
+
+    return get_embeddings(idx.embed_model)
+
+
+def search(query: str, k: int = 4) -> List[Tuple[float, Dict[str, Any]]]:
+    idx = get_local_index()
+    return idx.search_vector(get_embeddings_for(idx).embed_query(query), k=k)
+
+
+# ---- Export ----
+def write_index(
+    out_dir: str,
+    ids: List[str],
+    vectors: np.ndarray,
+    items: List[Dict[str, Any]],
+    *,
+    embed_model: str,
+    signature: Optional[str] = None,
+    build_hnsw: bool = True,
+) -> Dict[str, Any]:
+    """
+    Write matrix + sidecar into a private temp dir, then swap it in under the
+    export lock (readers never see half an export; concurrent writers don't share files).
+    """
+    vectors = normalize_rows(vectors)
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f"{os.path.basename(out_dir)}.tmp-", dir=parent)
+    if vectors.size:
+        mm = np.memmap(os.path.join(tmp, VECTORS_FILE), dtype=np.float32, mode="w+", shape=vectors.shape)
+        mm[:] = vectors
+        mm.flush()
+        del mm
+    else:
+        open(os.path.join(tmp, VECTORS_FILE), "wb").close()
+    meta = {
+        "embed_model": embed_model,
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "signature": signature,
+        "items": [{"id": i, **it} for i, it in zip(ids, items)],
+    }
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    hnsw_built = False
+    if build_hnsw and len(ids):
+        try:
+            import hnswlib
+
+            h = hnswlib.Index(space="ip", dim=meta["dim"])
+            h.init_index(max_elements=len(ids), ef_construction=200, M=16)
+            h.add_items(vectors, np.arange(len(ids)))
+            h.save_index(os.path.join(tmp, HNSW_FILE))
+            hnsw_built = True
+        except ImportError:
+            pass
+    old = f"{tmp}.old"
+    with export_lock(out_dir):
+        if os.path.exists(out_dir):
+            os.replace(out_dir, old)
+        os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return {"path": out_dir, "count": meta["count"], "dim": meta["dim"], "hnsw": hnsw_built}
+
+
+@contextmanager
+def export_lock(out_dir: str):
+    """Cross-process lock (fcntl) serializing exports of one directory; no-op where fcntl is missing."""
+    try:
+        import fcntl
+    except ImportError:         # Windows: unique temp dirs still keep writers apart
+        yield
+        return
+    with open(f"{out_dir}.lock", "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def export_if_stale(out_dir: str = LOCAL_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Export unless the directory already holds an export of the current manifest.
+    Several workers noticing the same change export once: the rest wait on the
+    lock, then find it current.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(out_dir)), exist_ok=True)
+    with export_lock(f"{out_dir}.export"):
+        if is_current(out_dir):
+            return None
+        return export(out_dir)
+
+
+def export(out_dir: str = LOCAL_DIR, page: int = 1000) -> Dict[str, Any]:
+    """Dump the synced Chroma collection (ids, stored embeddings, texts, metadata)."""
+    from backend.app.rag.index import EMBED_MODEL, build_or_load_index, manifest_signature
+
+    db = build_or_load_index(rebuild=False)
+    ids: List[str] = []
+    vecs: List[np.ndarray] = []
+    items: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        got = db.get(include=["embeddings", "documents", "metadatas"], limit=page, offset=offset)
+        if not got["ids"]:
+            break
+        for cid, emb, text, md in zip(got["ids"], got["embeddings"], got["documents"], got["metadatas"]):
+            md = md or {}
+            ids.append(cid)
+            vecs.append(np.asarray(emb, dtype=np.float32))
+            items.append({"text": text, "source": md.get("source"), "title": md.get("title"), "page": md.get("page")})
+        offset += len(got["ids"])
+    matrix = np.vstack(vecs) if vecs else np.zeros((0, 0), dtype=np.float32)
+    return write_index(out_dir, ids, matrix, items, embed_model=EMBED_MODEL, signature=manifest_signature())
+
+
+def is_current(path: str = LOCAL_DIR) -> bool:
+    """True when an export exists and was taken from the current ingestion manifest."""
+    from backend.app.rag.index import manifest_signature
+
+    try:
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            sig = json.load(f).get("signature")
+    except (OSError, ValueError):
+        return False
+    return sig is not None and sig == manifest_signature()
+
+
+# ---- Benchmark: local vs Chroma ----
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+
+def _latency(ms: List[float]) -> Dict[str, float]:
+    return {"p50_ms": round(statistics.median(ms), 3), "p95_ms": round(_pct(ms, 0.95), 3), "mean_ms": round(statistics.fmean(ms), 3)}
+
+
+def bench(queries: List[str], k: int = 4, runs: int = 5) -> Dict[str, Any]:
+    """
+    Same (pre-embedded) query vectors against Chroma, local brute-force and,
+    if present, local hnsw. recall@k is measured against exact brute-force.
+    """
+    from backend.app.rag.index import build_or_load_index
+
+    db = build_or_load_index(rebuild=False)
+    brute = LocalIndex.load(ann="brute")
+    hnsw = LocalIndex.load(ann="hnsw")
+    emb = get_embeddings_for(brute)
+    qvecs = [emb.embed_query(q) for q in queries]
+
+    def run(fn) -> Tuple[List[List[str]], List[float]]:
+        ids, ms = [], []
+        for _ in range(runs):
+            ids = []
+            for qv in qvecs:
+                t0 = time.perf_counter()
+                ids.append(fn(qv))
+                ms.append((time.perf_counter() - t0) * 1000)
+        return ids, ms
+
+    exact, exact_ms = run(lambda qv: [it["id"] for _, it in brute.search_vector(qv, k)])
+    paths = {"local_brute": (exact, exact_ms)}
+    paths["chroma"] = run(
+        lambda qv: [d.id for d, _ in db.similarity_search_by_vector_with_relevance_scores(qv, k=k)]
+    )
+    if hnsw.hnsw is not None:
+        paths["local_hnsw"] = run(lambda qv: [it["id"] for _, it in hnsw.search_vector(qv, k)])
+
+    out: Dict[str, Any] = {"queries": len(queries), "k": k, "runs": runs, "rows": len(brute.items)}
+    for name, (ids, ms) in paths.items():
+        recall = statistics.fmean(len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(ids, exact))
+        out[name] = {f"recall@{k}": round(recall, 4), **_latency(ms)}
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export / benchmark the local RAG vector index")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("--out", default=LOCAL_DIR)
+    p_b = sub.add_parser("bench")
+    p_b.add_argument("--queries", help="text file, one question per line (default: a built-in list)")
+    p_b.add_argument("--k", type=int, default=4)
+    p_b.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        print(json.dumps(export(args.out), indent=2))
+    else:
+        qs = DEFAULT_BENCH_QUERIES
+        if args.queries:
+            qs = [l.strip() for l in Path(args.queries).read_text(encoding="utf-8").splitlines() if l.strip()]
+        print(json.dumps(bench(qs, k=args.k, runs=args.runs), indent=2))
@@ -0,0 +1,112 @@
+# backend/app/rag/manifest.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# -----------------------------------------------------------------------------
+# Ingestion manifest for incremental RAG builds.
+# One entry per seed file: content sha256 (+ size/mtime so unchanged files are
+# not even re-read) and the ids of the chunks it put into the collection.
+# Chunk ids come from the seed key + file hash + page + character offset, so a
+# file whose bytes did not change always maps to the same ids and is never
+# re-embedded, while byte-identical copies at different paths never share ids
+# (deleting or changing one must not delete the other's chunks).
+# -----------------------------------------------------------------------------
+
+MANIFEST_VERSION = 2     # 2: chunk ids include the seed key
+
+
+def file_sha256(path: Path, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(bufsize)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def chunk_id(key: str, file_sha: str, page: Optional[int], start: int) -> str:
+    key_h = hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+    return f"{key_h}:{file_sha[:24]}:{page if page is not None else 0}:{start}"
+
+
+@dataclass
+class FileEntry:
+    sha256: str
+    size: int
+    mtime_ns: int
+    ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Plan:
+    unchanged: List[str]
+    changed: Dict[str, str]     # key -> new sha256 (new or modified files)
+    removed: List[str]
+
+
+class Manifest:
+    """`settings` pins whatever makes old chunks unusable (chunking, embedding model)."""
+
+    def __init__(self, path: Path, settings: Dict[str, Any], collection: Optional[str] = None):
+        self.path = Path(path)
+        self.settings = dict(settings)
+        self.collection = collection        # vector-store collection these chunk ids live in
+        self.files: Dict[str, FileEntry] = {}
+
+    @classmethod
+    def load(cls, path: Path, settings: Dict[str, Any]) -> "Manifest":
+        """Empty manifest when missing/unreadable or built with different settings (=> full rebuild)."""
+        m = cls(path, settings)
+        try:
+            doc = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return m
+        if doc.get("version") != MANIFEST_VERSION or doc.get("settings") != m.settings:
+            return m
+        m.collection = doc.get("collection")
+        m.files = {k: FileEntry(**v) for k, v in (doc.get("files") or {}).items()}
+        return m
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.files
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        doc = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "collection": self.collection,
+            "files": {k: vars(e) for k, e in sorted(self.files.items())},
+        }
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(doc, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def plan(self, files: Dict[str, Path]) -> Plan:
+        """Diff the seed files (key -> path) against the manifest; hashes only files whose size/mtime moved."""
+        unchanged: List[str] = []
+        changed: Dict[str, str] = {}
+        for key, p in sorted(files.items()):
+            st = p.stat()
+            old = self.files.get(key)
+            if old is not None and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+                unchanged.append(key)
+                continue
+            sha = file_sha256(p)
+            if old is not None and old.sha256 == sha:
+                # touched but identical: keep the chunks, just remember the new stat
+                old.size, old.mtime_ns = st.st_size, st.st_mtime_ns
+                unchanged.append(key)
+            else:
+                changed[key] = sha
+        removed = sorted(k for k in self.files if k not in files)
+        return Plan(unchanged=unchanged, changed=changed, removed=removed)
@@ -1,6 +1,6 @@
 import time
 from typing import List, Dict, Any
-from backend.app.rag.index import build_or_load_index
+from backend.app.rag import local_index
 
 def t() -> float:
     return time.perf_counter()
@@ -8,7 +8,19 @@ def t() -> float:
 def retrieve(query: str, k: int = 3) -> List[Dict[str, Any]]:
     start = t()
 
-    db = build_or_load_index(rebuild=False)
+    if local_index.RAG_BACKEND == "local":
+        try:
+            out = _retrieve_local(query, k)
+            total_ms = round((t() - start) * 1000)
+            print(f"⏱️  RAG retrieve (local): {total_ms}ms ({len(out)} results)")
+            return out
+        except FileNotFoundError:
+            print("⚠️  local RAG index not exported yet, using Chroma")
+
+    # imported here so the local backend never loads LangChain/Chroma
+    from backend.app.rag.index import build_or_load_index
+
+    db = build_or_load_index(rebuild=False)     # with KM_RAG_BACKEND=local this also exports
     results = db.similarity_search_with_relevance_scores(query, k=k)
 
     out: List[Dict[str, Any]] = []
@@ -26,3 +38,9 @@ def retrieve(query: str, k: int = 3) -> List[Dict[str, Any]]:
     print(f"⏱️  RAG retrieve: {total_ms}ms ({len(out)} results)")
 
     return out
+
+def _retrieve_local(query: str, k: int) -> List[Dict[str, Any]]:
+    return [
+        {"score": score, "text": it["text"], "source": it.get("source"), "title": it.get("title"), "page": it.get("page")}
+        for score, it in local_index.search(query, k=k)
+    ]
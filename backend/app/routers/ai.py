@@ -1,30 +1,92 @@
 # backend/app/routers/ai.py
 from __future__ import annotations
 
+import asyncio
 from typing import Optional, Dict, Any
 
 from fastapi import APIRouter, Body, HTTPException
 
-from backend.app.services.ai_chat import ask_ai, translate_text
-from backend.app.services.soil import resilient_soil_fetcher, get_soil, to_response_dict as soil_to_resp
+from backend.app.services.ai_chat import ask_ai, build_ask_prompt, translate_text
+from backend.app.services.gemini import astream_text
+from backend.app.services.llm_cache import snap_coords
+from backend.app.services.streaming import sse_response, stream_answer, timed_step
+from backend.app.services.soil import get_soil_async, to_response_dict as soil_to_resp
 from backend.app.services.weather import get_weather, to_response_dict as weather_to_resp
 from backend.app.services.market import agmarknet_http_fetcher, get_latest_price
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
+ASK_EXAMPLE = {
+    "question": "मेरे धान में पत्ती पीली हो रही है, क्या करूँ?",
+    "target_language": "hi",
+    "notes": "बारिश पिछले हफ्ते भारी थी",
+    "coords": {"lat": 22.57, "lon": 88.36},
+    "market": {"district": "Kolkata", "commodity": "Rice", "mandi": "Kolkata"}
+}
+
+def _parse_ask(payload: Dict[str, Any]) -> Dict[str, Any]:
+    q = str(payload.get("question") or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="question is required")
+    return {
+        "question": q,
+        "target_language": (payload.get("target_language") or "").strip() or None,
+        "user_context_text": (payload.get("notes") or "").strip() or None,
+    }
+
+def _cache_context(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """What must match for a cached answer to be reused (llm_cache semantic level)."""
+    coords = payload.get("coords") or {}
+    market = payload.get("market") or {}
+    return {
+        "cell": snap_coords(coords.get("lat"), coords.get("lon")),
+        "market": [market.get("district"), market.get("commodity"), market.get("mandi")] if market else None,
+    }
+
+async def _gather_context(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """soil/weather/price context; each source reports progress when the request is streamed."""
+    ctx_struct: Dict[str, Any] = {}
+    coords = payload.get("coords") or {}
+    lat = coords.get("lat"); lon = coords.get("lon")
+
+    async def soil():
+        async with timed_step("soil"):
+            s = await get_soil_async(float(lat), float(lon))
+        ctx_struct["soil"] = soil_to_resp(s.bundle)
+
+    async def weather():
+        # the (cached) weather call is blocking, so it gets a thread
+        async with timed_step("weather"):
+            wb = await asyncio.to_thread(get_weather, float(lat), float(lon))
+        ctx_struct["weather"] = weather_to_resp(wb)
+
+    if lat is not None and lon is not None:
+        await asyncio.gather(soil(), weather())
+
+    market = payload.get("market") or {}
+    if market:
+        async with timed_step("market"):
+            mp = await asyncio.to_thread(
+                get_latest_price,
+                district=market.get("district"),
+                commodity=market.get("commodity"),
+                mandi=market.get("mandi"),
+                fetcher=agmarknet_http_fetcher,
+            )
+        if mp:
+            ctx_struct["price"] = {
+                "commodity": mp.commodity,
+                "price": mp.price,
+                "unit": mp.unit,
+                "mandi": mp.mandi,
+                "district": mp.district,
+                "state": mp.state,
+                "lastUpdated": mp.lastUpdated,
+            }
+    return ctx_struct
+
 @router.post("/ask")
-def ai_ask(
-    payload: Dict[str, Any] = Body(
-        ...,
-        example={
-            "question": "मेरे धान में पत्ती पीली हो रही है, क्या करूँ?",
-            "target_language": "hi",
-            "notes": "बारिश पिछले हफ्ते भारी थी",
-            "coords": {"lat": 22.57, "lon": 88.36},
-            "market": {"district": "Kolkata", "commodity": "Rice", "mandi": "Kolkata"}
-        },
-    )
-):
+async def ai_ask(payload: Dict[str, Any] = Body(..., example=ASK_EXAMPLE)):
     """
     Ask AI with optional on-the-fly context.
     Body fields:
@@ -35,56 +97,34 @@ def ai_ask(
       - market: {district, commodity, mandi} OPTIONAL for latest price context
     """
     try:
-        q = str(payload.get("question") or "").strip()
-        if not q:
-            raise HTTPException(status_code=400, detail="question is required")
-
-        target_language = (payload.get("target_language") or "").strip() or None
-        notes = (payload.get("notes") or "").strip() or None
-
-        # Optional context build
-        ctx_struct: Dict[str, Any] = {}
-        coords = payload.get("coords") or {}
-        lat = coords.get("lat"); lon = coords.get("lon")
-        if lat is not None and lon is not None:
-            soil_bundle = get_soil(float(lat), float(lon), resilient_soil_fetcher)
-            weather_bundle = get_weather(float(lat), float(lon))
-            ctx_struct["soil"] = soil_to_resp(soil_bundle)
-            ctx_struct["weather"] = weather_to_resp(weather_bundle)
-
-        market = payload.get("market") or {}
-        if market:
-            mp = get_latest_price(
-                district=market.get("district"),
-                commodity=market.get("commodity"),
-                mandi=market.get("mandi"),
-                fetcher=agmarknet_http_fetcher,
-            )
-            if mp:
-                ctx_struct["price"] = {
-                    "commodity": mp.commodity,
-                    "price": mp.price,
-                    "unit": mp.unit,
-                    "mandi": mp.mandi,
-                    "district": mp.district,
-                    "state": mp.state,
-                    "lastUpdated": mp.lastUpdated,
-                }
-
-        out = ask_ai(
-            question=q,
-            target_language=target_language,
-            user_context_text=notes,
-            context_structured=ctx_struct or None,
-        )
+        args = _parse_ask(payload)
+        ctx_struct = await _gather_context(payload)
+        out = await ask_ai(**args, context_structured=ctx_struct or None, cache_context=_cache_context(payload))
         return out
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"ask failed: {e}")
 
+@router.post("/ask/stream")
+async def ai_ask_stream(payload: Dict[str, Any] = Body(..., example=ASK_EXAMPLE)):
+    """
+    Same body as /ask, answered as Server-Sent Events:
+    start, progress (soil/weather/market), token..., done | error.
+    """
+    args = _parse_ask(payload)
+
+    async def prepare():
+        ctx_struct = await _gather_context(payload)
+        return build_ask_prompt(**args, context_structured=ctx_struct or None)
+
+    def tokens(prompt: str):
+        return astream_text(prompt, purpose="ask_stream")
+
+    return sse_response(stream_answer("ai", prepare, tokens))
+
 @router.post("/translate")
-def ai_translate(
+async def ai_translate(
     payload: Dict[str, Any] = Body(
         ...,
         example={"text": "Apply 20 kg urea per acre.", "target_language": "hi"}
@@ -102,7 +142,7 @@ def ai_translate(
         if not text or not target_language:
             raise HTTPException(status_code=400, detail="text and target_language are required")
 
-        out = translate_text(text=text, target_language=target_language)
+        out = await translate_text(text=text, target_language=target_language)
         return out
     except HTTPException:
         raise
@@ -2,10 +2,12 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from backend.app.agents.agent_loop import run_agent_once
+from backend.app.agents.agent_loop import FINAL_CONFIG, finalize_prompt, new_state, plan, run_agent_once
 from backend.app.db import get_session
 from sqlalchemy.orm import Session
 from backend.app.models.farms import Farm
+from backend.app.services.gemini import astream_text
+from backend.app.services.streaming import sse_response, stream_answer
 
 router = APIRouter(prefix="/api/ai3", tags=["ai-agent"])
 
@@ -19,8 +21,7 @@ class AskAgentic(BaseModel):
     mandi: str | None = None
     farm_id: str | None = None   # NEW
 
-@router.post("/ask")
-async def ask(req: AskAgentic, db: Session = Depends(get_session)):
+def _farm_prefs(req: AskAgentic, db: Session) -> dict:
     # Load farm prefs if farm_id provided
     prefs = {"preferred_commodities": None, "preferred_mandi": None}
     if req.farm_id:
@@ -28,7 +29,11 @@ async def ask(req: AskAgentic, db: Session = Depends(get_session)):
         if farm:
             prefs["preferred_commodities"] = (farm.preferred_commodities or [])[:8]
             prefs["preferred_mandi"] = farm.preferred_mandi
+    return prefs
 
+@router.post("/ask")
+async def ask(req: AskAgentic, db: Session = Depends(get_session)):
+    prefs = _farm_prefs(req, db)
     try:
         out = await run_agent_once(
             req.question,
@@ -41,4 +46,34 @@ async def ask(req: AskAgentic, db: Session = Depends(get_session)):
         )
         return out
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"agent failed: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"agent failed: {e}")
+
+@router.post("/ask/stream")
+async def ask_stream(req: AskAgentic, db: Session = Depends(get_session)):
+    """
+    Same request as /ask, answered as Server-Sent Events: start, progress (planner,
+    then each tool it called), meta (tools used), token..., done | error.
+    """
+    prefs = _farm_prefs(req, db)
+
+    async def prepare():
+        state = await plan(new_state(
+            req.question,
+            target_language=req.target_language,
+            lat=req.lat, lon=req.lon,
+            district=req.district, commodity=req.commodity, mandi=req.mandi,
+            preferred_commodities=prefs["preferred_commodities"],
+            preferred_mandi=prefs["preferred_mandi"],
+            max_steps=3,
+        ))
+        meta = {"used_steps": [{"tool": st.get("tool"), "args": st.get("args")} for st in state.steps]}
+        if state.final_answer and not state.error:
+            return {"answer": state.final_answer, "meta": meta}
+        if state.steps:
+            return {"prompt": finalize_prompt(state), "meta": meta}
+        raise RuntimeError(state.error or "no_steps")
+
+    def tokens(ctx: dict):
+        return astream_text(ctx["prompt"], generation_config=FINAL_CONFIG, timeout=25.0, purpose="agent_final_stream")
+
+    return sse_response(stream_answer("ai3", prepare, tokens))
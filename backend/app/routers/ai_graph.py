@@ -2,7 +2,9 @@
 from __future__ import annotations
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from backend.app.agents.graph import ASK_GRAPH, AskState
+from backend.app.agents.graph import ASK_GRAPH, LLM_CONFIG, AskState, build_llm_prompt, node_gather
+from backend.app.services.gemini import astream_text
+from backend.app.services.streaming import sse_response, stream_answer
 
 router = APIRouter(prefix="/api/ai2", tags=["ai-graph"])
 
@@ -39,3 +41,19 @@ async def ask_ai(req: AskRequest):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"graph failed: {e}")
+
+
+@router.post("/ask/stream")
+async def ask_ai_stream(req: AskRequest):
+    """
+    Same request as /ask, answered as Server-Sent Events: start, one progress
+    event per gather tool (weather/soil/market/recos/satellite), token..., done | error.
+    """
+    async def prepare():
+        state = await node_gather(AskState(**req.model_dump()))
+        return build_llm_prompt(state)
+
+    def tokens(prompt: str):
+        return astream_text(prompt, generation_config=LLM_CONFIG, timeout=45.0, purpose="ai2_stream")
+
+    return sse_response(stream_answer("ai2", prepare, tokens))
@@ -1,57 +1,107 @@
 # backend/app/routers/crop_disease.py
 from __future__ import annotations
 
+import asyncio
 import os
 import uuid
 from pathlib import Path
 from typing import Optional
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, UploadFile
+from PIL import UnidentifiedImageError
 
 from backend.app.schemas.crop_disease import CropDiseaseDetectionResponse
-from backend.app.services.vision.vit_disease import detect_crop_disease as vit_detect
+from backend.app.services.vision.batcher import BatcherOverloaded
+from backend.app.services.vision.diagnosis_cache import DIAGNOSIS_CACHE, image_hash
+from backend.app.services.vision.diagnosis_templates import TEMPLATES
+from backend.app.services.vision.vit_disease import detect_crop_disease_async as vit_detect
 from backend.app.services.vision.crop_disease_llm import (
+    DIAGNOSIS_SCHEMA,
     _prompt_for_diagnosis,
-    call_gemini_json,
+    acall_gemini_json,
     build_response_dict,
 )
 
 router = APIRouter(prefix="/api/v1/cropdisease", tags=["crop-disease"])
 
 UPLOAD_DIR = Path("backend/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# keep a copy of every upload (written after the response is sent); 0 = don't touch disk
+ARCHIVE_UPLOADS = os.getenv("KM_DISEASE_ARCHIVE_UPLOADS", "1").strip().lower() not in ("0", "false", "no")
+if ARCHIVE_UPLOADS:
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+def _archive_upload(path: Path, data: bytes) -> None:
+    try:
+        path.write_bytes(data)
+    except OSError as e:
+        print(f"[crop-disease] could not archive {path}: {e}")
 
 @router.post("/detect", response_model=CropDiseaseDetectionResponse)
 async def detect_crop_disease(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="Leaf/plant image"),
     query: Optional[str] = Form(None, description="Optional notes/symptoms"),
+    language: str = Form("en", description="Language code for symptoms/treatments (e.g., 'en', 'hi')"),
 ):
     """
     1) Run ViT on the image to get top-k class probs
-    2) Send those candidates + user notes to Gemini (REST) to produce final JSON
+    2) Confident top-1 and no notes: answer from the precomputed per-label template
+    3) Otherwise send those candidates + user notes to Gemini (REST) to produce final JSON
+    The image is decoded straight from the upload bytes; archiving the original
+    (KM_DISEASE_ARCHIVE_UPLOADS) happens in the background after the response.
     """
     try:
-        # ---- save the file (so you can inspect it later / return path) ----
-        suffix = Path(file.filename or "image").suffix or ".jpg"
-        fname = f"{uuid.uuid4().hex}{suffix}"
-        fpath = UPLOAD_DIR / fname
         raw = await file.read()
-        fpath.write_bytes(raw)
+        fpath: Optional[Path] = None
+        if ARCHIVE_UPLOADS:
+            suffix = Path(file.filename or "image").suffix or ".jpg"
+            fpath = UPLOAD_DIR / f"{uuid.uuid4().hex}{suffix}"
+
+        # ---- perceptual hash: re-uploads of the same leaf reuse earlier results ----
+        try:
+            h: Optional[int] = await asyncio.to_thread(image_hash, raw)
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=400, detail="Invalid image file.")
+        except Exception:
+            h = None  # unhashable but maybe still decodable; just skip the cache
+        topk, hamming = DIAGNOSIS_CACHE.lookup_topk(h) if h is not None else (None, None)
+        cache_info = {"vit": "miss" if topk is None else ("exact" if hamming == 0 else "near"), "hamming": hamming}
 
-        # ---- ViT predictions (your helper) ----
-        vit_out = vit_detect(str(fpath))  # list[{"disease":..., "probability":...}] or [{"error": "..."}]
-        if vit_out and "error" in vit_out[0]:
-            raise HTTPException(status_code=400, detail=vit_out[0]["error"])
+        if topk is None:
+            # ---- ViT predictions (micro-batched worker thread; the loop just awaits) ----
+            try:
+                vit_out = await vit_detect(raw)  # list[{"disease":..., "probability":...}] or [{"error": "..."}]
+            except BatcherOverloaded:
+                raise HTTPException(status_code=503, detail="disease model is busy, please retry shortly")
+            if vit_out and "error" in vit_out[0]:
+                raise HTTPException(status_code=400, detail=vit_out[0]["error"])
 
-        # Convert to list[(label, prob)] for LLM prompt
-        topk = [(d["disease"], float(d["probability"])) for d in vit_out][:3]
+            # Convert to list[(label, prob)] for LLM prompt
+            topk = [(d["disease"], float(d["probability"])) for d in vit_out][:3]
+            if h is not None:
+                DIAGNOSIS_CACHE.store_topk(h, topk)
+        if fpath is not None:
+            background_tasks.add_task(_archive_upload, fpath, raw)
 
-        # ---- LLM step ----
-        prompt = _prompt_for_diagnosis(topk, query)
-        llm_json = call_gemini_json(prompt)
+        # ---- Diagnosis: template > cached LLM answer (same labels + notes) > LLM ----
+        language = (language or "en").strip().lower() or "en"
+        llm_json = TEMPLATES.diagnosis_for(topk, query, language)
+        source = "template"
+        if llm_json is None:
+            llm_json = DIAGNOSIS_CACHE.lookup_diagnosis(topk, query, language)
+            source = "llm_cache"
+            cache_info["llm"] = "hit" if llm_json is not None else "miss"
+        if llm_json is None:
+            prompt = _prompt_for_diagnosis(topk, query, language)
+            llm_json = await acall_gemini_json(prompt, schema=DIAGNOSIS_SCHEMA)
+            source = "llm"
+            if isinstance(llm_json, dict):
+                DIAGNOSIS_CACHE.store_diagnosis(topk, query, llm_json, language)
 
         # ---- Final response dict (normalized) ----
-        resp = build_response_dict(llm_json, str(fpath))
+        resp = build_response_dict(llm_json, str(fpath) if fpath is not None else None)
+        resp["cache"] = cache_info
+        resp["diagnosis_source"] = source
         return CropDiseaseDetectionResponse(**resp)
 
     except HTTPException:
@@ -1,12 +1,14 @@
 # backend/app/routers/market_forecast.py
 from __future__ import annotations
 
-from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Dict, List
 from fastapi import Depends
 
 from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
 
-from backend.app.services.price_forecast import forecast_horizon
+from backend.app.services.price_forecast import forecast_batch, forecast_horizon
 from backend.app.services.market import get_latest_price, agmarknet_http_fetcher
 from backend.app.models.farms import Farm
 from backend.app.db import get_session
@@ -14,6 +16,46 @@ from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/api/market", tags=["market-forecast"])
 
+_NO_PRICE = "Could not determine current price. Provide `now_price` or refine district/mandi/commodity filters."
+
+def _current_price(district: Optional[str], commodity: str, mandi: Optional[str]) -> Optional[float]:
+    mp = get_latest_price(
+        district=district,
+        commodity=commodity,
+        mandi=mandi,
+        fetcher=agmarknet_http_fetcher,
+    )
+    if not mp or not (mp.price == mp.price):  # NaN check
+        return None
+    return float(mp.price)
+
+def _forecast_many(items: List[Dict[str, Any]], horizon_days: int) -> List[Dict[str, Any]]:
+    """
+    items: {commodity, district, market, state, variety, grade, now_price?}.
+    Missing seed prices are looked up concurrently; series that still have
+    none get an error entry, the rest are scored in one batch.
+    """
+    def seed(i: int) -> Optional[float]:
+        it = items[i]
+        try:
+            return _current_price(it.get("district"), it["commodity"], it.get("market"))
+        except Exception:
+            return None  # one bad lookup shouldn't sink the whole batch
+
+    missing = [i for i, it in enumerate(items) if it.get("now_price") is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+            prices = list(pool.map(seed, missing))
+        for i, p in zip(missing, prices):
+            items[i]["now_price"] = p
+
+    ready = [i for i, it in enumerate(items) if it.get("now_price") is not None]
+    packs = forecast_batch([items[i] for i in ready], horizon_days=horizon_days)
+    out: List[Dict[str, Any]] = [{"error": _NO_PRICE} for _ in items]
+    for i, pack in zip(ready, packs):
+        out[i] = pack
+    return out
+
 @router.get("/forecast")
 def get_price_forecast(
     commodity: str = Query(..., min_length=2),
@@ -36,18 +78,9 @@ def get_price_forecast(
     try:
         seed_price = now_price
         if seed_price is None:
-            mp = get_latest_price(
-                district=district,
-                commodity=commodity,
-                mandi=mandi,
-                fetcher=agmarknet_http_fetcher,
-            )
-            if not mp or not (mp.price == mp.price):  # NaN check
-                raise HTTPException(
-                    status_code=400,
-                    detail="Could not determine current price. Provide `now_price` or refine district/mandi/commodity filters.",
-                )
-            seed_price = float(mp.price)
+            seed_price = _current_price(district, commodity, mandi)
+            if seed_price is None:
+                raise HTTPException(status_code=400, detail=_NO_PRICE)
 
         pack = forecast_horizon(
             now_price=seed_price,
@@ -65,21 +98,56 @@ def get_price_forecast(
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"forecast failed: {e}")
 
+class SeriesIn(BaseModel):
+    commodity: str = Field(..., min_length=2)
+    now_price: Optional[float] = Field(None, gt=0, description="Current modal price in ₹/qtl; fetched when absent")
+    district: Optional[str] = None
+    mandi: Optional[str] = None
+    state: Optional[str] = None
+    variety: Optional[str] = None
+    grade: Optional[str] = None
+
+class BatchForecastRequest(BaseModel):
+    series: List[SeriesIn] = Field(..., min_length=1, max_length=200)
+    horizon_days: int = Field(7, ge=1, le=30, description="Days to forecast")
+
+@router.post("/forecast/batch")
+def post_price_forecast_batch(req: BatchForecastRequest) -> Dict:
+    """
+    Forecast many (commodity, district, mandi, now_price) series in one pass.
+    Results are in request order; a series whose current price can't be
+    determined gets {"error": ...} instead of a forecast.
+    """
+    items = [
+        {
+            "commodity": s.commodity,
+            "district": s.district,
+            "market": s.mandi,
+            "state": s.state,
+            "variety": s.variety,
+            "grade": s.grade,
+            "now_price": s.now_price,
+        }
+        for s in req.series
+    ]
+    try:
+        results = _forecast_many(items, req.horizon_days)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"forecast failed: {e}")
+    return {"horizon_days": req.horizon_days, "results": results}
+
 @router.get("/forecast/by-farm/{farm_id}")
 def forecast_by_farm(farm_id: str, horizon_days: int = 7, db: Session = Depends(get_session)) -> Dict:
     farm = db.get(Farm, farm_id)
     if not farm: raise HTTPException(404, "farm not found")
 
-    out = {}
-    for c in (farm.preferred_commodities or [])[:6]:
-        try:
-            pack = forecast_horizon(
-                commodity=c,
-                district=farm.district or None,
-                mandi=farm.preferred_mandi or None,
-                horizon_days=horizon_days,
-            )
-            out[c] = pack
-        except Exception as e:
-            out[c] = {"error": str(e)}
-    return {"horizon_days": horizon_days, "results": out}
\ No newline at end of file
+    commodities = list(farm.preferred_commodities or [])[:6]
+    items = [
+        {"commodity": c, "district": farm.district or None, "market": farm.preferred_mandi or None}
+        for c in commodities
+    ]
+    try:
+        packs = _forecast_many(items, horizon_days)
+    except Exception as e:
+        packs = [{"error": str(e)} for _ in items]
+    return {"horizon_days": horizon_days, "results": dict(zip(commodities, packs))}
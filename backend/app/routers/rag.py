@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
 from backend.app.rag.retrieve import retrieve as rag_retrieve
-from backend.app.services.crop_recommendation import _gemini_call as gemini_call  # re-use your Gemini helper
+from backend.app.services.gemini import agenerate, astream_text
+from backend.app.services.streaming import sse_response, stream_answer, timed_step
 
 router = APIRouter(prefix="/api/rag", tags=["rag"])
 
@@ -56,37 +58,26 @@ def rag_search(req: RagSearchRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"rag search failed: {e}")
 
-@router.post("/answer", response_model=RagAnswerResponse)
-def rag_answer(req: RagAnswerRequest):
-    """
-    Retrieve top-k snippets and ask Gemini to answer USING ONLY those snippets.
-    Returns the answer + a compact list of sources.
-    """
-    try:
-        hits = rag_retrieve(req.question, k=req.k)
-        if not hits:
-            return RagAnswerResponse(
-                answer="Sorry, I couldn't find anything relevant in the knowledge base.",
-                sources=[],
-            )
-
-        # Build numbered context for lightweight citations [S1], [S2], ...
-        numbered = []
-        meta_list: List[Dict[str, Any]] = []
-        for i, h in enumerate(hits, start=1):
-            text = (h.get("text") or "").strip()
-            title = h.get("title") or h.get("source") or f"Doc {i}"
-            page = h.get("page")
-            source = h.get("source")
-            score = float(h.get("score") or 0.0)
-            if not text:
-                continue
-            numbered.append(f"[S{i}] {title}{f', p.{page}' if page is not None else ''}\n{text}")
-            meta_list.append({"label": f"S{i}", "title": title, "source": source, "page": page, "score": score})
-
-        context = "\n\n".join(numbered)
-
-        prompt = f"""You are KrishiMitra. Answer the user's question USING ONLY the sources below.
+NO_HITS_ANSWER = "Sorry, I couldn't find anything relevant in the knowledge base."
+
+def _answer_prompt(req: RagAnswerRequest, hits: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    # Build numbered context for lightweight citations [S1], [S2], ...
+    numbered = []
+    meta_list: List[Dict[str, Any]] = []
+    for i, h in enumerate(hits, start=1):
+        text = (h.get("text") or "").strip()
+        title = h.get("title") or h.get("source") or f"Doc {i}"
+        page = h.get("page")
+        source = h.get("source")
+        score = float(h.get("score") or 0.0)
+        if not text:
+            continue
+        numbered.append(f"[S{i}] {title}{f', p.{page}' if page is not None else ''}\n{text}")
+        meta_list.append({"label": f"S{i}", "title": title, "source": source, "page": page, "score": score})
+
+    context = "\n\n".join(numbered)
+
+    prompt = f"""You are KrishiMitra. Answer the user's question USING ONLY the sources below.
 If the answer is not in the sources, say you don't know.
 Cite with [S#] minimally.
 
@@ -97,8 +88,43 @@ Sources:
 
 Respond in {req.target_language}.
 """
+    return prompt, meta_list
+
+ANSWER_CONFIG = {"temperature": 0.2}
+
+@router.post("/answer", response_model=RagAnswerResponse)
+async def rag_answer(req: RagAnswerRequest):
+    """
+    Retrieve top-k snippets and ask Gemini to answer USING ONLY those snippets.
+    Returns the answer + a compact list of sources.
+    """
+    try:
+        hits = await asyncio.to_thread(rag_retrieve, req.question, k=req.k)
+        if not hits:
+            return RagAnswerResponse(answer=NO_HITS_ANSWER, sources=[])
 
-        answer = gemini_call(prompt)  # your existing sync helper; okay to call directly
+        prompt, meta_list = _answer_prompt(req, hits)
+        answer = await agenerate(prompt, generation_config=ANSWER_CONFIG, timeout=45.0, purpose="rag")
         return RagAnswerResponse(answer=answer.strip(), sources=meta_list)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"rag answer failed: {e}")
+
+@router.post("/answer/stream")
+async def rag_answer_stream(req: RagAnswerRequest):
+    """
+    Same request as /answer, answered as Server-Sent Events: start, progress (retrieval),
+    meta ({"sources": [...]}, before the first token so citations can render early),
+    token..., done | error.
+    """
+    async def prepare():
+        async with timed_step("rag"):
+            hits = await asyncio.to_thread(rag_retrieve, req.question, k=req.k)
+        if not hits:
+            return {"answer": NO_HITS_ANSWER, "meta": {"sources": []}}
+        prompt, meta_list = _answer_prompt(req, hits)
+        return {"prompt": prompt, "meta": {"sources": meta_list}}
+
+    def tokens(ctx: dict):
+        return astream_text(ctx["prompt"], generation_config=ANSWER_CONFIG, timeout=45.0, purpose="rag_stream")
+
+    return sse_response(stream_answer("rag", prepare, tokens))
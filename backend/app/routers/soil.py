@@ -1,25 +1,26 @@
 from __future__ import annotations
 
-from typing import Callable, Dict
+import inspect
+from typing import Awaitable, Callable, Dict, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 
 from backend.app.services.soil import (
     get_soil,
-    resilient_soil_fetcher,
+    resilient_soil_fetcher_async,
     to_response_dict,
 )
 
 router = APIRouter(prefix="/api", tags=["soil"])
 
-# Dependency type for stubbing
-FetchFunc = Callable[[float, float], Dict]
+# Dependency type for stubbing (sync stubs and async fetchers both work)
+FetchFunc = Callable[[float, float], Union[Dict, Awaitable[Dict]]]
 
 def get_fetcher() -> FetchFunc:
-    return resilient_soil_fetcher
+    return resilient_soil_fetcher_async
 
 @router.get("/soil")
-def get_soil_endpoint(
+async def get_soil_endpoint(
     lat: float = Query(..., ge=-90, le=90, description="Latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
     fetcher: FetchFunc = Depends(get_fetcher),
@@ -28,25 +29,29 @@ def get_soil_endpoint(
     Returns SoilGrids topsoil data. If the exact point fails, we automatically
     nudge to the nearest working grid cell and include:
       resolved_latitude, resolved_longitude, resolved_distance_m  (when applicable)
+      probe_count  (SoilGrids calls this lookup needed; 0 when served from the store)
     """
     try:
         # 1) Fetch once (neighbor-aware) and pull any resolution metadata
+        #    (the fetcher hands us our own copy, so popping is safe)
         raw = fetcher(lat, lon)
+        if inspect.isawaitable(raw):
+            raw = await raw
         used_lat = raw.pop("_resolved_lat", None)
         used_lon = raw.pop("_resolved_lon", None)
         used_dist = raw.pop("_resolved_distance_m", None)
+        probe_count = raw.pop("_probe_count", None)
 
         # 2) Normalize the already-fetched payload
         bundle = get_soil(lat, lon, lambda _lat, _lon: raw)
 
-        
-
         # 3) Respond (adds resolved_* if present)
         return to_response_dict(
             bundle,
             resolved_lat=used_lat,
             resolved_lon=used_lon,
             resolved_distance_m=used_dist,
+            probe_count=probe_count,
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"soil fetch failed: {e}")
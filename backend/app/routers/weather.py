@@ -1,16 +1,25 @@
 # backend/app/routers/weather.py (or your existing weather router)
-from fastapi import APIRouter, HTTPException, Query
-from backend.app.services.weather import get_weather, to_response_dict
+from typing import Callable, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from backend.app.services.weather import get_weather, open_meteo_http_fetcher, to_response_dict
 
 router = APIRouter(prefix="/api", tags=["weather"])
 
+# Dependency type for stubbing
+FetchFunc = Callable[[float, float], Dict]
+
+def get_fetcher() -> FetchFunc:
+    return open_meteo_http_fetcher
+
 @router.get("/weather")
 def weather_endpoint(
     lat: float = Query(..., ge=-90, le=90),
     lon: float = Query(..., ge=-180, le=180),
+    fetcher: FetchFunc = Depends(get_fetcher),
 ):
     try:
-        wb = get_weather(lat, lon)
+        wb = get_weather(lat, lon, fetcher)
         return to_response_dict(wb)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"weather fetch failed: {e}")
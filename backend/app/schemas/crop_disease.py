@@ -1,7 +1,7 @@
 # backend/app/schemas/crop_disease.py
 from __future__ import annotations
 
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -14,3 +14,9 @@ class CropDiseaseDetectionResponse(BaseModel):
     prevention_tips: Optional[List[str]] = Field(None, description="Advice for prevention")
     image_path: Optional[str] = Field(None, description="Path to the uploaded image")
     error: Optional[str] = Field(None, description="Error message if detection failed")
+    cache: Optional[Dict[str, Any]] = Field(
+        None, description="Cache use for this request: vit exact|near|miss (+ hamming distance), llm hit|miss"
+    )
+    diagnosis_source: Optional[str] = Field(
+        None, description="Where the diagnosis came from: template | llm_cache | llm"
+    )
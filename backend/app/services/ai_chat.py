@@ -1,36 +1,11 @@
 # backend/app/services/ai_chat.py
 from __future__ import annotations
 
-import os
 from typing import Dict, Optional
 
-import httpx
-
 from backend.app.config import get_settings
-
-DEFAULT_GEMINI_MODEL = (
-    os.getenv("KM_GEMINI_MODEL")
-    or os.getenv("GEMINI_MODEL")
-    or "gemini-2.5-flash"
-)
-
-def _gemini_call(prompt: str, *, model: Optional[str] = None) -> str:
-    s = get_settings()
-    api_key = s.gemini_api_key or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("Missing GEMINI_API_KEY / KM_GEMINI_API_KEY")
-    endpoint = f"https://generativelanguage.googleapis.com/v1/models/{model or DEFAULT_GEMINI_MODEL}:generateContent"
-    body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
-    with httpx.Client(timeout=s.http_timeout_seconds) as client:
-        r = client.post(endpoint, params={"key": api_key}, headers={"Content-Type": "application/json"}, json=body)
-        if r.status_code == 404:
-            raise RuntimeError(f"404 unknown/unsupported Gemini model '{model or DEFAULT_GEMINI_MODEL}' at v1 endpoint")
-        r.raise_for_status()
-        data = r.json()
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
-    except Exception:
-        raise RuntimeError("Unexpected Gemini response shape; no text found")
+from backend.app.services.gemini import DEFAULT_MODEL, agenerate
+from backend.app.services.llm_cache import LLM_CACHE, Semantic, date_bucket, exact_key
 
 def build_context_blob(
     *,
@@ -52,17 +27,13 @@ def build_context_blob(
         lines.append(f"Latest price: {price.get('commodity')} @ {price.get('mandi') or 'N/A'} = ₹{price.get('price')} per {price.get('unit','')}")
     return "\n".join(lines)
 
-def ask_ai(
+def build_ask_prompt(
     *,
     question: str,
-    target_language: Optional[str] = None,  # e.g., "hi" or "Hindi"
+    target_language: Optional[str] = None,
     user_context_text: Optional[str] = None,
     context_structured: Optional[Dict] = None,
-    model: Optional[str] = None,
-) -> Dict:
-    """
-    Returns: { "answer": <string>, "language": <string> }
-    """
+) -> str:
     context_blob = ""
     if context_structured:
         context_blob = build_context_blob(
@@ -73,7 +44,7 @@ def ask_ai(
     tl = (target_language or "").strip()
     lang_line = f"Answer in {tl}." if tl else "Answer in the same language as the user's question."
     user_ctx_line = f"\nFarmer notes: {user_context_text.strip()}" if user_context_text else ""
-    prompt = f"""You are KrishiMitra, a helpful agricultural assistant for Indian farmers.
+    return f"""You are KrishiMitra, a helpful agricultural assistant for Indian farmers.
 
 {lang_line}
 Be concise and actionable. Use bullet points where helpful. Avoid hallucinating; if unknown, say what data is needed.
@@ -85,10 +56,39 @@ Farmer question:
 {question}
 {user_ctx_line}
 """
-    text = _gemini_call(prompt, model=model)
+
+async def ask_ai(
+    *,
+    question: str,
+    target_language: Optional[str] = None,  # e.g., "hi" or "Hindi"
+    user_context_text: Optional[str] = None,
+    context_structured: Optional[Dict] = None,
+    model: Optional[str] = None,
+    cache_context: Optional[Dict] = None,   # e.g. snapped coords / market; see llm_cache
+) -> Dict:
+    """
+    Returns: { "answer": <string>, "language": <string> }
+    """
+    prompt = build_ask_prompt(
+        question=question,
+        target_language=target_language,
+        user_context_text=user_context_text,
+        context_structured=context_structured,
+    )
+    tl = (target_language or "").strip()
+    m = model or DEFAULT_MODEL
+    sem = Semantic(
+        context={"lang": tl or "auto", "day": date_bucket(), "model": m, **(cache_context or {})},
+        text=f"{question}\n{user_context_text or ''}",
+    )
+    text = await LLM_CACHE.acached(
+        "ask", exact_key("ask", m, prompt),
+        lambda: agenerate(prompt, model=m, timeout=get_settings().http_timeout_seconds, purpose="ask"),
+        sem,
+    )
     return {"answer": text.strip(), "language": tl or "auto"}
 
-def translate_text(*, text: str, target_language: str, model: Optional[str] = None) -> Dict:
+async def translate_text(*, text: str, target_language: str, model: Optional[str] = None) -> Dict:
     """
     Returns: { "translated": <string>, "language": <target_language> }
     """
@@ -97,5 +97,10 @@ Return ONLY the translated text, no explanations, no code fences.
 
 Text:
 {text}"""
-    translated = _gemini_call(prompt, model=model)
+    m = model or DEFAULT_MODEL
+    translated = await LLM_CACHE.acached(
+        "translate", exact_key("translate", m, prompt),
+        # exact only: "apply 20 kg urea" must never get the translation of "apply 30 kg urea"
+        lambda: agenerate(prompt, model=m, timeout=get_settings().http_timeout_seconds, purpose="translate"),
+    )
     return {"translated": translated.strip(), "language": target_language}
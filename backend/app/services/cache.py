@@ -0,0 +1,195 @@
+# backend/app/services/cache.py
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+# -----------------------------------------------------------------------------
+# Small in-process caching primitives shared by the service layer.
+#   TTLCache     — thread-safe LRU with per-entry expiry + hit/miss counters
+#   SingleFlight — coalesce concurrent identical loads into one call
+#   SqliteTTLStore — optional on-disk key/value tier with expiry
+# -----------------------------------------------------------------------------
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    LRU cache where every entry carries its own absolute expiry (epoch seconds).
+    `clock` is injectable for tests.
+    """
+
+    def __init__(self, maxsize: int = 1024, default_ttl_s: float = 3600.0, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.default_ttl_s = default_ttl_s
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Live value without touching LRU order or hit/miss counters."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: V, *, ttl_s: Optional[float] = None, expires_at: Optional[float] = None) -> None:
+        if expires_at is None:
+            expires_at = self._clock() + (self.default_ttl_s if ttl_s is None else ttl_s)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, most recently used last."""
+        now = self._clock()
+        with self._lock:
+            return [(k, v) for k, (exp, v) in self._data.items() if exp > now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+        }
+
+
+class SingleFlight:
+    """
+    Thread-level request coalescing: while a load for `key` is running,
+    other callers with the same key wait for it and share its result
+    (or its exception) instead of issuing their own upstream call.
+    """
+
+    class _Call:
+        __slots__ = ("event", "result", "error")
+
+        def __init__(self) -> None:
+            self.event = threading.Event()
+            self.result: Any = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, "SingleFlight._Call"] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], V]) -> V:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class SqliteTTLStore:
+    """
+    Optional disk tier: a tiny key -> text table with absolute expiry, safe to
+    share between uvicorn workers (WAL mode, one connection per thread).
+    """
+
+    def __init__(self, path: str, table: str = "kv"):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[float, str]]:
+        """Returns (expires_at, value) for a live entry, else None."""
+        now = time.time() if now is None else now
+        row = self._conn().execute(
+            f"SELECT expires_at, value FROM {self.table} WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return (float(row[0]), row[1]) if row else None
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+        conn.commit()
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        conn = self._conn()
+        cur = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        conn.commit()
+        return cur.rowcount
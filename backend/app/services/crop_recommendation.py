@@ -1,81 +1,31 @@
 #crop_recommendation.py
 from __future__ import annotations
-from typing import Dict, List, Optional
-import os, json, re
-import httpx
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio, json
+from datetime import date, datetime
 
-from backend.app.config import get_settings
+from backend.app.services import gemini, structured
+from backend.app.services.llm_cache import LLM_CACHE, Semantic, date_bucket, exact_key, snap_coords
 from backend.app.services.weather import get_weather, to_response_dict as weather_to_resp
-from backend.app.services.soil import resilient_soil_fetcher, get_soil, to_response_dict as soil_to_resp
+from backend.app.services.soil import get_soil_async, resolve_soil, to_response_dict as soil_to_resp
 
-GEMINI_MODEL = "gemini-2.5-flash"
-GEMINI_ENDPOINT = f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_MODEL}:generateContent"
+# deterministic-ish JSON output
+GEN_CONFIG = {"temperature": 0.2}
 
-def _gemini_call(prompt: str, *, timeout: float = 45.0) -> str:
-    """
-    Call Gemini v1 and return text. We bias towards JSON-only output.
-    """
-    s = get_settings()
-    api_key = s.gemini_api_key or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("Missing GEMINI_API_KEY")
-
-    body = {
-        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
-        # Hint the model to be concise & deterministic
-        "generationConfig": {
-            "temperature": 0.2,
-        },
-    }
-
-    headers = {"Content-Type": "application/json"}
-    with httpx.Client(timeout=timeout, headers=headers) as client:
-        r = client.post(GEMINI_ENDPOINT, params={"key": api_key}, json=body)
-        r.raise_for_status()
-        data = r.json()
-
-    # extract text
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
-    except Exception:
-        raise RuntimeError("Unexpected Gemini response shape; no text found")
+# JSON mode + schema: the reply is an array of {crop, probability}
+TOP3_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"crop": {"type": "STRING"}, "probability": {"type": "NUMBER"}},
+        "required": ["crop", "probability"],
+    },
+}
 
 # ---------------- JSON parsing helpers ----------------
 
-_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
-
-def _extract_json_array(text: str) -> list:
-    """
-    Try strict json.loads first. If it fails, try to extract the first JSON array
-    substring and parse that. Raise on failure.
-    """
-    text = (text or "").strip()
-    # happy path
-    try:
-        val = json.loads(text)
-        if isinstance(val, list):
-            return val
-    except Exception:
-        pass
-
-    # attempt to extract the first [...] block
-    m = _JSON_ARRAY_RE.search(text)
-    if m:
-        frag = m.group(0)
-        try:
-            val = json.loads(frag)
-            if isinstance(val, list):
-                return val
-        except Exception:
-            pass
-
-    raise ValueError("no JSON array found")
-
-def _normalize_top3(arr: list) -> List[Dict]:
-    """
-    Take any list of dict-like items, build up to 3 {crop, probability} rows.
-    """
+def _top3_rows(arr: list) -> List[Dict]:
+    """Up to 3 {crop, probability} rows from the dict-like items that name a crop."""
     out: List[Dict] = []
     for item in arr:
         if not isinstance(item, dict):
@@ -92,11 +42,35 @@ def _normalize_top3(arr: list) -> List[Dict]:
         out.append({"crop": crop, "probability": prob})
         if len(out) == 3:
             break
-    # pad if needed
-    while len(out) < 3:
-        out.append({"crop": "other", "probability": 0.5})
     return out
 
+def _is_top3(arr: list) -> bool:
+    # a truncated reply recovered to fewer crops is rejected, never padded (it would be cached and stored)
+    return len(_top3_rows(arr)) == 3
+
+def _normalize_top3(arr: list) -> List[Dict]:
+    """Exactly 3 {crop, probability} rows; StructuredOutputError when the reply has fewer."""
+    out = _top3_rows(arr)
+    if len(out) < 3:
+        raise structured.StructuredOutputError(f"expected 3 crops, got {len(out)}")
+    return out
+
+# --------------- Season ----------------
+
+def season_of(d: Optional[date] = None) -> str:
+    """
+    Sowing season tag, e.g. "rabi-2025": kharif Jun–Sep, rabi Oct–Feb (named
+    after the year it starts), zaid Mar–May.
+    """
+    d = d or date.today()
+    if 6 <= d.month <= 9:
+        return f"kharif-{d.year}"
+    if d.month >= 10:
+        return f"rabi-{d.year}"
+    if d.month <= 2:
+        return f"rabi-{d.year - 1}"
+    return f"zaid-{d.year}"
+
 # --------------- Prompting ----------------
 
 def _build_prompt(*, lat: float, lon: float, soil: Optional[Dict], weather: Optional[Dict], rotation_history: Optional[List[str]]) -> str:
@@ -112,7 +86,8 @@ The agricultural calendar has three main seasons. Use the current date to determ
     lines = []
     # Get the current date and format it as YYYY-MM-DD
     current_date = datetime.now().strftime("%Y-%m-%d")
-    lines.append(f"Current Date: {current_date} (This is the start of the Rabi season).")
+    season = season_of().split("-")[0].title()
+    lines.append(f"Current Date: {current_date} (This is the {season} season).")
 
     if soil and soil.get("topsoil"):
         ts = soil["topsoil"]
@@ -151,7 +126,64 @@ Specifics for this location:
 {chr(10).join(lines)}
 """
 
+def _cache_args(prompt: str, lat: float, lon: float, rotation_history: Optional[List[str]]):
+    """Exact key on the prompt; semantic match on same cell + day + rotation (no question text)."""
+    sem = Semantic(context={
+        "cell": snap_coords(lat, lon),
+        "day": date_bucket(),
+        "rotation": [c.strip().lower() for c in rotation_history or []],
+        "model": gemini.DEFAULT_MODEL,
+    })
+    cfg = structured.json_config(GEN_CONFIG, TOP3_SCHEMA)
+    return exact_key("recos", gemini.DEFAULT_MODEL, prompt, cfg), sem
+
+async def arecommend_top3_crops(*, lat: float, lon: float, rotation_history: Optional[List[str]] = None) -> List[Dict]:
+    """Weather + soil (best-effort, concurrently), then Gemini on the event loop."""
+    top3, _ = await arecommend_with_inputs(lat=lat, lon=lon, rotation_history=rotation_history)
+    return top3
+
+async def arecommend_with_inputs(
+    *, lat: float, lon: float, rotation_history: Optional[List[str]] = None, semantic: bool = True
+) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    arecommend_top3_crops plus the weather it was based on (the precompute table
+    keeps its signature). semantic=False skips the semantic cache tier, which
+    ignores the weather: a row recomputed because the weather moved must not get
+    back today's answer for the old weather.
+    """
+    async def weather():
+        try:
+            return weather_to_resp(await asyncio.to_thread(get_weather, lat, lon))
+        except Exception:
+            return None
+
+    async def soil():
+        try:
+            return soil_to_resp((await get_soil_async(lat, lon)).bundle)
+        except Exception:
+            return None
+
+    weather_pack, soil_pack = await asyncio.gather(weather(), soil())
+
+    prompt = _build_prompt(lat=lat, lon=lon, soil=soil_pack, weather=weather_pack, rotation_history=rotation_history)
+
+    async def call() -> str:
+        try:
+            arr = await structured.agenerate_json(
+                prompt, schema=TOP3_SCHEMA, expect=list, accept=_is_top3,
+                generation_config=GEN_CONFIG, timeout=60.0, purpose="recos",
+            )
+            return json.dumps(_normalize_top3(arr))
+        except structured.StructuredOutputError as e:
+            # not cached (acached/cached only store results) and so never precomputed into the table
+            raise RuntimeError(f"LLM parse failed: {e}")
+
+    key, sem = _cache_args(prompt, lat, lon, rotation_history)
+    # the cache holds the parsed top-3, never a reply that still needs repair
+    return json.loads(await LLM_CACHE.acached("recos", key, call, sem if semantic else None)), weather_pack
+
 def recommend_top3_crops(*, lat: float, lon: float, rotation_history: Optional[List[str]] = None) -> List[Dict]:
+    """Blocking variant for scripts/jobs; request handlers use arecommend_top3_crops."""
     # Weather: best-effort
     weather_pack = None
     try:
@@ -163,30 +195,23 @@ def recommend_top3_crops(*, lat: float, lon: float, rotation_history: Optional[L
     # Soil: best-effort (resilient fetcher)
     soil_pack = None
     try:
-        raw = resilient_soil_fetcher(lat, lon)
-        bundle = get_soil(lat, lon, lambda _lat, _lon: raw)
-        soil_pack = soil_to_resp(bundle)
+        soil_pack = soil_to_resp(resolve_soil(lat, lon).bundle)
     except Exception:
         soil_pack = None
 
     # Build prompt & call model
     prompt = _build_prompt(lat=lat, lon=lon, soil=soil_pack, weather=weather_pack, rotation_history=rotation_history)
-    text = _gemini_call(prompt, timeout=60.0)
 
-    # Try to parse
-    try:
-        arr = _extract_json_array(text)
-        return _normalize_top3(arr)
-    except Exception:
-        # One-shot repair: ask the model to convert its own output to valid JSON
-        repair_prompt = (
-            'Reformat the following into ONLY a MINIFIED JSON array of exactly 3 '
-            'objects with fields "crop" (lowercase string) and "probability" (0..1). '
-            'No prose, no code fences.\n\nTEXT:\n' + text
-        )
-        repaired = _gemini_call(repair_prompt, timeout=45.0)
+    def call() -> str:
         try:
-            arr2 = _extract_json_array(repaired)
-            return _normalize_top3(arr2)
-        except Exception as e2:
-            raise RuntimeError(f"LLM parse failed: {e2}")
\ No newline at end of file
+            arr = structured.generate_json(
+                prompt, schema=TOP3_SCHEMA, expect=list, accept=_is_top3,
+                generation_config=GEN_CONFIG, timeout=60.0, purpose="recos",
+            )
+            return json.dumps(_normalize_top3(arr))
+        except structured.StructuredOutputError as e:
+            # not cached (acached/cached only store results) and so never precomputed into the table
+            raise RuntimeError(f"LLM parse failed: {e}")
+
+    key, sem = _cache_args(prompt, lat, lon, rotation_history)
+    return json.loads(LLM_CACHE.cached("recos", key, call, sem))
@@ -0,0 +1,360 @@
+# backend/app/services/gemini.py
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from backend.app.config import get_settings
+from backend.app.services.http_clients import get_async_client, get_client
+from backend.app.services.streaming import gemini_text_deltas
+
+# -----------------------------------------------------------------------------
+# The one Gemini client every LLM call site goes through.
+# Calls run on the event loop (pooled async httpx client), so a slow
+# generation no longer holds a threadpool slot for up to a minute. Each call has:
+#   - a concurrency limit (KM_GEMINI_CONCURRENCY per event loop); waiting for a
+#     slot counts against the call's deadline
+#   - one deadline for the whole call, retries included
+#   - retries with full-jitter backoff on 429/5xx and connection errors,
+#     honouring Retry-After and never sleeping past the deadline
+#   - token + latency accounting per `purpose` (see llm_stats(), /health/llm)
+# generate() is the same thing for scripts and other sync code (sync pooled client).
+# astream_text() streams via streamGenerateContent?alt=sse (SSE endpoints).
+# -----------------------------------------------------------------------------
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return default
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except Exception:
+        return default
+
+API_BASE = "https://generativelanguage.googleapis.com/v1"
+DEFAULT_MODEL = os.getenv("KM_GEMINI_MODEL") or os.getenv("GEMINI_MODEL") or "gemini-2.5-flash"
+MAX_CONCURRENCY = _env_int("KM_GEMINI_CONCURRENCY", 16)
+MAX_RETRIES = _env_int("KM_GEMINI_RETRIES", 2)
+BACKOFF_BASE_S = _env_float("KM_GEMINI_BACKOFF_S", 0.5)
+BACKOFF_MAX_S = 8.0
+CONNECT_TIMEOUT_S = 10.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class GeminiError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _api_key() -> str:
+    key = get_settings().gemini_api_key or os.getenv("GEMINI_API_KEY")
+    if not key:
+        raise RuntimeError("Missing GEMINI_API_KEY / KM_GEMINI_API_KEY")
+    return key
+
+
+def _url(model: str, method: str) -> str:
+    return f"{API_BASE}/models/{model}:{method}"
+
+
+def _body(prompt: str, generation_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+    return body
+
+
+def _text_of(data: Dict[str, Any]) -> str:
+    try:
+        parts = data["candidates"][0]["content"]["parts"]
+        text = "".join(p.get("text") or "" for p in parts)
+    except Exception:
+        raise GeminiError("Unexpected Gemini response shape; no text found")
+    if not text:
+        raise GeminiError(f"Gemini returned no text (finishReason={data['candidates'][0].get('finishReason')})")
+    return text
+
+
+def _check(r: httpx.Response, model: str) -> None:
+    if r.status_code == 404:
+        raise GeminiError(f"404 unknown/unsupported Gemini model '{model}' at v1 endpoint", 404)
+    if r.status_code >= 400:
+        raise GeminiError(f"Gemini HTTP {r.status_code}: {r.text[:300]}", r.status_code)
+
+
+def _retry_after_s(r: Optional[httpx.Response]) -> float:
+    try:
+        return float(r.headers.get("retry-after", 0)) if r is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+def backoff_s(attempt: int, retry_after: float = 0.0) -> float:
+    """Full jitter: uniform(0, base * 2^attempt), capped; never shorter than Retry-After."""
+    return max(retry_after, random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt))))
+
+
+# ---- Accounting ----
+class LLMStats:
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._by_purpose: Dict[str, Dict[str, Any]] = {}
+        self.in_flight = 0
+
+    def _entry(self, purpose: str) -> Dict[str, Any]:
+        e = self._by_purpose.get(purpose)
+        if e is None:
+            e = {"calls": 0, "errors": 0, "timeouts": 0, "retries": 0,
+                 "prompt_tokens": 0, "output_tokens": 0,
+                 "latency_ms": deque(maxlen=self.window), "wait_ms": deque(maxlen=self.window)}
+            self._by_purpose[purpose] = e
+        return e
+
+    def started(self, purpose: str, wait_s: float) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self._entry(purpose)["wait_ms"].append(wait_s * 1000)
+
+    def retried(self, purpose: str) -> None:
+        with self._lock:
+            self._entry(purpose)["retries"] += 1
+
+    def finished(self, purpose: str, *, latency_s: float, usage: Optional[Dict[str, Any]] = None,
+                 error: bool = False, timeout: bool = False, started: bool = True) -> None:
+        with self._lock:
+            if started:
+                self.in_flight -= 1
+            e = self._entry(purpose)
+            e["calls"] += 1
+            e["errors"] += int(error or timeout)
+            e["timeouts"] += int(timeout)
+            e["latency_ms"].append(latency_s * 1000)
+            if usage:
+                e["prompt_tokens"] += int(usage.get("promptTokenCount") or 0)
+                e["output_tokens"] += int(usage.get("candidatesTokenCount") or 0)
+
+    @staticmethod
+    def _pct(samples: Deque[float], q: float) -> Optional[float]:
+        if not samples:
+            return None
+        s = sorted(samples)
+        return round(s[min(len(s) - 1, int(q * len(s)))], 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrency": MAX_CONCURRENCY,
+                "purposes": {
+                    name: {
+                        **{k: v for k, v in e.items() if not isinstance(v, deque)},
+                        "latency_ms_p50": self._pct(e["latency_ms"], 0.5),
+                        "latency_ms_p95": self._pct(e["latency_ms"], 0.95),
+                        "wait_ms_p95": self._pct(e["wait_ms"], 0.95),
+                    }
+                    for name, e in sorted(self._by_purpose.items())
+                },
+            }
+
+STATS = LLMStats()
+
+
+def llm_stats() -> Dict[str, Any]:
+    return STATS.snapshot()
+
+
+# ---- Concurrency limits ----
+# asyncio primitives belong to one loop (tests and scripts run several), so one per loop
+_LIMITERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_SYNC_LIMITER = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+
+def _limiter() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _LIMITERS.get(loop)
+    if sem is None:
+        sem = _LIMITERS.setdefault(loop, asyncio.Semaphore(MAX_CONCURRENCY))
+    return sem
+
+
+@asynccontextmanager
+async def _slot(purpose: str):
+    t0 = time.perf_counter()
+    async with _limiter():
+        STATS.started(purpose, time.perf_counter() - t0)
+        yield
+
+
+# ---- Calls ----
+async def agenerate(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = 45.0,
+    purpose: str = "default",
+) -> str:
+    """Generated text. `timeout` is the deadline for the whole call (slot wait and retries included)."""
+    m = model or DEFAULT_MODEL
+    body = _body(prompt, generation_config)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    t0 = time.perf_counter()
+    started = False
+    try:
+        async with asyncio.timeout(timeout):
+            async with _slot(purpose):
+                started = True
+                attempt = 0
+                while True:
+                    r: Optional[httpx.Response] = None
+                    failure: Optional[Exception] = None
+                    try:
+                        r = await get_async_client("gemini").post(
+                            _url(m, "generateContent"), params={"key": _api_key()}, json=body,
+                            timeout=httpx.Timeout(max(0.1, deadline - loop.time()), connect=CONNECT_TIMEOUT_S),
+                        )
+                        retryable = r.status_code in RETRY_STATUS
+                    except httpx.TransportError as e:
+                        if attempt >= MAX_RETRIES:
+                            raise
+                        failure, retryable = e, True
+                    if retryable and attempt < MAX_RETRIES:
+                        wait = backoff_s(attempt, _retry_after_s(r))
+                        if loop.time() + wait < deadline:
+                            STATS.retried(purpose)
+                            attempt += 1
+                            await asyncio.sleep(wait)
+                            continue
+                    if r is None:
+                        raise failure
+                    _check(r, m)
+                    data = r.json()
+                    text = _text_of(data)
+                    STATS.finished(purpose, latency_s=time.perf_counter() - t0, usage=data.get("usageMetadata"))
+                    return text
+    except TimeoutError:
+        STATS.finished(purpose, latency_s=time.perf_counter() - t0, timeout=True, started=started)
+        raise TimeoutError(f"Gemini call ({purpose}) exceeded its {timeout:.0f}s deadline")
+    except BaseException:      # errors and cancellation (client went away) alike
+        STATS.finished(purpose, latency_s=time.perf_counter() - t0, error=True, started=started)
+        raise
+
+
+def generate(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = 45.0,
+    purpose: str = "default",
+) -> str:
+    """Blocking twin of agenerate() for scripts/CLIs; don't call it from async handlers."""
+    m = model or DEFAULT_MODEL
+    body = _body(prompt, generation_config)
+    deadline = time.monotonic() + timeout
+    t0 = time.perf_counter()
+    if not _SYNC_LIMITER.acquire(timeout=timeout):
+        STATS.finished(purpose, latency_s=time.perf_counter() - t0, timeout=True, started=False)
+        raise TimeoutError(f"Gemini call ({purpose}) got no slot within {timeout:.0f}s")
+    STATS.started(purpose, time.perf_counter() - t0)
+    try:
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Gemini call ({purpose}) exceeded its {timeout:.0f}s deadline")
+            r: Optional[httpx.Response] = None
+            failure: Optional[Exception] = None
+            try:
+                r = get_client("gemini").post(
+                    _url(m, "generateContent"), params={"key": _api_key()}, json=body,
+                    timeout=httpx.Timeout(remaining, connect=min(CONNECT_TIMEOUT_S, remaining)),
+                )
+                retryable = r.status_code in RETRY_STATUS
+            except httpx.TransportError as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                failure, retryable = e, True
+            if retryable and attempt < MAX_RETRIES:
+                wait = backoff_s(attempt, _retry_after_s(r))
+                if time.monotonic() + wait < deadline:
+                    STATS.retried(purpose)
+                    attempt += 1
+                    time.sleep(wait)
+                    continue
+            if r is None:
+                raise failure
+            _check(r, m)
+            data = r.json()
+            text = _text_of(data)
+            STATS.finished(purpose, latency_s=time.perf_counter() - t0, usage=data.get("usageMetadata"))
+            return text
+    except TimeoutError:
+        STATS.finished(purpose, latency_s=time.perf_counter() - t0, timeout=True)
+        raise
+    except Exception:
+        STATS.finished(purpose, latency_s=time.perf_counter() - t0, error=True)
+        raise
+    finally:
+        _SYNC_LIMITER.release()
+
+
+async def astream_text(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = 45.0,
+    purpose: str = "stream",
+) -> AsyncIterator[str]:
+    """
+    Yield answer text as Gemini produces it. `timeout` bounds the wait for each
+    chunk (not the whole answer), so long answers are fine while a stalled one fails.
+    Holds a concurrency slot for the whole stream; retries only before the first byte.
+    """
+    m = model or DEFAULT_MODEL
+    body = _body(prompt, generation_config)
+    usage: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    ok = False
+    async with _slot(purpose):
+        try:
+            attempt = 0
+            while True:
+                async with get_async_client("gemini").stream(
+                    "POST",
+                    _url(m, "streamGenerateContent"),
+                    params={"key": _api_key(), "alt": "sse"},
+                    json=body,
+                    timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT_S),
+                ) as r:
+                    if r.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+                        wait = backoff_s(attempt, _retry_after_s(r))
+                    else:
+                        if r.status_code >= 400:
+                            await r.aread()
+                            _check(r, m)
+                        async for text in gemini_text_deltas(r.aiter_lines(), usage=usage):
+                            yield text
+                        ok = True
+                        return
+                STATS.retried(purpose)
+                attempt += 1
+                await asyncio.sleep(wait)
+        finally:
+            STATS.finished(purpose, latency_s=time.perf_counter() - t0, usage=usage, error=not ok)
@@ -0,0 +1,231 @@
+# backend/app/services/http_clients.py
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+# -----------------------------------------------------------------------------
+# Process-wide pooled HTTP clients, one per upstream service.
+# Every service used to open a fresh httpx.Client per call, so each request
+# paid TCP + TLS setup again. Clients here are created once, keep connections
+# alive per host and are closed by the FastAPI shutdown hook (see main.py).
+# -----------------------------------------------------------------------------
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return default
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except Exception:
+        return default
+
+def _h2_installed() -> bool:
+    try:
+        import h2  # noqa: F401  (installed via httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+HTTP2_ENABLED = os.getenv("KM_HTTP2", "1").lower() not in {"0", "false", "no"} and _h2_installed()
+MAX_CONNECTIONS = _env_int("KM_HTTP_MAX_CONNECTIONS", 100)
+MAX_KEEPALIVE_CONNECTIONS = _env_int("KM_HTTP_MAX_KEEPALIVE", 20)
+KEEPALIVE_EXPIRY_S = _env_float("KM_HTTP_KEEPALIVE_EXPIRY_S", 60.0)
+# same env var the settings object reads for http_timeout_seconds
+DEFAULT_TIMEOUT_S = _env_float("KM_HTTP_TIMEOUT_SECONDS", 10.0)
+
+USER_AGENT = "KrishiMitra/1.0 (+https://krishimitra.example.com)"
+
+
+@dataclass(frozen=True)
+class Upstream:
+    host: str
+    timeout: float = DEFAULT_TIMEOUT_S
+    headers: Dict[str, str] = field(default_factory=dict)
+
+UPSTREAMS: Dict[str, Upstream] = {
+    "open_meteo": Upstream("api.open-meteo.com"),
+    "soilgrids": Upstream("rest.isric.org", timeout=30.0, headers={"Accept": "application/json"}),
+    "agmarknet": Upstream("api.data.gov.in", headers={"User-Agent": USER_AGENT}),
+    "gemini": Upstream("generativelanguage.googleapis.com", timeout=60.0, headers={"Content-Type": "application/json"}),
+}
+
+
+# ---- Metrics ----
+class _ClientStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.responses = 0
+        self.status: Dict[str, int] = {}
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def on_request(self, request: httpx.Request) -> None:
+        request.extensions["km_t0"] = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, response: httpx.Response) -> None:
+        t0 = response.request.extensions.get("km_t0")
+        ms = (time.perf_counter() - t0) * 1000 if t0 else 0.0
+        bucket = f"{response.status_code // 100}xx"
+        with self._lock:
+            self.responses += 1
+            self.status[bucket] = self.status.get(bucket, 0) + 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                # requests that never got a response are either in flight or failed at transport level
+                "in_flight_or_failed": self.requests - self.responses,
+                "status": dict(self.status),
+                "avg_ms": round(self.total_ms / self.responses, 1) if self.responses else None,
+                "max_ms": round(self.max_ms, 1),
+            }
+
+_STATS: Dict[str, _ClientStats] = {name: _ClientStats() for name in UPSTREAMS}
+
+
+# ---- Client registry ----
+_LOCK = threading.Lock()
+_CLIENTS: Dict[str, httpx.Client] = {}
+# async clients are bound to the loop they were created on (scripts may use asyncio.run)
+_ASYNC_CLIENTS: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_S,
+    )
+
+def _upstream(name: str) -> Upstream:
+    try:
+        return UPSTREAMS[name]
+    except KeyError:
+        raise KeyError(f"unknown upstream '{name}' (known: {', '.join(UPSTREAMS)})")
+
+def get_client(name: str) -> httpx.Client:
+    """
+    Shared sync client for an upstream (see UPSTREAMS). Never close it yourself.
+    """
+    client = _CLIENTS.get(name)
+    if client is not None:
+        return client
+    up = _upstream(name)
+    with _LOCK:
+        client = _CLIENTS.get(name)
+        if client is None:
+            stats = _STATS[name]
+            client = httpx.Client(
+                timeout=up.timeout,
+                headers=up.headers,
+                limits=_limits(),
+                http2=HTTP2_ENABLED,
+                event_hooks={"request": [stats.on_request], "response": [stats.on_response]},
+            )
+            _CLIENTS[name] = client
+    return client
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+    """
+    Shared async client for an upstream, bound to the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _ASYNC_CLIENTS.get(name)
+    if entry is not None and entry[0] is loop and not entry[1].is_closed:
+        return entry[1]
+
+    up = _upstream(name)
+    stats = _STATS[name]
+
+    async def _on_request(request: httpx.Request) -> None:
+        stats.on_request(request)
+
+    async def _on_response(response: httpx.Response) -> None:
+        stats.on_response(response)
+
+    client = httpx.AsyncClient(
+        timeout=up.timeout,
+        headers=up.headers,
+        limits=_limits(),
+        http2=HTTP2_ENABLED,
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+    # a client left over from another (finished) loop can't be awaited any more; just replace it
+    with _LOCK:
+        _ASYNC_CLIENTS[name] = (loop, client)
+    return client
+
+
+# ---- Lifecycle (wired into FastAPI startup/shutdown in main.py) ----
+def startup() -> None:
+    """Create all sync clients up front so the first request doesn't pay for it."""
+    for name in UPSTREAMS:
+        get_client(name)
+
+async def shutdown() -> None:
+    with _LOCK:
+        sync_clients = list(_CLIENTS.values())
+        async_clients = list(_ASYNC_CLIENTS.values())
+        _CLIENTS.clear()
+        _ASYNC_CLIENTS.clear()
+    for c in sync_clients:
+        try:
+            c.close()
+        except Exception:
+            pass
+    loop = asyncio.get_running_loop()
+    for owner, c in async_clients:
+        if owner is loop:
+            try:
+                await c.aclose()
+            except Exception:
+                pass
+
+
+def _pool_connections(client) -> Optional[Dict[str, int]]:
+    # best-effort peek into the httpcore pool; attribute names are internal
+    try:
+        pool = client._transport._pool
+        conns = list(pool.connections)
+    except Exception:
+        return None
+    idle = sum(1 for c in conns if c.is_idle())
+    return {"open": len(conns), "idle": idle, "active": len(conns) - idle}
+
+def pool_stats() -> Dict:
+    """
+    Per-upstream usage: request/response counters, latency and open connections.
+    """
+    out: Dict[str, Dict] = {}
+    for name, up in UPSTREAMS.items():
+        entry = _STATS[name].snapshot()
+        entry["host"] = up.host
+        sync_client = _CLIENTS.get(name)
+        async_entry = _ASYNC_CLIENTS.get(name)
+        entry["sync_pool"] = _pool_connections(sync_client) if sync_client is not None else None
+        entry["async_pool"] = _pool_connections(async_entry[1]) if async_entry is not None else None
+        out[name] = entry
+    return {
+        "http2": HTTP2_ENABLED,
+        "limits": {
+            "max_connections": MAX_CONNECTIONS,
+            "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry_s": KEEPALIVE_EXPIRY_S,
+        },
+        "upstreams": out,
+    }
@@ -0,0 +1,274 @@
+# backend/app/services/llm_cache.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.app.services.cache import SqliteTTLStore, TTLCache
+
+# -----------------------------------------------------------------------------
+# Two-level cache in front of Gemini for repetitive advisory prompts.
+#   exact     key = sha256(endpoint, model, generation config, whitespace-
+#             normalized prompt); memory LRU + optional SQLite tier shared by
+#             workers (KM_LLM_CACHE_DB)
+#   semantic  per endpoint, answers are grouped by a structured context that
+#             must match exactly (snapped coords, date bucket, language, ...);
+#             inside a group an answer is reused when the question embedding
+#             is within KM_LLM_SEMANTIC_THRESHOLD cosine. A context with no
+#             question text (crop recommendations) matches on context alone.
+# Both are opt-in per endpoint (KM_LLM_CACHE / KM_LLM_SEMANTIC_CACHE, comma
+# separated) with per-endpoint TTLs (KM_LLM_CACHE_TTL_<ENDPOINT> seconds).
+# Semantic is on only for recos by default: it needs no embeddings there,
+# while ask embeds every question (enable once that is worth it). Translate is
+# exact only and refuses semantic matching: texts that differ in one number are
+# near-identical embeddings but need different translations.
+# -----------------------------------------------------------------------------
+
+def _csv(name: str, default: str) -> List[str]:
+    return [x.strip().lower() for x in os.getenv(name, default).split(",") if x.strip()]
+
+DEFAULT_TTL_S = {
+    "ask": 6 * 3600,
+    "recos": 24 * 3600,
+    "translate": 30 * 24 * 3600,    # advisory strings don't go stale
+}
+EXACT_ENDPOINTS = _csv("KM_LLM_CACHE", "ask,translate,recos")
+EXACT_ONLY_ENDPOINTS = {"translate"}
+SEMANTIC_ENDPOINTS = _csv("KM_LLM_SEMANTIC_CACHE", "recos")
+SEMANTIC_THRESHOLD = float(os.getenv("KM_LLM_SEMANTIC_THRESHOLD", "0.93"))
+SEMANTIC_PER_CONTEXT = 64           # remembered questions per context group
+EMBED_MODEL = os.getenv("KM_LLM_SEMANTIC_EMBED_MODEL", "text-embedding-3-small")
+GRID_DEG = float(os.getenv("KM_LLM_CACHE_GRID_DEG", "0.1"))
+MAXSIZE = int(os.getenv("KM_LLM_CACHE_SIZE", "4096"))
+# empty = memory only
+DISK_PATH = os.getenv("KM_LLM_CACHE_DB", "")
+
+
+def ttl_for(endpoint: str) -> float:
+    return float(os.getenv(f"KM_LLM_CACHE_TTL_{endpoint.upper()}", DEFAULT_TTL_S.get(endpoint, 3600)))
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join((prompt or "").split())
+
+
+def exact_key(endpoint: str, model: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    cfg = json.dumps(generation_config or {}, sort_keys=True)
+    raw = "\x00".join([endpoint, model, cfg, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def snap_coords(lat: Optional[float], lon: Optional[float], grid_deg: float = GRID_DEG) -> Optional[str]:
+    if lat is None or lon is None:
+        return None
+    return f"{round(float(lat) / grid_deg) * grid_deg:.3f},{round(float(lon) / grid_deg) * grid_deg:.3f}"
+
+
+def date_bucket(days: int = 1, now: Optional[float] = None) -> str:
+    """UTC date of the start of the current `days`-long bucket."""
+    t = time.time() if now is None else now
+    start = int(t // (days * 86400)) * days * 86400
+    return datetime.fromtimestamp(start, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+@dataclass
+class Semantic:
+    """What makes two requests interchangeable: same `context`, similar `text` (None = context only)."""
+    context: Dict[str, Any]
+    text: Optional[str] = None
+    vector: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def context_key(self) -> str:
+        return json.dumps(self.context, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _default_embed(text: str) -> List[float]:
+    from backend.app.rag.embedding_cache import get_embeddings
+
+    return get_embeddings(EMBED_MODEL).embed_query(text)
+
+
+class LLMCache:
+    def __init__(
+        self,
+        *,
+        exact_endpoints: Iterable[str] = EXACT_ENDPOINTS,
+        semantic_endpoints: Iterable[str] = SEMANTIC_ENDPOINTS,
+        threshold: float = SEMANTIC_THRESHOLD,
+        embed: Callable[[str], List[float]] = _default_embed,
+        maxsize: int = MAXSIZE,
+        disk_path: str = DISK_PATH,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.exact_endpoints = set(exact_endpoints)
+        self.semantic_endpoints = set(semantic_endpoints) - EXACT_ONLY_ENDPOINTS
+        self.threshold = threshold
+        self._embed = embed
+        self._clock = clock
+        self._exact: TTLCache[str] = TTLCache(maxsize=maxsize, clock=clock)
+        self._disk: Optional[SqliteTTLStore] = SqliteTTLStore(disk_path, table="llm_cache") if disk_path else None
+        # (endpoint, context key) -> [(unit vector | None, answer, expires_at)]
+        self._groups: TTLCache[list] = TTLCache(maxsize=maxsize, default_ttl_s=float("inf"), clock=clock)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.embed_errors = 0
+
+    def _embed_failed(self, what: str, e: Exception) -> None:
+        with self._lock:
+            self.embed_errors += 1
+        print(f"[llm-cache] semantic {what} skipped: {e}")
+
+    def _count(self, endpoint: str, what: str) -> None:
+        with self._lock:
+            c = self._counts.setdefault(endpoint, {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+            c[what] += 1
+
+    # ---- exact ----
+    def get_exact(self, endpoint: str, key: str) -> Optional[str]:
+        if endpoint not in self.exact_endpoints:
+            return None
+        hit = self._exact.get(key)
+        if hit is None and self._disk is not None:
+            row = self._disk.get(key, now=self._clock())
+            if row is not None:
+                expires_at, hit = row
+                self._exact.set(key, hit, expires_at=expires_at)
+        return hit
+
+    def set_exact(self, endpoint: str, key: str, answer: str) -> None:
+        if endpoint not in self.exact_endpoints:
+            return
+        expires_at = self._clock() + ttl_for(endpoint)
+        self._exact.set(key, answer, expires_at=expires_at)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, answer, expires_at)
+            except Exception:
+                pass  # disk tier is best-effort
+
+    # ---- semantic ----
+    def _vector(self, sem: Semantic) -> Optional[np.ndarray]:
+        if sem.text is None:
+            return None
+        if sem.vector is None:
+            v = np.asarray(self._embed(" ".join(sem.text.lower().split())), dtype=np.float32)
+            n = float(np.linalg.norm(v))
+            sem.vector = v / n if n else v
+        return sem.vector
+
+    def get_semantic(self, endpoint: str, sem: Semantic) -> Optional[Tuple[str, float]]:
+        """(answer, similarity) of the closest live entry in the same context, if close enough."""
+        if endpoint not in self.semantic_endpoints:
+            return None
+        group = self._groups.get((endpoint, sem.context_key))
+        if not group:
+            return None
+        v = self._vector(sem)
+        now = self._clock()
+        best: Optional[Tuple[str, float]] = None
+        for vec, answer, expires_at in list(group):
+            if expires_at <= now:
+                continue
+            if v is None or vec is None:
+                sim = 1.0 if v is None and vec is None else 0.0
+            else:
+                sim = float(np.dot(v, vec))
+            if sim >= self.threshold and (best is None or sim > best[1]):
+                best = (answer, sim)
+        return best
+
+    def set_semantic(self, endpoint: str, sem: Semantic, answer: str) -> None:
+        if endpoint not in self.semantic_endpoints:
+            return
+        now = self._clock()
+        v = self._vector(sem)
+        key = (endpoint, sem.context_key)
+        with self._lock:
+            group = [e for e in (self._groups.get(key) or []) if e[2] > now]
+            group.append((v, answer, now + ttl_for(endpoint)))
+            self._groups.set(key, group[-SEMANTIC_PER_CONTEXT:])
+
+    # ---- read-through ----
+    def lookup(self, endpoint: str, key: str, sem: Optional[Semantic]) -> Optional[str]:
+        hit = self.get_exact(endpoint, key)
+        if hit is not None:
+            self._count(endpoint, "exact_hits")
+            return hit
+        if sem is not None and endpoint in self.semantic_endpoints:
+            try:
+                found = self.get_semantic(endpoint, sem)
+            except Exception as e:          # embeddings unavailable: behave as a miss
+                self._embed_failed("lookup", e)
+                found = None
+            if found is not None:
+                self._count(endpoint, "semantic_hits")
+                self.set_exact(endpoint, key, found[0])
+                return found[0]
+        self._count(endpoint, "misses")
+        return None
+
+    def store(self, endpoint: str, key: str, sem: Optional[Semantic], answer: str) -> None:
+        self.set_exact(endpoint, key, answer)
+        if sem is not None and endpoint in self.semantic_endpoints:
+            try:
+                self.set_semantic(endpoint, sem, answer)
+            except Exception as e:
+                self._embed_failed("store", e)
+
+    async def acached(
+        self,
+        endpoint: str,
+        key: str,
+        call: Callable[[], Awaitable[str]],
+        semantic: Optional[Semantic] = None,
+    ) -> str:
+        """Answer from cache or `call()`; the semantic embedding runs in a thread (it may hit the API)."""
+        if endpoint not in self.exact_endpoints and endpoint not in self.semantic_endpoints:
+            return await call()
+        hit = await asyncio.to_thread(self.lookup, endpoint, key, semantic)
+        if hit is not None:
+            return hit
+        answer = await call()
+        await asyncio.to_thread(self.store, endpoint, key, semantic, answer)
+        return answer
+
+    def cached(self, endpoint: str, key: str, call: Callable[[], str], semantic: Optional[Semantic] = None) -> str:
+        if endpoint not in self.exact_endpoints and endpoint not in self.semantic_endpoints:
+            return call()
+        hit = self.lookup(endpoint, key, semantic)
+        if hit is not None:
+            return hit
+        answer = call()
+        self.store(endpoint, key, semantic, answer)
+        return answer
+
+    def clear(self) -> None:
+        self._exact.clear()
+        self._groups.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {k: dict(v) for k, v in self._counts.items()}
+        return {
+            "exact_endpoints": sorted(self.exact_endpoints),
+            "semantic_endpoints": sorted(self.semantic_endpoints),
+            "threshold": self.threshold,
+            "exact": self._exact.stats(),
+            "semantic_groups": len(self._groups),
+            "disk": self._disk.path if self._disk is not None else None,
+            "embed_errors": self.embed_errors,
+            "endpoints": counts,
+        }
+
+
+LLM_CACHE = LLMCache()
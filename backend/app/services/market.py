@@ -131,7 +131,7 @@ def agmarknet_http_fetcher(
     Data.gov.in Agmarknet fetch using resource ID.
     Accepts optional district, commodity, mandi filters.
     """
-    import httpx
+    from backend.app.services.http_clients import get_client
 
     s = get_settings()
     url = f"{API_BASE}/{RESOURCE_ID}"
@@ -149,14 +149,12 @@ def agmarknet_http_fetcher(
         # API field name is 'market' for mandi name
         params["filters[market]"] = mandi
 
-    headers = {"User-Agent": USER_AGENT}
-
-    with httpx.Client(timeout=s.http_timeout_seconds, headers=headers) as client:
-        r = client.get(url, params=params)
-        r.raise_for_status()
-        data = r.json()
-        if isinstance(data, dict) and "records" in data:
-            return list(data["records"])
-        if isinstance(data, list):
-            return data
-        return []
+    # pooled client sends USER_AGENT; keep the configured per-request timeout
+    r = get_client("agmarknet").get(url, params=params, timeout=s.http_timeout_seconds)
+    r.raise_for_status()
+    data = r.json()
+    if isinstance(data, dict) and "records" in data:
+        return list(data["records"])
+    if isinstance(data, list):
+        return data
+    return []
@@ -0,0 +1,216 @@
+# backend/app/services/model_registry.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# -----------------------------------------------------------------------------
+# Model registry.
+# Services register a loader (and optional warmup) at import time; the app
+# loads them once, under a per-model lock, at startup:
+#   KM_MODEL_LOAD_MODE=eager       load + warm up before serving (default)
+#   KM_MODEL_LOAD_MODE=background  serve immediately, load in a thread
+#   KM_MODEL_LOAD_MODE=lazy        load on first use
+# Whatever the mode, get() loads on demand, so a failed or skipped load is
+# retried by the next request. /health/models reports readiness so a load
+# balancer can hold traffic until a worker is warm; since no request reaches a
+# worker held that way, eager/background startup keeps retrying failed
+# required models in a thread (backoff KM_MODEL_RETRY_S doubling up to
+# KM_MODEL_RETRY_MAX_S) until they load or stop() is called. Only required models gate
+# readiness; optional ones (register(..., required=False), e.g. the price
+# forecaster, whose artifacts a deployment may not ship) are reported but a
+# failed or pending optional model never holds traffic.
+# -----------------------------------------------------------------------------
+
+LOAD_MODE = os.getenv("KM_MODEL_LOAD_MODE", "eager").strip().lower()
+LOAD_MODES = ("eager", "background", "lazy")
+RETRY_S = float(os.getenv("KM_MODEL_RETRY_S", "5"))
+RETRY_MAX_S = float(os.getenv("KM_MODEL_RETRY_MAX_S", "300"))
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class _Entry:
+    name: str
+    loader: Callable[[], Any]
+    warmup: Optional[Callable[[Any], None]] = None
+    required: bool = True
+    state: str = "pending"          # pending | loading | ready | failed
+    value: Any = None
+    error: Optional[str] = None
+    load_s: Optional[float] = None
+    warmup_s: Optional[float] = None
+    rss_delta_mb: Optional[float] = None
+    loaded_at: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "load_s": round(self.load_s, 3) if self.load_s is not None else None,
+            "warmup_s": round(self.warmup_s, 3) if self.warmup_s is not None else None,
+            # RSS growth while loading; approximate when other threads allocate too
+            "rss_delta_mb": self.rss_delta_mb,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.mode = "lazy"
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.retries = 0
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        *,
+        warmup: Optional[Callable[[Any], None]] = None,
+        required: bool = True,
+    ) -> None:
+        """Idempotent: re-registering keeps an already-loaded value. `required=False` keeps it out of ready()."""
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(name=name, loader=loader, warmup=warmup, required=required)
+
+    def _entry(self, name: str) -> _Entry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"unknown model '{name}' (registered: {', '.join(self._entries) or 'none'})")
+
+    def get(self, name: str) -> Any:
+        """The loaded model, loading (and warming) it first if needed."""
+        e = self._entry(name)
+        if e.state == "ready":
+            return e.value
+        return self.load(name)
+
+    def peek(self, name: str) -> Any:
+        """The loaded model or None — never triggers a load."""
+        e = self._entries.get(name)
+        return e.value if e is not None and e.state == "ready" else None
+
+    def load(self, name: str) -> Any:
+        e = self._entry(name)
+        with e.lock:
+            if e.state == "ready":
+                return e.value        # another thread finished while we waited
+            e.state = "loading"
+            rss0 = _rss_bytes()
+            t0 = time.perf_counter()
+            try:
+                value = e.loader()
+                t1 = time.perf_counter()
+                if e.warmup is not None:
+                    e.warmup(value)
+                t2 = time.perf_counter()
+            except Exception as ex:
+                e.state = "failed"
+                e.error = f"{type(ex).__name__}: {ex}"
+                raise
+            rss1 = _rss_bytes()
+            e.value = value
+            e.load_s = t1 - t0
+            e.warmup_s = t2 - t1 if e.warmup is not None else None
+            e.rss_delta_mb = round((rss1 - rss0) / 2**20, 1) if rss0 is not None and rss1 is not None else None
+            e.loaded_at = time.time()
+            e.error = None
+            e.state = "ready"
+            return value
+
+    def reset(self, name: str) -> None:
+        """Drop a loaded model (e.g. its artifacts changed on disk); the next get() reloads it."""
+        e = self._entries.get(name)
+        if e is None:
+            return
+        with e.lock:
+            e.value = None
+            e.state = "pending"
+
+    def load_all(self) -> None:
+        """Load every registered model; a failure is recorded and does not stop the others."""
+        for name in list(self._entries):
+            try:
+                self.get(name)
+            except Exception as ex:
+                print(f"[models] {name} failed to load: {ex}")
+
+    def _failed_required(self) -> List[str]:
+        return [n for n, e in self._entries.items() if e.required and e.state == "failed"]
+
+    def _retry_failed(self) -> None:
+        """Reload failed required models with exponential backoff until none is left or stop()."""
+        delay_s, max_delay_s = RETRY_S, RETRY_MAX_S
+        while self._failed_required() and not self._stop.wait(delay_s):
+            for name in self._failed_required():
+                self.retries += 1
+                try:
+                    self.get(name)
+                    print(f"[models] {name} loaded on retry")
+                except Exception as ex:
+                    print(f"[models] {name} retry failed (next in {min(delay_s * 2, max_delay_s):.0f}s): {ex}")
+            delay_s = min(delay_s * 2, max_delay_s)
+
+    def _load_and_retry(self) -> None:
+        self.load_all()
+        self._retry_failed()
+
+    def start(self, mode: str = LOAD_MODE) -> None:
+        if mode not in LOAD_MODES:
+            raise ValueError(f"KM_MODEL_LOAD_MODE must be one of {LOAD_MODES}, got '{mode}'")
+        self.mode = mode
+        self._stop.clear()
+        if mode == "eager":
+            self.load_all()
+            if self._failed_required() and self._thread is None:
+                self._thread = threading.Thread(target=self._retry_failed, name="model-retry", daemon=True)
+                self._thread.start()
+        elif mode == "background" and self._thread is None:
+            self._thread = threading.Thread(target=self._load_and_retry, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop retrying failed loads (shutdown)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def ready(self) -> bool:
+        """Lazy mode never waits; otherwise every required model must be loaded."""
+        if self.mode == "lazy":
+            return True
+        return all(e.state == "ready" for e in self._entries.values() if e.required)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "ready": self.ready(),
+            # optional models that aren't serving (features degraded, traffic not held)
+            "degraded": sorted(n for n, e in self._entries.items() if not e.required and e.state != "ready"),
+            "retrying": self._thread is not None and self._thread.is_alive() and bool(self._failed_required()),
+            "retries": self.retries,
+            "rss_mb": round(r / 2**20, 1) if (r := _rss_bytes()) is not None else None,
+            "models": {name: e.snapshot() for name, e in self._entries.items()},
+        }
+
+
+REGISTRY = ModelRegistry()
@@ -3,43 +3,66 @@ from __future__ import annotations
 
 import os
 import json
+import threading
 import datetime as dt
+from dataclasses import dataclass
 from typing import Dict, Any, List, Optional, Tuple
 
 import numpy as np
-import pandas as pd
 from joblib import load
 
+from backend.app.services.cache import TTLCache
+from backend.app.services.model_registry import REGISTRY
+
 # -----------------------------------------------------------------------------
 # Artifacts (same layout as your reference)
 # -----------------------------------------------------------------------------
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 MODEL_DIR = os.getenv("PRICE_GLOBAL_MODEL_DIR", os.path.join(PROJECT_ROOT, "models", "pricing_global"))
 
-_M20 = _M50 = _M80 = _META = _ENC = None
+MODEL_NAME = "price_forecast"
 
 def _artifact_path(name: str) -> str:
     return os.path.join(MODEL_DIR, name)
 
-def _load_artifacts():
+@dataclass(frozen=True)
+class _Artifacts:
+    m20: Any
+    m50: Any
+    m80: Any
+    meta: Dict[str, Any]
+    enc: Dict[str, Any]
+    engine: "_Engine"
+    sig: Tuple              # _artifact_signature() at load time
+
+def _read_artifacts() -> _Artifacts:
     """
-    Loads p20/p50/p80 models, meta.json, and encoder.json once.
-    Mirrors your reference loader.
+    Loads p20/p50/p80 models, meta.json, and encoder.json.
+    Mirrors your reference loader; called once by the model registry.
     """
-    global _M20, _M50, _M80, _META, _ENC
-    if _M50 is None:
-        _M20 = load(_artifact_path("model_p20.joblib"))
-        _M50 = load(_artifact_path("model_p50.joblib"))
-        _M80 = load(_artifact_path("model_p80.joblib"))
-        with open(_artifact_path("meta.json"), "r", encoding="utf-8") as f:
-            _META = json.load(f)
-        enc_path = _artifact_path("encoder.json")
-        if os.path.exists(enc_path):
-            with open(enc_path, "r", encoding="utf-8") as f:
-                _ENC = json.load(f)
-        else:
-            _ENC = {"commodity": {}, "state": {}, "district": {}, "market": {}, "variety": {}, "grade": {}}
-    return _M20, _M50, _M80, _META, _ENC
+    sig = _artifact_signature()
+    m20 = load(_artifact_path("model_p20.joblib"))
+    m50 = load(_artifact_path("model_p50.joblib"))
+    m80 = load(_artifact_path("model_p80.joblib"))
+    with open(_artifact_path("meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    enc_path = _artifact_path("encoder.json")
+    if os.path.exists(enc_path):
+        with open(enc_path, "r", encoding="utf-8") as f:
+            enc = json.load(f)
+    else:
+        enc = {"commodity": {}, "state": {}, "district": {}, "market": {}, "variety": {}, "grade": {}}
+    return _Artifacts(m20, m50, m80, meta, enc, _Engine((m20, m50, m80), meta), sig)
+
+def _warmup(art: _Artifacts) -> None:
+    # one synthetic step through all three boosters (first predict pays one-off setup costs)
+    X = art.engine.matrix([{}])
+    art.engine.fill_step(X, _RingHistory(np.array([1000.0])), dt.date.today())
+    art.engine.predict(X)
+
+def _load_artifacts():
+    art: _Artifacts = REGISTRY.get(MODEL_NAME)
+    return art.m20, art.m50, art.m80, art.meta, art.enc
 
 # -----------------------------------------------------------------------------
 # Encoders & feature builders (trimmed to what we need)
@@ -47,71 +70,175 @@ def _load_artifacts():
 def _encode_id(enc_map: Dict[str, int], key: Optional[str]) -> int:
     return int(enc_map.get(str(key), 0)) if key is not None else 0
 
-def _make_feat_row_from_hist(
-    hist_df: pd.DataFrame,
-    fdate: pd.Timestamp,
-    ids: Dict[str, int],
-) -> Dict[str, float]:
-    tail = hist_df.sort_values("date")["modal_price"].astype(float)
-    if len(tail) == 0:
-        tail = pd.Series([0.0])
-    row = {
-        "doy": float(fdate.timetuple().tm_yday),
-        "dow": float(fdate.weekday()),
-        "month": float(fdate.month),
-        "commodity_id": float(ids.get("commodity_id", 0)),
-        "state_id": float(ids.get("state_id", 0)),
-        "district_id": float(ids.get("district_id", 0)),
-        "market_id": float(ids.get("market_id", 0)),
-        "variety_id": float(ids.get("variety_id", 0)),
-        "grade_id": float(ids.get("grade_id", 0)),
-    }
-    for L in (1, 7, 14, 28):
-        row[f"lag_{L}"] = float(tail.iloc[-1]) if len(tail) < L else float(tail.iloc[-L])
-    for W in (7, 14, 28):
-        tw = tail.iloc[-W:] if len(tail) >= W else tail
-        row[f"rollmean_{W}"] = float(tw.mean())
-        row[f"rollstd_{W}"] = float(tw.std() if len(tw) > 1 else 0.0)
-    return row
-
-def _adjust_quantiles(p50: float, p20: float, p80: float) -> tuple[float, float, float]:
-    """
-    Bias-correct and gently widen bands using residual stats from meta.json.
-    """
-    _, _, _, meta, _ = _load_artifacts()
-    shift = float(meta.get("resid_median", 0.0) or 0.0)
-    std = float(meta.get("resid_std", 0.0) or 0.0)
-    widen_k = 0.2
-    p50a = p50 + shift
-    p20a = p20 + shift - widen_k * std
-    p80a = p80 + shift + widen_k * std
-    mid = p50a
-    lo = min(p20a, mid)
-    hi = max(p80a, mid)
-    return mid, lo, hi
-
-def _predict_one(model, Xf: pd.DataFrame) -> float:
+# -----------------------------------------------------------------------------
+# NumPy forecasting engine
+# The recursive forecast only ever needs the last 28 prices, so each series
+# keeps them in a ring buffer with running window sums (anchored at the seed
+# price to avoid cancellation in the variance). Rows are (N,) vectors so the
+# same state can step several series at once.
+# Semantics match the original pandas builder: lag_L falls back to the last
+# price while history is shorter than L; rolling std is ddof=1 and 0 for a
+# single value.
+# -----------------------------------------------------------------------------
+LAGS = (1, 7, 14, 28)
+WINDOWS = (7, 14, 28)
+_CAP = max(max(LAGS), max(WINDOWS))
+WIDEN_K = 0.2
+
+class _RingHistory:
+    def __init__(self, seed: np.ndarray):
+        seed = np.asarray(seed, dtype=np.float64)
+        self.buf = np.zeros((seed.shape[0], _CAP))
+        self.n = 0
+        self.anchor = seed.copy()
+        self.sums = np.zeros((len(WINDOWS), seed.shape[0]))
+        self.sqsums = np.zeros((len(WINDOWS), seed.shape[0]))
+        self.push(seed)
+
+    def push(self, x: np.ndarray) -> None:
+        y = x - self.anchor
+        for i, W in enumerate(WINDOWS):
+            if self.n >= W:
+                # value leaving the window (read before the slot is overwritten)
+                old = self.buf[:, (self.n - W) % _CAP] - self.anchor
+                self.sums[i] -= old
+                self.sqsums[i] -= old * old
+            self.sums[i] += y
+            self.sqsums[i] += y * y
+        self.buf[:, self.n % _CAP] = x
+        self.n += 1
+
+    def lag(self, L: int) -> np.ndarray:
+        back = 1 if self.n < L else L
+        return self.buf[:, (self.n - back) % _CAP]
+
+    def roll(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        m = min(self.n, WINDOWS[i])
+        s, ss = self.sums[i], self.sqsums[i]
+        mean = self.anchor + s / m
+        if m <= 1:
+            return mean, np.zeros_like(mean)
+        var = (ss - s * s / m) / (m - 1)
+        return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+class _Engine:
+    """Boosters, feature layout and residual-adjust params resolved once per artifact load."""
+
+    def __init__(self, models, meta: Dict[str, Any]):
+        self.predictors = tuple(_raw_predictor(m) for m in models)
+        self.features: List[str] = list(meta.get("features", []))
+        self.col = {name: i for i, name in enumerate(self.features)}
+        self.shift = float(meta.get("resid_median", 0.0) or 0.0)
+        self.std = float(meta.get("resid_std", 0.0) or 0.0)
+
+    def matrix(self, ids: List[Dict[str, int]]) -> np.ndarray:
+        """(N, F) feature matrix with the static id columns filled in; absent features stay 0."""
+        X = np.zeros((len(ids), len(self.features)))
+        for key in ("commodity_id", "state_id", "district_id", "market_id", "variety_id", "grade_id"):
+            j = self.col.get(key)
+            if j is not None:
+                X[:, j] = [float(r.get(key, 0)) for r in ids]
+        return X
+
+    def _put(self, X: np.ndarray, name: str, value) -> None:
+        j = self.col.get(name)
+        if j is not None:
+            X[:, j] = value
+
+    def fill_step(self, X: np.ndarray, hist: _RingHistory, fdate: dt.date) -> None:
+        self._put(X, "doy", float(fdate.timetuple().tm_yday))
+        self._put(X, "dow", float(fdate.weekday()))
+        self._put(X, "month", float(fdate.month))
+        for L in LAGS:
+            self._put(X, f"lag_{L}", hist.lag(L))
+        for i, W in enumerate(WINDOWS):
+            mean, std = hist.roll(i)
+            self._put(X, f"rollmean_{W}", mean)
+            self._put(X, f"rollstd_{W}", std)
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        y20, y50, y80 = (np.asarray(p(X), dtype=np.float64) for p in self.predictors)
+        return y20, y50, y80
+
+    def adjust(self, y20: np.ndarray, y50: np.ndarray, y80: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Bias-correct and gently widen bands using residual stats from meta.json.
+        Returns (p50_adj, p20_adj, p80_adj).
+        """
+        mid = y50 + self.shift
+        lo = np.minimum(y20 + self.shift - WIDEN_K * self.std, mid)
+        hi = np.maximum(y80 + self.shift + WIDEN_K * self.std, mid)
+        return mid, lo, hi
+
+
+def _raw_predictor(model):
     """
-    Robust prediction that works whether the artifact is an sklearn wrapper
-    (lightgbm.sklearn.LGBMRegressor) or a raw Booster.
+    Predict on a raw ndarray. sklearn wrappers (LGBMRegressor) are unwrapped to
+    their Booster so we skip DataFrame conversion and feature-name validation.
     """
-    try:
-        # happy path: sklearn-style model
-        return float(model.predict(Xf)[0])
-    except Exception:
-        # try underlying booster if present
-        booster = getattr(model, "booster_", None)
-        if booster is not None:
-            return float(booster.predict(Xf.values)[0])
-        # or the model itself is a Booster
+    booster = getattr(model, "booster_", None)
+    target = booster if booster is not None else model
+    return target.predict
+
+def _get_engine() -> _Engine:
+    art: _Artifacts = REGISTRY.get(MODEL_NAME)
+    return art.engine
+
+# optional: deployments without the model_p*.joblib artifacts still serve everything else
+REGISTRY.register(MODEL_NAME, _read_artifacts, warmup=_warmup, required=False)
+
+
+# -----------------------------------------------------------------------------
+# Forecast cache
+# A forecast is fully determined by (encoded ids, start date, seed price), and
+# the first H steps of a longer run are exactly the H-step forecast, so one
+# entry per key holds the longest horizon computed so far and shorter requests
+# slice it. Seeds are quantized to PRICE_QUANTUM (and the model is run on the
+# quantized seed) so near-identical prices share an entry. Any change to the
+# artifact files (mtime/size) reloads the models and empties the cache.
+# -----------------------------------------------------------------------------
+PRICE_QUANTUM = float(os.getenv("KM_FORECAST_PRICE_QUANTUM", "1"))   # ₹/qtl
+_FORECASTS: TTLCache[List[Dict[str, Any]]] = TTLCache(
+    maxsize=int(os.getenv("KM_FORECAST_CACHE_SIZE", "4096")),
+    default_ttl_s=36 * 3600.0,      # keys carry the date; this only bounds stale days
+)
+_ARTIFACT_FILES = ("model_p20.joblib", "model_p50.joblib", "model_p80.joblib", "meta.json", "encoder.json")
+_SIG_LOCK = threading.Lock()
+
+def _quantize(price: float) -> float:
+    return round(price / PRICE_QUANTUM) * PRICE_QUANTUM if PRICE_QUANTUM > 0 else price
+
+def _artifact_signature() -> Tuple:
+    sig = []
+    for name in _ARTIFACT_FILES:
         try:
-            return float(model.predict(Xf.values)[0])
-        except Exception as e:
-            # surface the original context so you can see which artifact failed
-            raise RuntimeError(f"model predict failed ({type(model).__name__}): {e}")
+            st = os.stat(_artifact_path(name))
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((name, None, None))
+    return tuple(sig)
+
+def _refresh_if_artifacts_changed() -> None:
+    art: Optional[_Artifacts] = REGISTRY.peek(MODEL_NAME)
+    if art is None:
+        return      # nothing loaded yet; the next load picks up whatever is on disk
+    with _SIG_LOCK:
+        if REGISTRY.peek(MODEL_NAME) is art and art.sig != _artifact_signature():
+            REGISTRY.reset(MODEL_NAME)
+            _FORECASTS.clear()
+
+def forecast_cache_stats() -> Dict[str, Any]:
+    out = _FORECASTS.stats()
+    out["price_quantum"] = PRICE_QUANTUM
+    return out
+
+
 # -----------------------------------------------------------------------------
 # Public: price forecast only (no sell/wait)
 # -----------------------------------------------------------------------------
+_SERIES_KEYS = ("commodity", "state", "district", "market", "variety", "grade")
+
 def forecast_horizon(
     *,
     now_price: float,
@@ -128,67 +255,103 @@ def forecast_horizon(
     Returns { context: {...}, forecast: [{date, p20,p50,p80,p20_adj,p50_adj,p80_adj}, ...] }
     Uses the same global quantile models as your reference, but ONLY produces a forecast.
     """
-    m20, m50, m80, meta, enc = _load_artifacts()
-    features: List[str] = meta.get("features", [])
+    series = {
+        "now_price": now_price,
+        "commodity": commodity,
+        "state": state,
+        "district": district,
+        "market": market,
+        "variety": variety,
+        "grade": grade,
+    }
+    return forecast_batch([series], now_date=now_date, horizon_days=horizon_days)[0]
 
-    # 1) History seeded with the current price
+def forecast_batch(
+    series: List[Dict[str, Any]],
+    *,
+    now_date: Optional[dt.date] = None,
+    horizon_days: int = 7,
+) -> List[Dict[str, Any]]:
+    """
+    Forecast N series together. Each item needs `now_price` and `commodity`
+    (state/district/market/variety/grade optional). Every horizon step is one
+    (N, F) matrix per quantile model, so cost grows with the horizon, not N x H.
+    Returns one forecast_horizon-shaped pack per series, in input order;
+    series already in the forecast cache (or duplicated in the batch) are
+    not recomputed.
+    """
+    if not series:
+        return []
+    _refresh_if_artifacts_changed()
+    _, _, _, _, enc = _load_artifacts()
     today = now_date or dt.date.today()
-    hist = pd.DataFrame([{"date": pd.to_datetime(today), "modal_price": float(now_price)}])
-
-    # 2) Encode categorical IDs from exported encoder
-    ids = {
-        "commodity_id": _encode_id(enc.get("commodity", {}), commodity),
-        "state_id": _encode_id(enc.get("state", {}), state),
-        "district_id": _encode_id(enc.get("district", {}), district),
-        "market_id": _encode_id(enc.get("market", {}), market),
-        "variety_id": _encode_id(enc.get("variety", {}), variety),
-        "grade_id": _encode_id(enc.get("grade", {}), grade),
-    }
 
-    # 3) Roll forward for H days
-    out: List[Dict[str, Any]] = []
-    base_date = pd.to_datetime(today)
+    ids = [{f"{k}_id": _encode_id(enc.get(k, {}), s.get(k)) for k in _SERIES_KEYS} for s in series]
+    seeds = [_quantize(float(s["now_price"])) for s in series]
+    keys = [(tuple(i.values()), today.isoformat(), seed) for i, seed in zip(ids, seeds)]
+
+    # cache hits need a cached run at least as long as the request (prefix reuse)
+    runs: Dict[Tuple, List[Dict[str, Any]]] = {}
+    todo: Dict[Tuple, int] = {}         # key -> first series index needing it
+    for i, key in enumerate(keys):
+        if key in runs or key in todo:
+            continue
+        hit = _FORECASTS.get(key)
+        if hit is not None and len(hit) >= horizon_days:
+            runs[key] = hit
+        else:
+            todo[key] = i
+    if todo:
+        idx = list(todo.values())
+        computed = _run_engine([ids[i] for i in idx], [seeds[i] for i in idx], today, horizon_days)
+        for key, rows in zip(todo, computed):
+            _FORECASTS.set(key, rows)
+            runs[key] = rows
+
+    return [
+        {
+            "context": {
+                **{k: s.get(k) for k in _SERIES_KEYS},
+                "now_price": s["now_price"],
+                "now_date": today.isoformat(),
+                "model_dir": MODEL_DIR,
+            },
+            "forecast": [dict(r) for r in runs[key][:horizon_days]],
+        }
+        for s, key in zip(series, keys)
+    ]
+
+def _run_engine(
+    ids: List[Dict[str, int]],
+    seeds: List[float],
+    today: dt.date,
+    horizon_days: int,
+) -> List[List[Dict[str, Any]]]:
+    """Forecast rows for each series (one (N, F) matrix per step and quantile model)."""
+    engine = _get_engine()
+
+    # 1) History seeded with the current prices
+    hist = _RingHistory(np.array(seeds, dtype=np.float64))
+    X = engine.matrix(ids)
+
+    # 2) Roll forward for H days
+    cols: Dict[str, List[np.ndarray]] = {k: [] for k in ("p20", "p50", "p80", "p20_adj", "p50_adj", "p80_adj")}
+    dates: List[str] = []
     for d in range(1, horizon_days + 1):
-        fdate = base_date + pd.Timedelta(days=d)
-        row = _make_feat_row_from_hist(hist, fdate, ids)
-        Xf = pd.DataFrame([row])
-
-        # align features
-        for col in features:
-            if col not in Xf.columns:
-                Xf[col] = 0.0
-        Xf = Xf[features]
-
-        y20 = _predict_one(m20, Xf)
-        y50 = _predict_one(m50, Xf)
-        y80 = _predict_one(m80, Xf)
-
-        y50a, y20a, y80a = _adjust_quantiles(y50, y20, y80)
-
-        out.append({
-            "date": fdate.date().isoformat(),
-            "p20": int(round(y20)),
-            "p50": int(round(y50)),
-            "p80": int(round(y80)),
-            "p20_adj": int(round(y20a)),
-            "p50_adj": int(round(y50a)),
-            "p80_adj": int(round(y80a)),
-        })
+        fdate = today + dt.timedelta(days=d)
+        engine.fill_step(X, hist, fdate)
+        y20, y50, y80 = engine.predict(X)
+        y50a, y20a, y80a = engine.adjust(y20, y50, y80)
+        for k, v in (("p20", y20), ("p50", y50), ("p80", y80), ("p20_adj", y20a), ("p50_adj", y50a), ("p80_adj", y80a)):
+            cols[k].append(v)
+        dates.append(fdate.isoformat())
 
         # recursive step: feed adjusted median forward
-        hist = pd.concat([hist, pd.DataFrame([{"date": fdate, "modal_price": y50a}])], ignore_index=True)
-
-    return {
-        "context": {
-            "commodity": commodity,
-            "state": state,
-            "district": district,
-            "market": market,
-            "variety": variety,
-            "grade": grade,
-            "now_price": now_price,
-            "now_date": today.isoformat(),
-            "model_dir": MODEL_DIR,
-        },
-        "forecast": out,
-    }
+        hist.push(y50a)
+
+    # (H, N) -> per-series rows of ints
+    grid = {k: np.rint(np.stack(v)).astype(int) for k, v in cols.items()}
+    return [
+        [{"date": dates[h], **{k: int(grid[k][h, i]) for k in grid}} for h in range(horizon_days)]
+        for i in range(len(seeds))
+    ]
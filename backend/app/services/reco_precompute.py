@@ -0,0 +1,229 @@
+# backend/app/services/reco_precompute.py
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from backend.app.services.crop_recommendation import arecommend_with_inputs, season_of
+from backend.app.services.weather import WEATHER_CACHE, to_response_dict as weather_to_resp
+from backend.app.services.weather_cache import GRID_DEG, cell_center, snap_to_cell
+
+# -----------------------------------------------------------------------------
+# Precomputed crop recommendations (table crop_recommendations).
+# A recommendation depends on the weather-grid cell, the sowing season and the
+# recent rotation, so it is computed once per (cell, season, rotation) at the
+# cell centre — nightly by jobs/precompute_recos.py, or live on a miss — and
+# served from the table afterwards.
+# Staleness, tied to the weather cache:
+#   fresh    younger than KM_RECO_FRESH_S and, if the weather cache holds a
+#            forecast for the cell right now, the same coarse forecast
+#            signature (3-day rain / max temperature buckets) as when computed
+#   stale    otherwise, up to KM_RECO_MAX_STALE_S: served immediately and
+#            recomputed in the background
+#   expired  older than that, other season or missing: computed live
+# -----------------------------------------------------------------------------
+
+FRESH_S = float(os.getenv("KM_RECO_FRESH_S", str(26 * 3600)))          # nightly job + slack
+MAX_STALE_S = float(os.getenv("KM_RECO_MAX_STALE_S", str(7 * 24 * 3600)))
+ROTATION_DEPTH = 3      # most recent crops that make a rotation distinct
+
+
+def cell_key(lat: float, lon: float, grid_deg: float = GRID_DEG) -> Tuple[str, float, float]:
+    """(key, centre lat, centre lon) of the weather-grid cell holding the point."""
+    cell = snap_to_cell(lat, lon, grid_deg)
+    c_lat, c_lon = cell_center(cell, grid_deg)
+    return f"{grid_deg}:{cell[0]}:{cell[1]}", c_lat, c_lon
+
+
+def rotation_key(rotation_history: Optional[List[str]]) -> str:
+    crops = [c.strip().lower() for c in rotation_history or [] if c and c.strip()]
+    return "|".join(crops[:ROTATION_DEPTH])
+
+
+def rotation_list(key: str) -> List[str]:
+    return key.split("|") if key else []
+
+
+def weather_signature(weather: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Coarse forecast buckets; a different signature means the advice may have changed."""
+    days = (weather or {}).get("daily") or []
+    if not days:
+        return None
+    rain = 0.0
+    for d in days[:3]:
+        v = d.get("rain_mm", d.get("precip_mm"))
+        if v is not None and not math.isnan(float(v)):
+            rain += float(v)
+    rain_b = 0 if rain < 2 else 1 if rain < 10 else 2 if rain < 40 else 3
+    tmax = days[0].get("tmax_c")
+    t_b = "na" if tmax is None or math.isnan(float(tmax)) else int(float(tmax) // 3)
+    return f"r{rain_b}:t{t_b}"
+
+
+def current_weather_signature(lat: float, lon: float) -> Optional[str]:
+    """Signature of the forecast the weather cache holds for the cell now; None if not cached (no fetch)."""
+    bundle = WEATHER_CACHE.peek(lat, lon)
+    return weather_signature(weather_to_resp(bundle)) if bundle is not None else None
+
+
+def classify(
+    computed_at: datetime,
+    signature: Optional[str],
+    *,
+    now: datetime,
+    current_signature: Optional[str] = None,
+) -> str:
+    age = (now - computed_at).total_seconds()
+    if age > MAX_STALE_S:
+        return "expired"
+    if age > FRESH_S or (current_signature and signature and current_signature != signature):
+        return "stale"
+    return "fresh"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)     # naive UTC, as stored
+
+
+# ---- Table access (sync; called via asyncio.to_thread from handlers) ----
+def load(cell: str, season: str, rotation: str) -> Optional[Dict[str, Any]]:
+    from sqlalchemy import select
+    from backend.app.db import session_scope
+    from backend.app.models.crop_recommendations import CropRecommendation as Row
+
+    with session_scope() as s:
+        row = s.scalar(select(Row).where(Row.cell == cell, Row.season == season, Row.rotation == rotation))
+        if row is None:
+            return None
+        return {
+            "recommendations": list(row.recommendations or []),
+            "weather_signature": row.weather_signature,
+            "computed_at": row.computed_at,
+        }
+
+
+def save(
+    cell: str, season: str, rotation: str, *, lat: float, lon: float,
+    recommendations: List[Dict], weather_signature: Optional[str], computed_at: datetime,
+) -> None:
+    from sqlalchemy import select
+    from sqlalchemy.exc import IntegrityError
+    from backend.app.db import session_scope
+    from backend.app.models.crop_recommendations import CropRecommendation as Row
+
+    values = dict(latitude=lat, longitude=lon, recommendations=recommendations,
+                  weather_signature=weather_signature, computed_at=computed_at)
+    for _ in range(2):      # a concurrent insert of the same key: retry as an update
+        try:
+            with session_scope() as s:
+                row = s.scalar(select(Row).where(Row.cell == cell, Row.season == season, Row.rotation == rotation))
+                if row is None:
+                    s.add(Row(cell=cell, season=season, rotation=rotation, **values))
+                else:
+                    for k, v in values.items():
+                        setattr(row, k, v)
+            return
+        except IntegrityError:
+            continue
+
+
+# ---- Read path ----
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.c = {"table": 0, "table_stale": 0, "live": 0, "revalidations": 0, "errors": 0}
+        self.last_error: Optional[str] = None
+
+    def inc(self, what: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.c[what] += 1
+            if error:
+                self.last_error = error
+
+COUNTERS = _Counters()
+_REVALIDATING: Set[Tuple[str, str, str]] = set()
+_TASKS: Set[asyncio.Task] = set()
+
+
+async def compute_and_store(lat: float, lon: float, rotation_history: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Live computation at the cell centre, upserted into the table (best-effort).
+    Only the exact LLM cache tier applies: its key is the prompt, which carries
+    the weather, so the stored answer always matches the stored signature.
+    """
+    cell, c_lat, c_lon = cell_key(lat, lon)
+    rot = rotation_key(rotation_history)
+    season = season_of()
+    recos, weather = await arecommend_with_inputs(
+        lat=c_lat, lon=c_lon, rotation_history=rotation_list(rot), semantic=False,
+    )
+    try:
+        await asyncio.to_thread(
+            save, cell, season, rot, lat=c_lat, lon=c_lon, recommendations=recos,
+            weather_signature=weather_signature(weather), computed_at=_utcnow(),
+        )
+    except Exception as e:
+        COUNTERS.inc("errors", f"save: {e}")
+    return recos
+
+
+def _revalidate(lat: float, lon: float, rotation_history: Optional[List[str]], key: Tuple[str, str, str]) -> None:
+    if key in _REVALIDATING:
+        return
+    _REVALIDATING.add(key)
+
+    async def run():
+        try:
+            await compute_and_store(lat, lon, rotation_history)
+            COUNTERS.inc("revalidations")
+        except Exception as e:
+            COUNTERS.inc("errors", f"revalidate: {e}")
+        finally:
+            _REVALIDATING.discard(key)
+
+    task = asyncio.create_task(run())
+    _TASKS.add(task)
+    task.add_done_callback(_TASKS.discard)
+
+
+async def recommend(lat: float, lon: float, rotation_history: Optional[List[str]] = None) -> Tuple[List[Dict], str]:
+    """(top-3, source) with source in table | table_stale | live."""
+    cell, _, _ = cell_key(lat, lon)
+    rot = rotation_key(rotation_history)
+    season = season_of()
+    try:
+        row = await asyncio.to_thread(load, cell, season, rot)
+    except Exception as e:          # table missing / DB down: still answer live
+        COUNTERS.inc("errors", f"load: {e}")
+        row = None
+
+    if row is not None and row["recommendations"]:
+        status = classify(
+            row["computed_at"], row["weather_signature"],
+            now=_utcnow(), current_signature=current_weather_signature(lat, lon),
+        )
+        if status == "fresh":
+            COUNTERS.inc("table")
+            return row["recommendations"], "table"
+        if status == "stale":
+            COUNTERS.inc("table_stale")
+            _revalidate(lat, lon, rotation_history, (cell, season, rot))
+            return row["recommendations"], "table_stale"
+
+    COUNTERS.inc("live")
+    return await compute_and_store(lat, lon, rotation_history), "live"
+
+
+def stats() -> Dict[str, Any]:
+    with COUNTERS._lock:
+        return {
+            **COUNTERS.c,
+            "revalidating": len(_REVALIDATING),
+            "fresh_s": FRESH_S,
+            "max_stale_s": MAX_STALE_S,
+            "last_error": COUNTERS.last_error,
+        }
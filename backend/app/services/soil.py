@@ -7,7 +7,11 @@ from dataclasses import dataclass, asdict
 from typing import Callable, Dict, List, Optional, Tuple
 # add at top with other imports
 import asyncio
-from functools import lru_cache
+import threading
+
+from backend.app.services.cache import TTLCache
+from backend.app.services.http_clients import UPSTREAMS, get_async_client, get_client
+from backend.app.services.soil_store import CELL_DEG, CoverageIndex, cell_center, cell_of, get_store
 
 
 # -------- Data classes --------
@@ -27,16 +31,12 @@ class SoilLayer:
 class SoilBundle:
     latitude: float
     longitude: float
-    layers: List[SoilLayer]
+    layers: Tuple[SoilLayer, ...]
 
     @property
     def topsoil(self) -> Optional[SoilLayer]:
         return self.layers[0] if self.layers else None
 
-# --- utility: snap to a regular grid (~250m) so we hit cell centers quickly
-def _snap_to_grid(lat: float, lon: float, step_deg: float = 0.0025) -> tuple[float, float]:
-    return (round(lat / step_deg) * step_deg, round(lon / step_deg) * step_deg)
-
 # tighten request timeout a bit (SoilGrids is usually quick)
 _PER_REQ_TIMEOUT = 30.0  # seconds
 
@@ -114,7 +114,7 @@ def normalize_soilgrids(payload: Dict) -> SoilBundle:
             )
         )
 
-    return SoilBundle(latitude=lat, longitude=lon, layers=layers)
+    return SoilBundle(latitude=lat, longitude=lon, layers=tuple(layers))
 
 
 # -------- HTTP fetch --------
@@ -128,15 +128,13 @@ def soilgrids_http_fetcher(lat: float, lon: float) -> dict:
         "depth": "0-5cm",
         "value": "mean",
     }
-    headers = {"Accept": "application/json"}
-    # lower timeout than before
-    with httpx.Client(timeout=_PER_REQ_TIMEOUT, headers=headers) as client:
-        r = client.get(SOILGRIDS_QUERY_URL, params=params)
-        r.raise_for_status()
-        try:
-            return r.json()
-        except json.JSONDecodeError as e:
-            raise RuntimeError(f"Expected JSON from SoilGrids, got non-JSON at {SOILGRIDS_QUERY_URL}") from e
+    # pooled client already sends Accept: application/json
+    r = get_client("soilgrids").get(SOILGRIDS_QUERY_URL, params=params, timeout=_PER_REQ_TIMEOUT)
+    r.raise_for_status()
+    try:
+        return r.json()
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Expected JSON from SoilGrids, got non-JSON at {SOILGRIDS_QUERY_URL}") from e
 
 
 # -------- Neighbor search to avoid nulls --------
@@ -162,109 +160,200 @@ def _haversine_m(lat1, lon1, lat2, lon2) -> float:
     return 2*R*math.atan2(math.sqrt(a), math.sqrt(1-a))
 
 
-# small cache to save repeat calls when user pans around same area
-@lru_cache(maxsize=256)
-def _cached_fetch(lat: float, lon: float) -> dict:
-    return soilgrids_http_fetcher(lat, lon)
+# persistent per-cell store (soil_store.py): survives restarts, shared by workers,
+# and remembers empty cells so we never re-probe them
+@dataclass
+class ProbeStats:
+    upstream_calls: int = 0     # SoilGrids requests actually sent
+    store_hits: int = 0         # cells answered from the store
+    skipped_null: int = 0       # known-empty cells not probed
+
+class _ProbeTotals:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.upstream_calls = 0
+        self.store_hits = 0
+        self.skipped_null = 0
+        self.max_calls = 0
+
+    def add(self, s: ProbeStats) -> None:
+        with self._lock:
+            self.lookups += 1
+            self.upstream_calls += s.upstream_calls
+            self.store_hits += s.store_hits
+            self.skipped_null += s.skipped_null
+            self.max_calls = max(self.max_calls, s.upstream_calls)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "upstream_calls": self.upstream_calls,
+                "avg_calls_per_lookup": round(self.upstream_calls / self.lookups, 2) if self.lookups else None,
+                "max_calls_per_lookup": self.max_calls,
+                "store_hits": self.store_hits,
+                "skipped_null": self.skipped_null,
+            }
+
+PROBE_TOTALS = _ProbeTotals()
+
+_QUERY = {
+    "property": ["phh2o", "soc", "nitrogen", "clay", "sand", "silt"],
+    "depth": "0-5cm",
+    "value": "mean",
+}
+
+async def _soilgrids_get(client: httpx.AsyncClient, lat: float, lon: float) -> dict:
+    r = await client.get(SOILGRIDS_QUERY_URL, params={"lon": lon, "lat": lat, **_QUERY}, timeout=_PER_REQ_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+async def _stored_fetch(client: httpx.AsyncClient, lat: float, lon: float, stats: ProbeStats) -> Optional[dict]:
+    """
+    Useful payload for the cell containing (lat, lon), or None if the cell is
+    known to be empty. Upstream errors propagate and are NOT recorded.
+    """
+    store = get_store()
+    known = store.lookup(lat, lon)
+    if known is not None:
+        if known.has_data:
+            stats.store_hits += 1
+        else:
+            stats.skipped_null += 1
+        return known.payload()
+    stats.upstream_calls += 1
+    data = await _soilgrids_get(client, lat, lon)
+    useful = _has_useful_layers(data)
+    store.put(lat, lon, data if useful else None)
+    return data if useful else None
 
 async def _fetch_async(client: httpx.AsyncClient, lat: float, lon: float) -> tuple[dict | None, float, float]:
+    # CancelledError is not an Exception: a timed-out lookup stops here and records nothing
     try:
-        params = {
-            "lon": lon,
-            "lat": lat,
-            "property": ["phh2o", "soc", "nitrogen", "clay", "sand", "silt"],
-            "depth": "0-5cm",
-            "value": "mean",
-        }
-        r = await client.get(SOILGRIDS_QUERY_URL, params=params)
-        r.raise_for_status()
-        data = r.json()
-        return (data if _has_useful_layers(data) else None, lat, lon)
+        data = await _soilgrids_get(client, lat, lon)
     except Exception:
         return (None, lat, lon)
+    useful = _has_useful_layers(data)
+    get_store().put(lat, lon, data if useful else None)
+    return (data if useful else None, lat, lon)
 
-async def _probe_neighbors_parallel(lat: float, lon: float, *, step_deg: float, rings: int, max_concurrency: int = 8):
-    # build the perimeter coords for rings 1..N, snapped to avoid redundant points
-    coords: list[tuple[float, float]] = []
-    seen = set()
-    for k in range(1, rings + 1):
-        for dy in range(-k, k + 1):
-            for dx in range(-k, k + 1):
-                if max(abs(dx), abs(dy)) != k:
-                    continue
-                lat2 = lat + dy * step_deg
-                lon2 = lon + dx * step_deg
-                lat2, lon2 = _snap_to_grid(lat2, lon2, step_deg=step_deg)  # snap each probe
-                key = (round(lat2, 6), round(lon2, 6))
-                if key not in seen:
-                    seen.add(key)
-                    coords.append((lat2, lon2))
-
-    # async client with concurrency cap
-    sem = asyncio.Semaphore(max_concurrency)
-    async with httpx.AsyncClient(timeout=_PER_REQ_TIMEOUT, headers={"Accept": "application/json"}) as client:
-        async def task(latx: float, lonx: float):
-            async with sem:
-                return await _fetch_async(client, latx, lonx)
-
-        tasks = [asyncio.create_task(task(a, b)) for (a, b) in coords]
-        # as soon as one returns useful, cancel the rest
-        try:
-            for coro in asyncio.as_completed(tasks):
-                data, la, lo = await coro
-                if data is not None:
-                    # cancel outstanding tasks
-                    for t in tasks:
-                        if not t.done():
-                            t.cancel()
-                    return data, la, lo
-        finally:
-            # ensure all tasks complete/cancel to avoid warnings
-            await asyncio.gather(*tasks, return_exceptions=True)
+async def _probe_neighbors_parallel(
+    client: httpx.AsyncClient,
+    lat: float,
+    lon: float,
+    *,
+    step_deg: float,
+    rings: int,
+    max_concurrency: int = 8,
+    stats: Optional[ProbeStats] = None,
+):
+    """
+    Coverage-aware neighbour search. Cells within rings*step_deg are ranked by
+    CoverageIndex (nearest first, known-empty skipped, cells next to known data
+    preferred) and probed in waves of `max_concurrency`; the first wave with a
+    useful answer wins. Unknown cells farther away than the nearest cell already
+    known to have data are never probed — that cell is returned from the store.
+    """
+    stats = stats if stats is not None else ProbeStats()
+    store = get_store()
+    radius_cells = max(1, math.ceil(rings * step_deg / CELL_DEG))
+    plan = CoverageIndex(store).plan(lat, lon, radius_cells, exclude={cell_of(lat, lon)})
+    stats.skipped_null += plan.skipped_null
+
+    for i in range(0, len(plan.to_probe), max_concurrency):
+        wave = [cell_center(c) for c in plan.to_probe[i:i + max_concurrency]]
+        stats.upstream_calls += len(wave)
+        # gather cancels the whole wave if the caller is cancelled / times out
+        results = await asyncio.gather(*(_fetch_async(client, la, lo) for la, lo in wave))
+        found = [(d, la, lo) for d, la, lo in results if d is not None]
+        if found:
+            return min(found, key=lambda x: _haversine_m(lat, lon, x[1], x[2]))
+
+    if plan.nearest_known is not None:
+        known = store.get_cell(plan.nearest_known)
+        if known is not None and known.has_data:
+            stats.store_hits += 1
+            la, lo = cell_center(plan.nearest_known)
+            return known.payload(), la, lo
 
     return None, None, None
 
-def soilgrids_try_neighbors(
+async def soilgrids_try_neighbors_async(
     lat: float,
     lon: float,
     *,
-    snap_step_deg: float = 0.0025,  # ~250 m grid
     ring_step_deg: float = 0.0015,  # ~165 m radial step
     rings: int = 4,                 # up to ~660 m radius
+    stats: Optional[ProbeStats] = None,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> Tuple[dict, float, float, float]:
     """
     Fast strategy:
       1) exact point
-      2) snapped-to-grid point (single call)
-      3) parallel ring probe (limited concurrency) until first useful cell
+      2) coverage-aware neighbour probe until first useful cell
+    Runs on the caller's loop with the shared SoilGrids client; cancelling the
+    caller (e.g. asyncio.wait_for timing out) cancels the in-flight probes.
+    Pass `stats` to get the per-lookup probe counts; totals go to PROBE_TOTALS.
     """
+    stats = stats if stats is not None else ProbeStats()
+    client = client if client is not None else get_async_client("soilgrids")
+    try:
+        return await _try_neighbors(client, lat, lon, ring_step_deg, rings, stats)
+    finally:
+        PROBE_TOTALS.add(stats)
+
+async def _try_neighbors(client, lat, lon, ring_step_deg, rings, stats: ProbeStats):
     # 1) exact
     try:
-        j = _cached_fetch(lat, lon)
-        if _has_useful_layers(j):
+        j = await _stored_fetch(client, lat, lon, stats)
+        if j is not None:
             return j, lat, lon, 0.0
     except Exception:
         pass
 
-    # 2) single snapped probe (often lands on a populated cell)
-    s_lat, s_lon = _snap_to_grid(lat, lon, step_deg=snap_step_deg)
-    if (s_lat, s_lon) != (lat, lon):
-        try:
-            j = _cached_fetch(s_lat, s_lon)
-            if _has_useful_layers(j):
-                dist = _haversine_m(lat, lon, s_lat, s_lon)
-                return j, s_lat, s_lon, dist
-        except Exception:
-            pass
-
-    # 3) parallel neighbor ring (fast exit on first success)
-    data, la, lo = asyncio.run(_probe_neighbors_parallel(lat, lon, step_deg=ring_step_deg, rings=rings))
+    # 2) parallel neighbor ring (fast exit on first success)
+    data, la, lo = await _probe_neighbors_parallel(client, lat, lon, step_deg=ring_step_deg, rings=rings, stats=stats)
     if data is not None and la is not None and lo is not None:
         dist = _haversine_m(lat, lon, la, lo)
         return data, la, lo, dist
 
     raise RuntimeError("no soil data found in neighborhood")
 
+def _run_sync(make_coro):
+    """
+    Sync facade for scripts and worker threads: runs the async lookup on a
+    private loop with a short-lived client. Inside a running loop, await the
+    async API instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("sync soil lookup called from a running event loop; await get_soil_async() instead")
+
+    async def run():
+        up = UPSTREAMS["soilgrids"]
+        async with httpx.AsyncClient(timeout=up.timeout, headers=up.headers) as client:
+            return await make_coro(client)
+    return asyncio.run(run())
+
+def soilgrids_try_neighbors(
+    lat: float,
+    lon: float,
+    *,
+    ring_step_deg: float = 0.0015,
+    rings: int = 4,
+    stats: Optional[ProbeStats] = None,
+) -> Tuple[dict, float, float, float]:
+    """Blocking version of soilgrids_try_neighbors_async (see _run_sync)."""
+    return _run_sync(lambda client: soilgrids_try_neighbors_async(
+        lat, lon,
+        ring_step_deg=ring_step_deg, rings=rings,
+        stats=stats, client=client,
+    ))
+
 
 
 # -------- Public API used by router --------
@@ -274,13 +363,76 @@ def get_soil(lat: float, lon: float, fetcher: FetchFunc) -> SoilBundle:
     payload = fetcher(lat, lon)
     return normalize_soilgrids(payload)
 
-def resilient_soil_fetcher(lat: float, lon: float) -> Dict:
-    data, used_lat, used_lon, dist_m = soilgrids_try_neighbors(lat, lon)
+def _tagged(data: dict, used_lat: float, used_lon: float, dist_m: float, stats: ProbeStats) -> Dict:
+    # payloads from the store are fresh dicts, so tagging them here is safe
     data["_resolved_lat"] = used_lat
     data["_resolved_lon"] = used_lon
     data["_resolved_distance_m"] = dist_m
+    data["_probe_count"] = stats.upstream_calls
     return data
 
+async def resilient_soil_fetcher_async(lat: float, lon: float) -> Dict:
+    stats = ProbeStats()
+    data, used_lat, used_lon, dist_m = await soilgrids_try_neighbors_async(lat, lon, stats=stats)
+    return _tagged(data, used_lat, used_lon, dist_m, stats)
+
+def resilient_soil_fetcher(lat: float, lon: float) -> Dict:
+    stats = ProbeStats()
+    data, used_lat, used_lon, dist_m = soilgrids_try_neighbors(lat, lon, stats=stats)
+    return _tagged(data, used_lat, used_lon, dist_m, stats)
+
+
+@dataclass(frozen=True)
+class ResolvedSoil:
+    bundle: SoilBundle
+    resolved_lat: float
+    resolved_lon: float
+    resolved_distance_m: float
+    probe_count: int = 0        # upstream SoilGrids calls this lookup needed
+
+    def to_response_dict(self) -> Dict:
+        return to_response_dict(
+            self.bundle,
+            resolved_lat=self.resolved_lat,
+            resolved_lon=self.resolved_lon,
+            resolved_distance_m=self.resolved_distance_m,
+            probe_count=self.probe_count,
+        )
+
+# normalized bundles per resolved cell; they are immutable so sharing is safe
+_BUNDLES: TTLCache[SoilBundle] = TTLCache(maxsize=2048, default_ttl_s=24 * 3600.0)
+
+def _resolved(data: dict, used_lat: float, used_lon: float, dist_m: float, stats: ProbeStats) -> ResolvedSoil:
+    key = cell_of(used_lat, used_lon)
+    bundle = _BUNDLES.get(key)
+    if bundle is None:
+        bundle = normalize_soilgrids(data)
+        _BUNDLES.set(key, bundle)
+    return ResolvedSoil(
+        bundle=bundle,
+        resolved_lat=used_lat,
+        resolved_lon=used_lon,
+        resolved_distance_m=dist_m,
+        probe_count=stats.upstream_calls,
+    )
+
+async def get_soil_async(lat: float, lon: float) -> ResolvedSoil:
+    """
+    Neighbour-aware lookup returning an immutable, normalized bundle plus the
+    cell that actually answered. This is the API for async routers and agents:
+    it runs on the caller's loop, so wrapping it in asyncio.wait_for bounds the
+    whole lookup and cancels any probes still in flight.
+    """
+    stats = ProbeStats()
+    data, used_lat, used_lon, dist_m = await soilgrids_try_neighbors_async(lat, lon, stats=stats)
+    return _resolved(data, used_lat, used_lon, dist_m, stats)
+
+def resolve_soil(lat: float, lon: float) -> ResolvedSoil:
+    """Blocking get_soil_async for scripts and sync services running in worker threads."""
+    stats = ProbeStats()
+    data, used_lat, used_lon, dist_m = soilgrids_try_neighbors(lat, lon, stats=stats)
+    return _resolved(data, used_lat, used_lon, dist_m, stats)
+
 
 # -------- Response helper (now includes resolved metadata if available) --------
 def to_response_dict(
@@ -289,6 +441,7 @@ def to_response_dict(
     resolved_lat: float | None = None,
     resolved_lon: float | None = None,
     resolved_distance_m: float | None = None,
+    probe_count: int | None = None,
 ) -> Dict:
     out = {
         "latitude": bundle.latitude,
@@ -301,4 +454,6 @@ def to_response_dict(
         out["resolved_longitude"] = resolved_lon
     if resolved_distance_m is not None:
         out["resolved_distance_m"] = round(resolved_distance_m, 1)
+    if probe_count is not None:
+        out["probe_count"] = probe_count
     return out
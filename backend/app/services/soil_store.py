@@ -0,0 +1,265 @@
+# backend/app/services/soil_store.py
+from __future__ import annotations
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.app.services.cache import TTLCache
+
+# -----------------------------------------------------------------------------
+# Persistent SoilGrids tile store.
+# Soil properties are effectively static, so every SoilGrids answer is kept in
+# a SQLite file keyed by its ~250 m grid cell. The file is shared by all
+# uvicorn workers (WAL mode) and survives restarts. Cells that came back with
+# no usable layers are stored too ("negative" cells) so the neighbour search
+# never probes them again until NEGATIVE_TTL_S passes.
+# -----------------------------------------------------------------------------
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]    # .../backend
+STORE_PATH = os.getenv("KM_SOIL_STORE_PATH", str(BACKEND_DIR / "cache" / "soil.sqlite3"))
+CELL_DEG = 0.0025                                    # ~250 m, SoilGrids resolution
+NEGATIVE_TTL_S = float(os.getenv("KM_SOIL_NEGATIVE_TTL_S", str(30 * 24 * 3600)))
+
+Cell = Tuple[int, int]
+
+
+def cell_of(lat: float, lon: float, step_deg: float = CELL_DEG) -> Cell:
+    return (int(round(lat / step_deg)), int(round(lon / step_deg)))
+
+def cell_center(cell: Cell, step_deg: float = CELL_DEG) -> Tuple[float, float]:
+    return (round(cell[0] * step_deg, 6), round(cell[1] * step_deg, 6))
+
+
+@dataclass(frozen=True)
+class SoilCell:
+    cell: Cell
+    has_data: bool
+    payload_json: Optional[str]     # raw SoilGrids JSON for positive cells
+    fetched_at: float
+
+    def payload(self) -> Optional[dict]:
+        """A fresh dict every call — callers may mutate it freely."""
+        return json.loads(self.payload_json) if self.payload_json else None
+
+
+class SoilStore:
+    def __init__(self, path: str = STORE_PATH, *, negative_ttl_s: float = NEGATIVE_TTL_S, mem_size: int = 4096):
+        self.path = path
+        self.negative_ttl_s = negative_ttl_s
+        self._local = threading.local()
+        # parsed rows for hot cells; soil never changes so entries live "forever" (LRU-bounded)
+        self._mem: TTLCache[SoilCell] = TTLCache(maxsize=mem_size, default_ttl_s=365 * 24 * 3600.0)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS soil_cells (
+                   cell_lat INTEGER NOT NULL,
+                   cell_lon INTEGER NOT NULL,
+                   has_data INTEGER NOT NULL,
+                   payload TEXT,
+                   fetched_at REAL NOT NULL,
+                   PRIMARY KEY (cell_lat, cell_lon)
+               )"""
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _is_live(self, row: SoilCell, now: float) -> bool:
+        return row.has_data or (now - row.fetched_at) < self.negative_ttl_s
+
+    # ---- reads ----
+    def get_cell(self, cell: Cell) -> Optional[SoilCell]:
+        """Known cell (positive or negative) or None if we have never seen it."""
+        now = time.time()
+        row = self._mem.get(cell)
+        if row is None:
+            r = self._conn().execute(
+                "SELECT has_data, payload, fetched_at FROM soil_cells WHERE cell_lat = ? AND cell_lon = ?",
+                cell,
+            ).fetchone()
+            if r is not None:
+                row = SoilCell(cell=cell, has_data=bool(r[0]), payload_json=r[1], fetched_at=float(r[2]))
+                self._mem.set(cell, row)
+        if row is None or not self._is_live(row, now):
+            self._count("misses")
+            return None
+        self._count("hits" if row.has_data else "negative_hits")
+        return row
+
+    def lookup(self, lat: float, lon: float) -> Optional[SoilCell]:
+        return self.get_cell(cell_of(lat, lon))
+
+    def known_cells(self, lat_range: Tuple[int, int], lon_range: Tuple[int, int]) -> Dict[Cell, bool]:
+        """{cell: has_data} for live cells inside an inclusive cell-index box."""
+        now = time.time()
+        rows = self._conn().execute(
+            """SELECT cell_lat, cell_lon, has_data, fetched_at FROM soil_cells
+               WHERE cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ?""",
+            (lat_range[0], lat_range[1], lon_range[0], lon_range[1]),
+        ).fetchall()
+        out: Dict[Cell, bool] = {}
+        for la, lo, has, fetched in rows:
+            if has or (now - fetched) < self.negative_ttl_s:
+                out[(la, lo)] = bool(has)
+        return out
+
+    # ---- writes ----
+    def put(self, lat: float, lon: float, payload: Optional[dict]) -> SoilCell:
+        """Record an upstream answer; payload=None marks the cell as known-empty."""
+        return self.put_cell(cell_of(lat, lon), payload)
+
+    def put_cell(self, cell: Cell, payload: Optional[dict]) -> SoilCell:
+        row = SoilCell(
+            cell=cell,
+            has_data=payload is not None,
+            payload_json=json.dumps(payload, separators=(",", ":")) if payload is not None else None,
+            fetched_at=time.time(),
+        )
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO soil_cells (cell_lat, cell_lon, has_data, payload, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (cell[0], cell[1], int(row.has_data), row.payload_json, row.fetched_at),
+        )
+        conn.commit()
+        self._mem.set(cell, row)
+        self._count("writes")
+        return row
+
+    def put_many(self, items: Iterable[Tuple[Cell, Optional[dict]]]) -> None:
+        for cell, payload in items:
+            self.put_cell(cell, payload)
+
+    def stats(self) -> Dict:
+        r = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(has_data), 0) FROM soil_cells").fetchone()
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "path": self.path,
+            "cells": int(r[0]),
+            "cells_with_data": int(r[1]),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+        }
+
+
+_STORE: Optional[SoilStore] = None
+_STORE_LOCK = threading.Lock()
+
+def get_store() -> SoilStore:
+    """Process-wide store (lazily opened so importing soil.py never touches disk)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = SoilStore()
+    return _STORE
+
+def set_store(store: Optional[SoilStore]) -> None:
+    """Swap the process-wide store (tests, pre-warm jobs pointing at another file)."""
+    global _STORE
+    with _STORE_LOCK:
+        _STORE = store
+
+
+# -----------------------------------------------------------------------------
+# Coverage index: which cells around a point are known to have / lack data.
+# Used by the neighbour search to probe nearest-first among promising cells,
+# skip known-empty ones and stop at a known-good cell without any upstream call.
+# -----------------------------------------------------------------------------
+_M_PER_DEG = 111_320.0
+
+@dataclass(frozen=True)
+class ProbePlan:
+    nearest_known: Optional[Cell]       # closest cell already known to have data
+    to_probe: Tuple[Cell, ...]          # unknown cells closer than nearest_known, best first
+    skipped_null: int                   # known-empty cells we won't touch
+
+
+class CoverageIndex:
+    def __init__(self, store: SoilStore, *, step_deg: float = CELL_DEG, null_penalty: float = 0.5, data_bonus: float = 0.25):
+        self.store = store
+        self.step_deg = step_deg
+        self.null_penalty = null_penalty
+        self.data_bonus = data_bonus
+
+    def _dist_m(self, lat: float, lon: float, cell: Cell) -> float:
+        dy = (cell[0] * self.step_deg - lat) * _M_PER_DEG
+        dx = (cell[1] * self.step_deg - lon) * _M_PER_DEG * math.cos(math.radians(lat))
+        return math.hypot(dx, dy)
+
+    def plan(self, lat: float, lon: float, radius_cells: int, *, exclude: Iterable[Cell] = ()) -> ProbePlan:
+        c0 = cell_of(lat, lon, self.step_deg)
+        r = radius_cells
+        # one extra ring so neighbour statistics at the edge are informed too
+        known = self.store.known_cells((c0[0] - r - 1, c0[0] + r + 1), (c0[1] - r - 1, c0[1] + r + 1))
+        skip = set(exclude)
+
+        candidates: List[Tuple[float, Cell]] = []
+        for dy in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                if dx * dx + dy * dy > r * r:
+                    continue    # circle, not square: corners are the farthest and least useful
+                cell = (c0[0] + dy, c0[1] + dx)
+                if cell in skip:
+                    continue
+                candidates.append((self._dist_m(lat, lon, cell), cell))
+        candidates.sort()
+
+        nearest_known: Optional[Cell] = None
+        nearest_known_d = float("inf")
+        skipped_null = 0
+        unknown: List[Tuple[float, float, Cell]] = []
+        for d, cell in candidates:
+            state = known.get(cell)
+            if state is True:
+                if nearest_known is None:
+                    nearest_known, nearest_known_d = cell, d
+            elif state is False:
+                skipped_null += 1
+            elif d < nearest_known_d:
+                unknown.append((self._score(d, cell, known), d, cell))
+
+        to_probe = tuple(cell for _, d, cell in sorted(unknown) if d < nearest_known_d)
+        return ProbePlan(nearest_known=nearest_known, to_probe=to_probe, skipped_null=skipped_null)
+
+    def _score(self, dist_m: float, cell: Cell, known: Dict[Cell, bool]) -> float:
+        # cells surrounded by data are likely to have data; cells next to water/urban nulls are not
+        has = nulls = 0
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if dx == dy == 0:
+                    continue
+                state = known.get((cell[0] + dy, cell[1] + dx))
+                if state is True:
+                    has += 1
+                elif state is False:
+                    nulls += 1
+        return dist_m * (1.0 + self.null_penalty * nulls / 8.0 - self.data_bonus * has / 8.0)
@@ -0,0 +1,234 @@
+# backend/app/services/streaming.py
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+# -----------------------------------------------------------------------------
+# Server-Sent Events for the /ask-style endpoints.
+# A streamed answer is: `start` right away, one `progress` event per context
+# tool as it finishes (weather done, soil done, ...), the answer as `token`
+# events while Gemini generates it, then `done` (timings) or `error`.
+# Tools report progress through emit_progress(), which is a no-op unless a
+# stream is listening, so the JSON endpoints share the same code paths.
+# Time to first answer token is recorded per endpoint (see STREAM_STATS).
+# -----------------------------------------------------------------------------
+
+HEARTBEAT_S = 10.0      # comment line while tools run, so proxies keep the stream open
+
+_SINK: contextvars.ContextVar[Optional[Callable[[Dict[str, Any]], None]]] = contextvars.ContextVar(
+    "km_progress_sink", default=None
+)
+
+
+def sse_event(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+# ---- Progress events ----
+def emit_progress(step: str, status: str = "done", **data: Any) -> None:
+    """Report a finished step to the stream serving this request, if any."""
+    sink = _SINK.get()
+    if sink is not None:
+        sink({"step": step, "status": status, **data})
+
+
+@contextmanager
+def progress_sink(queue: "asyncio.Queue[Dict[str, Any]]") -> Iterator[None]:
+    """
+    Route emit_progress() calls made in this context into `queue`. Tasks and
+    asyncio.to_thread() calls started inside inherit it, so tools running in
+    worker threads report too.
+    """
+    loop = asyncio.get_running_loop()
+
+    def sink(ev: Dict[str, Any]) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            queue.put_nowait(ev)
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, ev)
+
+    token = _SINK.set(sink)
+    try:
+        yield
+    finally:
+        _SINK.reset(token)
+
+
+class timed_step:
+    """`async with timed_step("weather"):` emits progress with ms, and status=error if the body raised."""
+
+    def __init__(self, step: str):
+        self.step = step
+
+    async def __aenter__(self) -> "timed_step":
+        self.t0 = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        ms = round((time.perf_counter() - self.t0) * 1000, 1)
+        if exc is None:
+            emit_progress(self.step, "done", ms=ms)
+        else:
+            emit_progress(self.step, "error", ms=ms, detail=str(exc) or exc_type.__name__)
+        return False
+
+
+# ---- Metrics ----
+class StreamStats:
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._by_endpoint: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, endpoint: str) -> Dict[str, Any]:
+        e = self._by_endpoint.get(endpoint)
+        if e is None:
+            e = {"streams": 0, "errors": 0, "first_token_ms": deque(maxlen=self.window),
+                 "total_ms": deque(maxlen=self.window)}
+            self._by_endpoint[endpoint] = e
+        return e
+
+    def record(self, endpoint: str, *, first_token_ms: Optional[float], total_ms: float, error: bool) -> None:
+        e = self._entry(endpoint)
+        e["streams"] += 1
+        e["errors"] += int(error)
+        if first_token_ms is not None:
+            e["first_token_ms"].append(first_token_ms)
+        e["total_ms"].append(total_ms)
+
+    @staticmethod
+    def _pct(samples: Deque[float], q: float) -> Optional[float]:
+        if not samples:
+            return None
+        s = sorted(samples)
+        return round(s[min(len(s) - 1, int(q * len(s)))], 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "streams": e["streams"],
+                "errors": e["errors"],
+                "first_token_ms_p50": self._pct(e["first_token_ms"], 0.5),
+                "first_token_ms_p95": self._pct(e["first_token_ms"], 0.95),
+                "total_ms_p50": self._pct(e["total_ms"], 0.5),
+            }
+            for name, e in sorted(self._by_endpoint.items())
+        }
+
+STREAM_STATS = StreamStats()
+
+
+# ---- Gemini `alt=sse` parsing ----
+async def gemini_text_deltas(lines: AsyncIterator[str], usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """
+    Text pieces from the `data:` lines of a streamGenerateContent?alt=sse response.
+    The latest usageMetadata (token counts) is copied into `usage` if given.
+    """
+    async for line in lines:
+        if not line.startswith("data:"):
+            continue
+        raw = line[5:].strip()
+        if not raw or raw == "[DONE]":
+            continue
+        chunk = json.loads(raw)
+        if chunk.get("error"):
+            raise RuntimeError(f"Gemini stream error: {chunk['error'].get('message', chunk['error'])}")
+        if usage is not None and chunk.get("usageMetadata"):
+            usage.update(chunk["usageMetadata"])
+        for cand in chunk.get("candidates") or []:
+            for part in (cand.get("content") or {}).get("parts") or []:
+                text = part.get("text")
+                if text:
+                    yield text
+
+
+# ---- Answer stream ----
+async def stream_answer(
+    endpoint: str,
+    prepare: Callable[[], Awaitable[Any]],
+    tokens: Callable[[Any], AsyncIterator[str]],
+    *,
+    heartbeat_s: float = HEARTBEAT_S,
+) -> AsyncIterator[str]:
+    """
+    SSE body for one request.
+      prepare()       gathers context (tools call emit_progress) and returns whatever
+                      tokens() needs; it may also return {"answer": str} to skip the LLM
+                      or {"meta": {...}} alongside, which is sent as a `meta` event
+      tokens(ctx)     async iterator of answer text
+    """
+    t0 = time.perf_counter()
+    first_token_ms: Optional[float] = None
+    chars = 0
+    failed = False
+    yield sse_event("start", {"endpoint": endpoint})
+
+    queue: asyncio.Queue = asyncio.Queue()
+    try:
+        with progress_sink(queue):
+            task = asyncio.ensure_future(prepare())
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({task, getter}, timeout=heartbeat_s, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield sse_event("progress", getter.result())
+                    continue
+                getter.cancel()
+                if task in done:
+                    break
+                yield ": ping\n\n"
+        finally:
+            if not task.done():
+                task.cancel()
+        while not queue.empty():
+            yield sse_event("progress", queue.get_nowait())
+        ctx = task.result()
+
+        if isinstance(ctx, dict) and ctx.get("meta") is not None:
+            yield sse_event("meta", ctx["meta"])
+        if isinstance(ctx, dict) and ctx.get("answer") is not None:
+            pieces: AsyncIterator[str] = _one(ctx["answer"])
+        else:
+            pieces = tokens(ctx)
+        async for text in pieces:
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - t0) * 1000, 1)
+            chars += len(text)
+            yield sse_event("token", {"text": text})
+    except asyncio.CancelledError:      # client went away
+        failed = True
+        raise
+    except Exception as e:
+        failed = True
+        yield sse_event("error", {"detail": str(e) or type(e).__name__})
+    finally:
+        total_ms = round((time.perf_counter() - t0) * 1000, 1)
+        STREAM_STATS.record(endpoint, first_token_ms=first_token_ms, total_ms=total_ms, error=failed)
+    if not failed:
+        yield sse_event("done", {"first_token_ms": first_token_ms, "total_ms": total_ms, "chars": chars})
+
+
+async def _one(text: str) -> AsyncIterator[str]:
+    if text:
+        yield text
+
+
+def sse_response(body: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
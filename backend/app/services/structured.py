@@ -0,0 +1,287 @@
+# backend/app/services/structured.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.app.services import gemini
+
+# -----------------------------------------------------------------------------
+# Structured (JSON) output from Gemini without a repair round trip.
+#   - the request asks for JSON mode (responseMimeType) and, when given, a
+#     responseSchema, so well-formed output is the norm (KM_GEMINI_STRUCTURED=0
+#     falls back to prompt-only JSON). If the endpoint rejects the schema
+#     fields the call is retried once without them and the process stops
+#     sending them.
+#   - whatever comes back goes through a tolerant incremental parser that
+#     fixes what can be fixed locally: prose / code fences around the value,
+#     trailing commas, raw newlines in strings, and truncation (unclosed
+#     containers are closed, an incomplete trailing member is dropped). Callers
+#     pass `accept` to reject values of the wrong shape, e.g. a truncated list
+#     that lost items, rather than pad or cache them.
+#   - outcomes per purpose (strict / repaired / failed) feed /health/llm, so a
+#     rising repair rate is visible before it becomes an outage.
+# -----------------------------------------------------------------------------
+
+STRUCTURED = os.getenv("KM_GEMINI_STRUCTURED", "1").strip().lower() not in ("0", "false", "no")
+MAX_CANDIDATES = 8      # JSON starts tried in one reply before giving up
+
+_schema_supported = True
+
+
+class StructuredOutputError(ValueError):
+    """The model's reply held no recoverable JSON value of the expected type."""
+
+
+def json_config(base: Optional[Dict[str, Any]] = None, schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """`base` generation config plus JSON mode (and the schema) when enabled."""
+    cfg = dict(base or {})
+    if STRUCTURED and _schema_supported:
+        cfg["responseMimeType"] = "application/json"
+        if schema:
+            cfg["responseSchema"] = schema
+    return cfg
+
+
+def _schema_rejected(e: Exception, cfg: Dict[str, Any]) -> bool:
+    if "responseMimeType" not in cfg or not isinstance(e, gemini.GeminiError) or e.status != 400:
+        return False
+    msg = str(e)
+    return "responseSchema" in msg or "responseMimeType" in msg or "response_schema" in msg
+
+
+# ---- Tolerant incremental parser ----
+_CLOSER = {"[": "]", "{": "}"}
+
+
+class PartialJSON:
+    """
+    Feed text chunks as they arrive; value() returns the best JSON value so far.
+    Scans each character once. Output is rebuilt as it goes (dropping trailing
+    commas, escaping raw newlines in strings); for truncated text value() closes
+    the open containers, keeping only complete members of the outermost one.
+    """
+
+    def __init__(self):
+        self._out: List[str] = []
+        self._stack: List[str] = []
+        self._in_str = False
+        self._esc = False
+        self._pending_comma = False
+        self._checkpoint = 0        # len(_out) where the last complete top-level member ends
+        self.started = False
+        self.done = False
+        self.fixes = 0              # local repairs applied (trailing commas, raw newlines)
+
+    def feed(self, chunk: str) -> "PartialJSON":
+        out, stack = self._out, self._stack
+        for ch in chunk or "":
+            if self.done:
+                break
+            if not self.started:
+                if ch in _CLOSER:
+                    self.started = True
+                    stack.append(_CLOSER[ch])
+                    out.append(ch)
+                    self._checkpoint = 1
+                continue
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                elif ch in "\n\r\t":
+                    ch = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}[ch]
+                    self.fixes += 1
+                out.append(ch)
+                continue
+            if ch.isspace():
+                continue
+            if ch == ",":
+                if self._pending_comma:
+                    self.fixes += 1     # ",," -> ","
+                self._pending_comma = True
+                if len(stack) == 1:
+                    self._checkpoint = len(out)
+                continue
+            if ch in "]}":
+                if self._pending_comma:
+                    self.fixes += 1     # trailing comma
+                    self._pending_comma = False
+                if not stack or stack[-1] != ch:
+                    raise StructuredOutputError(f"unbalanced {ch!r} in model output")
+                stack.pop()
+                out.append(ch)
+                if not stack:
+                    self.done = True
+                elif len(stack) == 1:
+                    self._checkpoint = len(out)
+                continue
+            if self._pending_comma:
+                out.append(",")
+                self._pending_comma = False
+            if ch == '"':
+                self._in_str = True
+            elif ch in _CLOSER:
+                stack.append(_CLOSER[ch])
+            out.append(ch)
+        return self
+
+    def value(self) -> Tuple[Any, bool]:
+        """(value, repaired); repaired is True when anything had to be fixed or dropped."""
+        if not self.started:
+            raise StructuredOutputError("no JSON value in model output")
+        if self.done:
+            return json.loads("".join(self._out)), self.fixes > 0
+        # truncated: keep everything if only closers are missing, else cut back to the last complete member
+        closers = "".join(reversed(self._stack))
+        tail = "".join(self._out).rstrip()
+        if not self._in_str and tail.endswith(("]", "}", '"')):
+            try:
+                return json.loads(tail + closers), True
+            except ValueError:
+                pass
+        return json.loads("".join(self._out[: self._checkpoint]) + self._stack[0]), True
+
+
+def parse_partial(text: str, accept: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+    """
+    (value, repaired) for the first JSON array/object in `text` that `accept`
+    approves; strict json.loads first. A bracket in prose ("Top [3] picks: [...]")
+    or a value of the wrong shape moves the scan on to the next "[" / "{".
+    """
+    ok = accept or (lambda v: True)
+    try:
+        val = json.loads(text)
+        if isinstance(val, (list, dict)) and ok(val):
+            return val, False
+    except (TypeError, ValueError):
+        pass
+    text = text or ""
+    start, last_err = 0, None
+    for _ in range(MAX_CANDIDATES):
+        i = min((j for j in (text.find("[", start), text.find("{", start)) if j >= 0), default=-1)
+        if i < 0:
+            break
+        try:
+            val, _ = PartialJSON().feed(text[i:]).value()
+            if ok(val):
+                return val, True    # strict parse failed, so something was stripped or fixed
+            last_err = StructuredOutputError(f"JSON at offset {i} has the wrong shape")
+        except ValueError as e:
+            last_err = e
+        start = i + 1
+    if last_err is None:
+        raise StructuredOutputError("no JSON value in model output")
+    raise StructuredOutputError(f"unrecoverable JSON in model output: {last_err}") from last_err
+
+
+# ---- Accounting ----
+class StructuredStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_purpose: Dict[str, Dict[str, int]] = {}
+        self.schema_rejected = 0
+
+    def record(self, purpose: str, outcome: str) -> None:
+        with self._lock:
+            e = self._by_purpose.setdefault(purpose, {"strict": 0, "repaired": 0, "failed": 0})
+            e[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {}
+            for name, e in sorted(self._by_purpose.items()):
+                total = sum(e.values())
+                out[name] = {**e, "repair_rate": round(e["repaired"] / total, 3) if total else None,
+                             "failure_rate": round(e["failed"] / total, 3) if total else None}
+            return {"enabled": STRUCTURED, "schema_supported": _schema_supported,
+                    "schema_rejected": self.schema_rejected, "purposes": out}
+
+STATS = StructuredStats()
+
+
+def structured_stats() -> Dict[str, Any]:
+    return STATS.snapshot()
+
+
+def parse_reply(
+    text: str,
+    *,
+    expect: type = object,
+    accept: Optional[Callable[[Any], bool]] = None,
+    purpose: str = "default",
+) -> Any:
+    """
+    Parse a reply with local repair only, recording the outcome. The value must
+    be an `expect` and pass `accept` (e.g. enough well-formed items), otherwise
+    StructuredOutputError: a short recovered answer is a failure, not a result.
+    """
+    try:
+        val, repaired = parse_partial(text, lambda v: isinstance(v, expect) and (accept is None or accept(v)))
+    except StructuredOutputError:
+        STATS.record(purpose, "failed")
+        raise
+    STATS.record(purpose, "repaired" if repaired else "strict")
+    return val
+
+
+# ---- Calls ----
+def _drop_schema(e: Exception) -> None:
+    global _schema_supported
+    _schema_supported = False
+    with STATS._lock:
+        STATS.schema_rejected += 1
+    print(f"[structured] endpoint rejected JSON mode, continuing without it: {e}")
+
+
+async def agenerate_json(
+    prompt: str,
+    *,
+    schema: Optional[Dict[str, Any]] = None,
+    expect: type = object,
+    accept: Optional[Callable[[Any], bool]] = None,
+    generation_config: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    timeout: float = 45.0,
+    purpose: str = "default",
+) -> Any:
+    """One Gemini call in JSON mode, parsed locally (no repair call)."""
+    cfg = json_config(generation_config, schema)
+    try:
+        text = await gemini.agenerate(prompt, model=model, generation_config=cfg, timeout=timeout, purpose=purpose)
+    except gemini.GeminiError as e:
+        if not _schema_rejected(e, cfg):
+            raise
+        _drop_schema(e)
+        text = await gemini.agenerate(prompt, model=model, generation_config=generation_config,
+                                      timeout=timeout, purpose=purpose)
+    return parse_reply(text, expect=expect, accept=accept, purpose=purpose)
+
+
+def generate_json(
+    prompt: str,
+    *,
+    schema: Optional[Dict[str, Any]] = None,
+    expect: type = object,
+    accept: Optional[Callable[[Any], bool]] = None,
+    generation_config: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    timeout: float = 45.0,
+    purpose: str = "default",
+) -> Any:
+    """Blocking twin of agenerate_json() for scripts/CLIs."""
+    cfg = json_config(generation_config, schema)
+    try:
+        text = gemini.generate(prompt, model=model, generation_config=cfg, timeout=timeout, purpose=purpose)
+    except gemini.GeminiError as e:
+        if not _schema_rejected(e, cfg):
+            raise
+        _drop_schema(e)
+        text = gemini.generate(prompt, model=model, generation_config=generation_config,
+                               timeout=timeout, purpose=purpose)
+    return parse_reply(text, expect=expect, accept=accept, purpose=purpose)
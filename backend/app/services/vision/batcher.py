@@ -0,0 +1,146 @@
+# backend/app/services/vision/batcher.py
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+# -----------------------------------------------------------------------------
+# Micro-batching worker.
+# Requests are queued; one dedicated thread takes the first waiting item,
+# keeps collecting until it has `max_batch` items or `max_wait_ms` has passed,
+# runs a single batched call and resolves each request's future. Bursts are
+# served in a few large forward passes instead of many single-image ones, and
+# the event loop only awaits a future.
+# -----------------------------------------------------------------------------
+
+I = TypeVar("I")
+R = TypeVar("R")
+
+
+class BatcherOverloaded(RuntimeError):
+    """The request queue is full; callers should shed load (HTTP 503)."""
+
+
+class MicroBatcher(Generic[I, R]):
+    def __init__(
+        self,
+        run_batch: Callable[[List[I]], List[R]],
+        *,
+        max_batch: int = 8,
+        max_wait_ms: float = 10.0,
+        queue_max: int = 256,
+        name: str = "batcher",
+    ):
+        self._run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._q: "queue.Queue[Optional[Tuple[I, Future, float]]]" = queue.Queue(maxsize=queue_max)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.total_wait_s = 0.0
+        self.total_run_s = 0.0
+
+    # ---- lifecycle ----
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._start_lock:
+            t = self._thread
+            self._thread = None
+        if t is not None and t.is_alive():
+            self._q.put(None)
+            t.join(timeout)
+
+    # ---- submit ----
+    def submit(self, item: I) -> "Future[R]":
+        self.start()
+        fut: Future = Future()
+        try:
+            self._q.put_nowait((item, fut, time.perf_counter()))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise BatcherOverloaded(f"{self.name}: queue full ({self._q.maxsize} waiting)")
+        depth = self._q.qsize()
+        with self._stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        return fut
+
+    async def infer(self, item: I) -> R:
+        return await asyncio.wrap_future(self.submit(item))
+
+    # ---- worker ----
+    def _collect(self, first: Tuple[I, Future, float]) -> List[Tuple[I, Future, float]]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                nxt = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:           # stop sentinel: finish this batch, then exit
+                self._q.put(None)
+                break
+            batch.append(nxt)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            # drop requests whose caller already gave up
+            batch = [b for b in batch if b[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            try:
+                results = self._run_batch([b[0] for b in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: run_batch returned {len(results)} results for {len(batch)} items")
+            except BaseException as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+            else:
+                for (_, fut, _), r in zip(batch, results):
+                    fut.set_result(r)
+            t1 = time.perf_counter()
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+                self.total_wait_s += sum(t0 - b[2] for b in batch)
+                self.total_run_s += t1 - t0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait_s * 1000, 1),
+                "queue_depth": self._q.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "items": self.items,
+                "rejected": self.rejected,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+                "batch_size_hist": dict(sorted(self.batch_sizes.items())),
+                "avg_queue_wait_ms": round(self.total_wait_s / self.items * 1000, 1) if self.items else None,
+                "avg_batch_run_ms": round(self.total_run_s / self.batches * 1000, 1) if self.batches else None,
+            }
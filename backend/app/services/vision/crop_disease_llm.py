@@ -1,30 +1,31 @@
 # backend/app/services/vision/crop_disease_llm.py
 from __future__ import annotations
 
-import json
-import os
-import re
-from typing import Dict, List, Tuple, Optional
-
-import httpx
+from typing import Callable, Dict, List, Tuple, Optional
 
 from backend.app.config import get_settings
+from backend.app.services import gemini, structured
 
 
-DEFAULT_GEMINI_MODEL = (
-    os.getenv("KM_GEMINI_MODEL")
-    or os.getenv("GEMINI_MODEL")
-    or "gemini-2.5-flash"
-)
+DEFAULT_GEMINI_MODEL = gemini.DEFAULT_MODEL
 
-def _strip_code_fences(text: str) -> str:
-    text = text.strip()
-    m = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, flags=re.DOTALL | re.IGNORECASE)
-    return m.group(1) if m else text
+_STR_ARRAY = {"type": "ARRAY", "items": {"type": "STRING"}}
+DIAGNOSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "success": {"type": "BOOLEAN"},
+        "diseases": _STR_ARRAY,
+        "disease_probabilities": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+        "symptoms": _STR_ARRAY,
+        "Treatments": _STR_ARRAY,
+        "prevention_tips": _STR_ARRAY,
+    },
+}
 
 def _prompt_for_diagnosis(
     topk: List[Tuple[str, float]],
     extra_query: Optional[str],
+    language: str = "en",
 ) -> str:
     """
     Ask for strict JSON only. We DO NOT ask the model to explain
@@ -32,6 +33,7 @@ def _prompt_for_diagnosis(
     """
     topk_str = ", ".join([f"{label} ({prob:.2f})" for label, prob in topk])
     extra = f"\nFarmer notes: {extra_query.strip()}\n" if (extra_query and extra_query.strip()) else ""
+    lang = "" if language == "en" else f'\nWrite symptoms, Treatments and prevention_tips in language code "{language}".'
 
     return f"""You are an expert plant pathologist.
 
@@ -49,35 +51,50 @@ Vision model candidate classes (with probabilities): {topk_str}.{extra}
 
 If confidence is low, include your best 1–3 differentials with conservative probabilities.
 Probability array must have the same length as diseases.
-Keep items concise and farmer-friendly.
+Keep items concise and farmer-friendly.{lang}
 """
 
-def call_gemini_json(prompt: str, model: Optional[str] = None) -> Dict:
-    s = get_settings()
-    api_key = s.gemini_api_key or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("Missing GEMINI_API_KEY / KM_GEMINI_API_KEY")
-
-    model_name = model or DEFAULT_GEMINI_MODEL
-    endpoint = f"https://generativelanguage.googleapis.com/v1/models/{model_name}:generateContent"
-    body = {
-        "contents": [{"role": "user", "parts": [{"text": prompt}]}]
-    }
-
-    with httpx.Client(timeout=s.http_timeout_seconds) as client:
-        r = client.post(endpoint, params={"key": api_key}, headers={"Content-Type": "application/json"}, json=body)
-        if r.status_code == 404:
-            raise RuntimeError(f"404 unknown/unsupported Gemini model '{model_name}' at v1 endpoint")
-        r.raise_for_status()
-        data = r.json()
-
-    try:
-        text = data["candidates"][0]["content"]["parts"][0]["text"]
-    except Exception:
-        raise RuntimeError("Unexpected Gemini response shape; no text found")
-
-    cleaned = _strip_code_fences(text)
-    return json.loads(cleaned)
+def is_complete_diagnosis(raw: Dict) -> bool:
+    """
+    Every schema key present, symptoms and Treatments non-empty, and one
+    probability per disease. A truncated reply recovered by the parser fails
+    this, so it is neither served as a diagnosis nor cached.
+    """
+    if not all(k in raw for k in DIAGNOSIS_SCHEMA["properties"]):
+        return False
+    if not all(isinstance(raw[k], list) for k in DIAGNOSIS_SCHEMA["properties"] if k != "success"):
+        return False
+    diseases, probs = raw["diseases"], raw["disease_probabilities"]
+    return (bool(raw["symptoms"]) and bool(raw["Treatments"]) and bool(diseases)
+            and len(probs) == len(diseases)
+            and all(isinstance(p, (int, float)) and not isinstance(p, bool) for p in probs))
+
+def call_gemini_json(
+    prompt: str,
+    model: Optional[str] = None,
+    schema: Optional[Dict] = None,
+    accept: Optional[Callable[[Dict], bool]] = is_complete_diagnosis,
+) -> Dict:
+    """Blocking variant for scripts (e.g. diagnosis template generation)."""
+    return structured.generate_json(
+        prompt, schema=schema, expect=dict, accept=accept, model=model,
+        timeout=get_settings().http_timeout_seconds, purpose="diagnosis",
+    )
+
+async def acall_gemini_json(
+    prompt: str,
+    model: Optional[str] = None,
+    schema: Optional[Dict] = None,
+    accept: Optional[Callable[[Dict], bool]] = is_complete_diagnosis,
+) -> Dict:
+    """
+    JSON object from Gemini (JSON mode + schema); malformed replies are recovered
+    locally, but one that fails `accept` raises StructuredOutputError.
+    """
+    return await structured.agenerate_json(
+        prompt, schema=schema, expect=dict, accept=accept, model=model,
+        timeout=get_settings().http_timeout_seconds, purpose="diagnosis",
+    )
 
 def build_response_dict(raw: Dict, image_path: Optional[str]) -> Dict:
     """
@@ -0,0 +1,122 @@
+# backend/app/services/vision/diagnosis_cache.py
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from backend.app.services.cache import TTLCache
+from backend.app.services.vision.preprocess import ImageSource, decode_image
+
+# -----------------------------------------------------------------------------
+# Diagnosis cache for repeated uploads.
+#   ViT level — keyed by a 64-bit dHash of the image. A lookup also accepts
+#               any cached image within HAMMING_MAX bits (re-shot / re-compressed
+#               copies of the same leaf), reusing its top-k.
+#   LLM level — keyed by (top-k labels, normalized farmer notes, language); identical
+#               prompts reuse the Gemini diagnosis.
+# Both are TTL + LRU bounded.
+# -----------------------------------------------------------------------------
+
+HAMMING_MAX = int(os.getenv("KM_DIAG_HAMMING_MAX", "6"))          # of 64 bits
+VIT_TTL_S = float(os.getenv("KM_DIAG_VIT_TTL_S", str(7 * 24 * 3600)))
+LLM_TTL_S = float(os.getenv("KM_DIAG_LLM_TTL_S", str(24 * 3600)))
+MAXSIZE = int(os.getenv("KM_DIAG_CACHE_SIZE", "2048"))
+
+TopK = List[Tuple[str, float]]
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """Difference hash: sign of horizontal gradients on a (hash_size+1) x hash_size grayscale thumbnail."""
+    g = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    px = g.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        base = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+    return bits
+
+
+def image_hash(src: ImageSource) -> int:
+    # the hash only needs a 9x8 thumbnail, so let JPEG draft decode as small as it can
+    return dhash(decode_image(src, (64, 64)))
+
+
+def normalize_notes(notes: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (notes or "").strip().lower())
+
+
+class DiagnosisCache:
+    def __init__(
+        self,
+        *,
+        hamming_max: int = HAMMING_MAX,
+        vit_ttl_s: float = VIT_TTL_S,
+        llm_ttl_s: float = LLM_TTL_S,
+        maxsize: int = MAXSIZE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.hamming_max = hamming_max
+        self._vit: TTLCache[TopK] = TTLCache(maxsize=maxsize, default_ttl_s=vit_ttl_s, clock=clock)
+        self._llm: TTLCache[Dict[str, Any]] = TTLCache(maxsize=maxsize, default_ttl_s=llm_ttl_s, clock=clock)
+        self.vit_exact = 0
+        self.vit_near = 0
+        self.vit_miss = 0
+
+    # ---- ViT level ----
+    def lookup_topk(self, h: int) -> Tuple[Optional[TopK], Optional[int]]:
+        """(top-k, hamming distance) of the closest cached image within hamming_max, else (None, None)."""
+        hit = self._vit.get(h)
+        if hit is not None:
+            self.vit_exact += 1
+            return hit, 0
+        best: Optional[Tuple[int, int]] = None
+        if self.hamming_max > 0:
+            for key, _ in self._vit.items():
+                d = (key ^ h).bit_count()
+                if d <= self.hamming_max and (best is None or d < best[0]):
+                    best = (d, key)
+        if best is not None:
+            topk = self._vit.get(best[1])      # refreshes its LRU position
+            if topk is not None:
+                self.vit_near += 1
+                return topk, best[0]
+        self.vit_miss += 1
+        return None, None
+
+    def store_topk(self, h: int, topk: TopK) -> None:
+        self._vit.set(h, list(topk))
+
+    # ---- LLM level ----
+    @staticmethod
+    def llm_key(topk: TopK, notes: Optional[str], lang: str = "en") -> Tuple:
+        return (tuple(label for label, _ in topk), normalize_notes(notes), lang)
+
+    def lookup_diagnosis(self, topk: TopK, notes: Optional[str], lang: str = "en") -> Optional[Dict[str, Any]]:
+        hit = self._llm.get(self.llm_key(topk, notes, lang))
+        return dict(hit) if hit is not None else None
+
+    def store_diagnosis(self, topk: TopK, notes: Optional[str], diagnosis: Dict[str, Any], lang: str = "en") -> None:
+        self._llm.set(self.llm_key(topk, notes, lang), dict(diagnosis))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.vit_exact + self.vit_near + self.vit_miss
+        return {
+            "hamming_max": self.hamming_max,
+            "vit": {
+                "size": len(self._vit),
+                "maxsize": self._vit.maxsize,
+                "exact_hits": self.vit_exact,
+                "near_hits": self.vit_near,
+                "misses": self.vit_miss,
+                "hit_ratio": round((self.vit_exact + self.vit_near) / lookups, 3) if lookups else None,
+            },
+            "llm": self._llm.stats(),
+        }
+
+
+DIAGNOSIS_CACHE = DiagnosisCache()
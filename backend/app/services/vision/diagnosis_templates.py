@@ -0,0 +1,215 @@
+# backend/app/services/vision/diagnosis_templates.py
+"""
+Precomputed per-label diagnoses for confident ViT results.
+
+When the ViT top-1 probability is at least KM_DIAG_TEMPLATE_MIN_PROB and the
+farmer left no notes, the route answers from this store instead of asking
+Gemini to regenerate the same symptoms/treatments/prevention for that label.
+
+    python -m backend.app.services.vision.diagnosis_templates generate --lang en --lang hi
+    python -m backend.app.services.vision.diagnosis_templates list
+
+`generate` asks Gemini once per (label, language) that is missing from the
+file and writes it atomically; re-running only fills gaps (--overwrite redoes
+everything). The running app picks up a regenerated file on its next lookup.
+
+File layout (KM_DIAG_TEMPLATES):
+    {"version": 1, "generated_at": "...", "model": "...",
+     "templates": {"en": {"<label>": {"symptoms": [...], "Treatments": [...], "prevention_tips": [...]}}}}
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[3]    # .../backend
+TEMPLATES_PATH = os.getenv("KM_DIAG_TEMPLATES", str(BACKEND_DIR / "models" / "diagnosis_templates.json"))
+# top-1 probability needed to skip the LLM; > 1 disables templates entirely
+MIN_PROB = float(os.getenv("KM_DIAG_TEMPLATE_MIN_PROB", "0.9"))
+DEFAULT_LANG = "en"
+
+TEMPLATE_FIELDS = ("symptoms", "Treatments", "prevention_tips")
+TEMPLATE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {k: {"type": "ARRAY", "items": {"type": "STRING"}} for k in TEMPLATE_FIELDS},
+}
+
+TopK = List[Tuple[str, float]]
+
+
+def is_complete_template(raw: Dict[str, Any]) -> bool:
+    """All template fields are string lists, symptoms and Treatments non-empty (a truncated reply is not)."""
+    return (all(isinstance(raw.get(k), list) for k in TEMPLATE_FIELDS)
+            and bool(raw["symptoms"]) and bool(raw["Treatments"]))
+
+
+class TemplateStore:
+    """Read-only view of the templates file, reloaded when its mtime changes."""
+
+    def __init__(self, path: str = TEMPLATES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._templates: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _refresh(self) -> None:
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            templates: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+            if mtime_ns is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        templates = json.load(f).get("templates") or {}
+                except (OSError, ValueError) as e:
+                    print(f"[diagnosis-templates] could not read {self.path}: {e}")
+            self._templates = templates
+            self._mtime_ns = mtime_ns
+
+    def get(self, label: str, lang: str = DEFAULT_LANG) -> Optional[Dict[str, List[str]]]:
+        self._refresh()
+        t = self._templates.get(lang, {}).get(label)
+        return {k: list(t.get(k) or []) for k in TEMPLATE_FIELDS} if t else None
+
+    def diagnosis_for(
+        self,
+        topk: TopK,
+        notes: Optional[str] = None,
+        lang: str = DEFAULT_LANG,
+        *,
+        min_prob: float = MIN_PROB,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        LLM-shaped diagnosis (see crop_disease_llm.build_response_dict) when the
+        top-1 class is confident, there are no farmer notes to take into account
+        and a template exists; otherwise None (caller falls back to the LLM).
+        """
+        if not topk or (notes and notes.strip()):
+            return None
+        label, prob = topk[0]
+        t = self.get(label, lang) if prob >= min_prob else None
+        if t is None:
+            if prob >= min_prob:
+                self.misses += 1
+            return None
+        self.hits += 1
+        return {"success": True, "diseases": [label], "disease_probabilities": [float(prob)], **t}
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        return {
+            "path": self.path,
+            "min_prob": MIN_PROB,
+            "labels": {lang: len(t) for lang, t in self._templates.items()},
+            "hits": self.hits,
+            # confident results with no template for their label/language
+            "misses": self.misses,
+        }
+
+
+TEMPLATES = TemplateStore()
+
+
+# ---- Offline generation ----
+def _prompt_for_template(label: str, lang: str) -> str:
+    return f"""You are an expert plant pathologist writing reference notes for farmers.
+
+Plant-disease class from an image classifier: {label}
+
+Return ONLY a strict JSON object with the following keys:
+  "symptoms": string array,
+  "Treatments": string array,
+  "prevention_tips": string array
+
+NO extra text, NO markdown, NO code fences. JSON object ONLY.
+If the class is a healthy plant, say so in symptoms and keep Treatments empty.
+Keep items concise and farmer-friendly. Write every item in language code "{lang}".
+"""
+
+
+def model_labels() -> List[str]:
+    """id2label of the configured ViT (ONNX meta file when exported, else the torch model)."""
+    from backend.app.services.vision import vit_onnx
+
+    meta_path = os.path.join(vit_onnx.ONNX_DIR, vit_onnx.META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            id2label = json.load(f)["id2label"]
+    else:
+        from backend.app.services.vision.vit_disease import _vit
+        id2label = _vit().id2label
+    return [v for _, v in sorted((int(k), v) for k, v in id2label.items())]
+
+
+def generate(
+    labels: Iterable[str],
+    langs: Iterable[str],
+    *,
+    path: str = TEMPLATES_PATH,
+    overwrite: bool = False,
+) -> Dict[str, Any]:
+    from backend.app.services.vision.crop_disease_llm import DEFAULT_GEMINI_MODEL, call_gemini_json
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except FileNotFoundError:
+        doc = {"version": 1, "templates": {}}
+    templates = doc.setdefault("templates", {})
+
+    written, failed = 0, []
+    for lang in langs:
+        bucket = templates.setdefault(lang, {})
+        for label in labels:
+            if label in bucket and not overwrite:
+                continue
+            try:
+                raw = call_gemini_json(_prompt_for_template(label, lang), schema=TEMPLATE_SCHEMA,
+                                       accept=is_complete_template)
+                bucket[label] = {k: [str(x) for x in (raw.get(k) or [])] for k in TEMPLATE_FIELDS}
+                written += 1
+            except Exception as e:
+                failed.append({"lang": lang, "label": label, "error": str(e)})
+                print(f"[diagnosis-templates] {lang}/{label}: {e}")
+
+    doc["generated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    doc["model"] = DEFAULT_GEMINI_MODEL
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return {"path": path, "written": written, "failed": failed,
+            "labels": {lang: len(t) for lang, t in templates.items()}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-label diagnosis templates for the ViT disease classes")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_gen = sub.add_parser("generate")
+    p_gen.add_argument("--lang", action="append", help="language code (repeatable, default en)")
+    p_gen.add_argument("--label", action="append", help="only these labels (default: every model class)")
+    p_gen.add_argument("--out", default=TEMPLATES_PATH)
+    p_gen.add_argument("--overwrite", action="store_true")
+    sub.add_parser("list")
+    args = parser.parse_args()
+
+    if args.cmd == "generate":
+        report = generate(args.label or model_labels(), args.lang or [DEFAULT_LANG],
+                          path=args.out, overwrite=args.overwrite)
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(TEMPLATES.stats(), indent=2))
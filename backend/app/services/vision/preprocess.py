@@ -0,0 +1,79 @@
+# backend/app/services/vision/preprocess.py
+from __future__ import annotations
+
+import io
+import os
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# -----------------------------------------------------------------------------
+# In-memory image pipeline for the ViT classifier.
+#   decode_image  — bytes/path -> RGB PIL image. JPEGs use draft mode, so a
+#                   12 MP phone photo is DCT-downscaled (up to 1/8) while
+#                   decoding instead of being fully decoded and then shrunk.
+#   pixel_values  — batch resize + rescale/normalize in one vectorized pass,
+#                   matching ViTImageProcessor (resize -> rescale -> normalize).
+# -----------------------------------------------------------------------------
+
+# set to 0 to always fully decode (e.g. for a parity check against the HF processor)
+JPEG_DRAFT = os.getenv("KM_VIT_JPEG_DRAFT", "1").strip().lower() not in ("0", "false", "no")
+
+ImageSource = Union[str, bytes]
+
+
+def decode_image(src: ImageSource, size: Tuple[int, int], *, draft: bool = JPEG_DRAFT) -> Image.Image:
+    """
+    RGB image from raw bytes or a path. `size` is the (width, height) the model
+    resizes to; draft mode never decodes below it.
+    """
+    im = Image.open(io.BytesIO(src) if isinstance(src, bytes) else src)
+    if draft and im.format == "JPEG":
+        im.draft("RGB", size)
+    return im.convert("RGB")
+
+
+def meta_from_processor(processor, id2label: Dict[int, str]) -> Dict[str, Any]:
+    """The parts of a ViTImageProcessor config that pixel_values() needs (+ labels)."""
+    size = processor.size or {}
+    return {
+        "id2label": {str(k): v for k, v in id2label.items()},
+        "height": int(size.get("height", 224)),
+        "width": int(size.get("width", 224)),
+        "resample": int(getattr(processor, "resample", Image.BILINEAR)),
+        "do_rescale": bool(getattr(processor, "do_rescale", True)),
+        "rescale_factor": float(getattr(processor, "rescale_factor", 1 / 255)),
+        "do_normalize": bool(getattr(processor, "do_normalize", True)),
+        "image_mean": list(processor.image_mean),
+        "image_std": list(processor.image_std),
+    }
+
+
+def target_size(meta: Dict[str, Any]) -> Tuple[int, int]:
+    return int(meta["width"]), int(meta["height"])
+
+
+def pixel_values(images: List[Image.Image], meta: Dict[str, Any]) -> np.ndarray:
+    """(batch, 3, H, W) float32, ready for the model."""
+    size = target_size(meta)
+    resample = int(meta.get("resample", Image.BILINEAR))
+    scale = float(meta.get("rescale_factor", 1 / 255)) if meta.get("do_rescale", True) else 1.0
+    if meta.get("do_normalize", True):
+        mean = np.asarray(meta.get("image_mean", [0.5, 0.5, 0.5]), dtype=np.float32)
+        std = np.asarray(meta.get("image_std", [0.5, 0.5, 0.5]), dtype=np.float32)
+    else:
+        mean, std = np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32)
+    # (x * scale - mean) / std  ==  x * a + b, one fused pass over the uint8 batch
+    a = (scale / std).astype(np.float32)
+    b = (-mean / std).astype(np.float32)
+
+    batch = np.empty((len(images), size[1], size[0], 3), dtype=np.uint8)
+    for i, im in enumerate(images):
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        batch[i] = np.asarray(im if im.size == size else im.resize(size, resample))
+    out = batch.astype(np.float32)
+    out *= a
+    out += b
+    return np.ascontiguousarray(out.transpose(0, 3, 1, 2))
@@ -1,57 +1,94 @@
 # backend/app/services/vision/vit_disease.py
 from __future__ import annotations
 
-import io
-from typing import List, Tuple
+import os
+from typing import Dict, List, Tuple
 
-import torch
+import numpy as np
 from PIL import Image, UnidentifiedImageError
-from transformers import ViTImageProcessor, ViTForImageClassification
 from backend.app.config import get_settings
+from backend.app.services.model_registry import REGISTRY
+from backend.app.services.vision.batcher import MicroBatcher
+from backend.app.services.vision.preprocess import ImageSource, decode_image, meta_from_processor, pixel_values, target_size
 
 s = get_settings()
 HUGGING_FACE_HUB_TOKEN=s.HUGGING_FACE_HUB_TOKEN 
 # You can override the model at runtime:
 #   PowerShell:  $env:KM_VIT_MODEL_ID = "some/model"
 # Default below works with many PlantVillage ViT fine-tunes on HF Hub.
-_PROCESSOR = None
-_MODEL = None
+PROCESSOR_ID = "wambugu71/crop_leaf_diseases_vit"
+MODEL_ID = "wambugu1738/crop_leaf_diseases_vit"
+# torch (HF fp32, default) | onnx (int8 ONNX Runtime; build it with vit_onnx.py export)
+BACKEND = os.getenv("KM_VIT_BACKEND", "torch").strip().lower()
+MODEL_NAME = "vit_disease"
 
 
-def _lazy_load():
-    global _PROCESSOR, _MODEL
-    if _PROCESSOR is None:
-        _PROCESSOR = ViTImageProcessor.from_pretrained("wambugu71/crop_leaf_diseases_vit")
-    if _MODEL is None:
-        _MODEL = ViTForImageClassification.from_pretrained(
-            "wambugu1738/crop_leaf_diseases_vit",
+class TorchVit:
+    """
+    fp32 ViTForImageClassification. The HF processor is only read for its
+    resize/normalize settings; pixel values come from preprocess.pixel_values.
+    """
+
+    def __init__(self):
+        import torch
+        from transformers import ViTImageProcessor, ViTForImageClassification
+
+        self._torch = torch
+        self.processor = ViTImageProcessor.from_pretrained(PROCESSOR_ID)
+        self.model = ViTForImageClassification.from_pretrained(
+            MODEL_ID,
             ignore_mismatched_sizes=True,
         )
-        _MODEL.eval()
+        self.model.eval()
+        self.id2label: Dict[int, str] = {int(k): v for k, v in self.model.config.id2label.items()}
+        self.meta = meta_from_processor(self.processor, self.id2label)
+
+    def probs(self, images: List[Image.Image]) -> np.ndarray:
+        """(batch, num_classes) softmax probabilities."""
+        x = self._torch.from_numpy(pixel_values(images, self.meta))
+        with self._torch.no_grad():
+            return self.model(pixel_values=x).logits.softmax(dim=-1).numpy()
+
+
+def _load_vit():
+    if BACKEND == "onnx":
+        from backend.app.services.vision.vit_onnx import OnnxVit
+        return OnnxVit.load()
+    return TorchVit()
 
 
-def _softmax_to_topk(probs: torch.Tensor, top_k: int = 3) -> List[Tuple[str, float]]:
+def _warmup_vit(vit) -> None:
+    # one synthetic leaf-green image so the first real request skips kernel/alloc setup
+    vit.probs([Image.new("RGB", (224, 224), (70, 130, 60))])
+
+
+REGISTRY.register(MODEL_NAME, _load_vit, warmup=_warmup_vit)
+
+
+def _vit():
+    # loaded once (under the registry lock), usually at startup
+    return REGISTRY.get(MODEL_NAME)
+
+
+def _topk(vit, probs: np.ndarray, top_k: int = 3) -> List[Tuple[str, float]]:
     # probs: (num_classes,)
-    topk = torch.topk(probs, k=min(top_k, probs.shape[0]))
-    idxs = topk.indices.tolist()
-    vals = topk.values.tolist()
-    id2label = _MODEL.config.id2label  # type: ignore[attr-defined]
-    return [(id2label.get(i, str(i)), float(vals[j])) for j, i in enumerate(idxs)]
+    idxs = np.argsort(-probs, kind="stable")[:top_k]
+    return [(vit.id2label.get(int(i), str(int(i))), float(probs[i])) for i in idxs]
+
+
+def _predict(src: ImageSource, top_k: int) -> List[Tuple[str, float]]:
+    vit = _vit()
+    image = decode_image(src, target_size(vit.meta))
+    return _topk(vit, vit.probs([image])[0], top_k=top_k)
 
 
-@torch.no_grad()
 def detect_crop_disease(image_path: str) -> List[dict]:
     """
     Your original helper: returns a list of dicts:
     [{"disease": <label>, "probability": <float>}, ...]  (top-3)
     """
     try:
-        _lazy_load()
-        image = Image.open(image_path).convert("RGB")
-        inputs = _PROCESSOR(images=image, return_tensors="pt")
-        outputs = _MODEL(**inputs)
-        probs = outputs.logits.softmax(dim=-1).squeeze(0)  # (num_classes,)
-        top3 = _softmax_to_topk(probs, top_k=3)
+        top3 = _predict(image_path, top_k=3)
         return [{"disease": lbl, "probability": prob} for (lbl, prob) in top3]
     except UnidentifiedImageError:
         return [{"error": "Invalid image file."}]
@@ -59,27 +96,65 @@ def detect_crop_disease(image_path: str) -> List[dict]:
         return [{"error": f"Error: {str(e)}"}]
 
 
-@torch.no_grad()
 def predict_topk_from_path(image_path: str, top_k: int = 3) -> List[Tuple[str, float]]:
     """
     Compatible with our LLM prompt: returns [(label, probability), ...]
     """
-    _lazy_load()
-    image = Image.open(image_path).convert("RGB")
-    inputs = _PROCESSOR(images=image, return_tensors="pt")
-    outputs = _MODEL(**inputs)
-    probs = outputs.logits.softmax(dim=-1).squeeze(0)
-    return _softmax_to_topk(probs, top_k=top_k)
+    return _predict(image_path, top_k=top_k)
 
 
-@torch.no_grad()
 def predict_topk(image_bytes: bytes, top_k: int = 3) -> List[Tuple[str, float]]:
     """
     Bytes version (used by earlier code). Kept for convenience.
     """
-    _lazy_load()
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    inputs = _PROCESSOR(images=image, return_tensors="pt")
-    outputs = _MODEL(**inputs)
-    probs = outputs.logits.softmax(dim=-1).squeeze(0)
-    return _softmax_to_topk(probs, top_k=top_k)
\ No newline at end of file
+    return _predict(image_bytes, top_k=top_k)
+
+
+# ---- Micro-batched inference (used by the async router) ----
+MAX_BATCH = int(os.getenv("KM_VIT_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("KM_VIT_MAX_WAIT_MS", "15"))
+QUEUE_MAX = int(os.getenv("KM_VIT_QUEUE_MAX", "256"))
+
+def _run_vit_batch(sources: List[ImageSource]) -> List[List[dict]]:
+    """
+    One forward pass for the whole batch. Each result has the same shape as
+    detect_crop_disease(): top-3 [{"disease", "probability"}] or [{"error"}].
+    """
+    vit = _vit()
+    size = target_size(vit.meta)
+    results: List[List[dict]] = [[{"error": "Invalid image file."}] for _ in sources]
+    images, slots = [], []
+    for i, src in enumerate(sources):
+        try:
+            images.append(decode_image(src, size))
+            slots.append(i)
+        except UnidentifiedImageError:
+            pass
+        except Exception as e:
+            results[i] = [{"error": f"Error: {str(e)}"}]
+    if not images:
+        return results
+
+    probs = vit.probs(images)  # (batch, num_classes)
+    for row, i in enumerate(slots):
+        top3 = _topk(vit, probs[row], top_k=3)
+        results[i] = [{"disease": lbl, "probability": prob} for (lbl, prob) in top3]
+    return results
+
+
+VIT_BATCHER: MicroBatcher[ImageSource, List[dict]] = MicroBatcher(
+    _run_vit_batch,
+    max_batch=MAX_BATCH,
+    max_wait_ms=MAX_WAIT_MS,
+    queue_max=QUEUE_MAX,
+    name="vit-batcher",
+)
+
+
+async def detect_crop_disease_async(image: ImageSource) -> List[dict]:
+    """
+    Same output as detect_crop_disease(), but queued to the batching worker so
+    the event loop only awaits a future. Raises BatcherOverloaded when the
+    queue is full.
+    """
+    return await VIT_BATCHER.infer(image)
@@ -0,0 +1,210 @@
+# backend/app/services/vision/vit_onnx.py
+"""
+Optional ONNX Runtime backend for the ViT disease classifier (KM_VIT_BACKEND=onnx).
+
+    python -m backend.app.services.vision.vit_onnx export
+    python -m backend.app.services.vision.vit_onnx check --fixtures path/to/leaf_images
+    python -m backend.app.services.vision.vit_onnx bench --fixtures path/to/leaf_images --batch 8
+
+`export` writes into KM_VIT_ONNX_DIR:
+    model.onnx        fp32 graph (dynamic batch axis)
+    model.int8.onnx   dynamic int8 quantization of the above (weights only)
+    vit_meta.json     id2label + the preprocessing the HF processor applies
+Serving only needs onnxruntime, numpy and Pillow; torch/transformers are used
+by export/check/bench alone.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from backend.app.services.vision.preprocess import pixel_values
+
+BACKEND_DIR = Path(__file__).resolve().parents[3]    # .../backend
+ONNX_DIR = os.getenv("KM_VIT_ONNX_DIR", str(BACKEND_DIR / "models" / "vit_disease"))
+ONNX_FILE = os.getenv("KM_VIT_ONNX_FILE", "model.int8.onnx")
+META_FILE = "vit_meta.json"
+# 0 = let ONNX Runtime decide (one thread per physical core)
+INTRA_OP_THREADS = int(os.getenv("KM_VIT_ONNX_THREADS", "0"))
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class OnnxVit:
+    """Same interface as vit_disease.TorchVit: `id2label`, `meta` and `probs(images)`."""
+
+    def __init__(self, session, meta: Dict[str, Any]):
+        self.session = session
+        self.meta = meta
+        self.id2label: Dict[int, str] = {int(k): v for k, v in meta["id2label"].items()}
+        self._input = session.get_inputs()[0].name
+
+    @classmethod
+    def load(cls, onnx_dir: str = ONNX_DIR, filename: str = ONNX_FILE) -> "OnnxVit":
+        import onnxruntime as ort
+
+        with open(os.path.join(onnx_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if INTRA_OP_THREADS > 0:
+            opts.intra_op_num_threads = INTRA_OP_THREADS
+        session = ort.InferenceSession(
+            os.path.join(onnx_dir, filename), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        return cls(session, meta)
+
+    def probs(self, images: List[Image.Image]) -> np.ndarray:
+        """(batch, num_classes) softmax probabilities."""
+        logits = self.session.run(None, {self._input: pixel_values(images, self.meta)})[0]
+        return _softmax(np.asarray(logits, dtype=np.float32))
+
+
+# ---- Export ----
+def export(out_dir: str = ONNX_DIR, *, quantize: bool = True, opset: int = 17) -> Dict[str, Any]:
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from backend.app.services.vision.vit_disease import MODEL_ID, PROCESSOR_ID, TorchVit
+
+    vit = TorchVit()
+    meta = dict(vit.meta)
+    meta.update({"model_id": MODEL_ID, "processor_id": PROCESSOR_ID})
+
+    class _Logits(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values=pixel_values).logits
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    dummy = torch.randn(1, 3, meta["height"], meta["width"])
+    torch.onnx.export(
+        _Logits(vit.model).eval(),
+        (dummy,),
+        fp32_path,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    written = {"fp32": fp32_path}
+    if quantize:
+        int8_path = os.path.join(out_dir, "model.int8.onnx")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        written["int8"] = int8_path
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return {name: {"path": p, "mb": round(os.path.getsize(p) / 2**20, 1)} for name, p in written.items()}
+
+
+# ---- Parity check + benchmark ----
+def _fixture_images(path: str) -> List[Tuple[str, Image.Image]]:
+    files = sorted(p for p in Path(path).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    if not files:
+        raise SystemExit(f"no images in {path}")
+    return [(p.name, Image.open(p).convert("RGB")) for p in files]
+
+
+def _top(id2label: Dict[int, str], probs: np.ndarray, k: int) -> List[str]:
+    return [id2label.get(int(i), str(int(i))) for i in np.argsort(-probs, kind="stable")[:k]]
+
+
+def check(fixtures: str, *, onnx_dir: str = ONNX_DIR, filename: str = ONNX_FILE, top_k: int = 3) -> Dict[str, Any]:
+    """Compare torch and ONNX top-k on every fixture image."""
+    from backend.app.services.vision.vit_disease import TorchVit
+
+    torch_vit, onnx_vit = TorchVit(), OnnxVit.load(onnx_dir, filename)
+    images = _fixture_images(fixtures)
+    top1 = overlap = 0.0
+    max_dp = 0.0
+    mismatches = []
+    for name, im in images:
+        pt, po = torch_vit.probs([im])[0], onnx_vit.probs([im])[0]
+        a, b = _top(torch_vit.id2label, pt, top_k), _top(onnx_vit.id2label, po, top_k)
+        top1 += a[0] == b[0]
+        overlap += len(set(a) & set(b)) / top_k
+        max_dp = max(max_dp, float(np.abs(pt - po).max()))
+        if a[0] != b[0]:
+            mismatches.append({"image": name, "torch": a, "onnx": b})
+    n = len(images)
+    return {
+        "model": filename,
+        "images": n,
+        "top1_agreement": round(top1 / n, 4),
+        f"top{top_k}_overlap": round(overlap / n, 4),
+        "max_abs_prob_diff": round(max_dp, 4),
+        "top1_mismatches": mismatches[:10],
+    }
+
+
+def _time_backend(vit, images: List[Image.Image], batch: int, runs: int) -> Dict[str, float]:
+    chunks = [images[i:i + batch] for i in range(0, len(images), batch)]
+    vit.probs(chunks[0])        # warmup
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        for c in chunks:
+            vit.probs(c)
+    dt_s = time.perf_counter() - t0
+    n = runs * len(images)
+    return {"ms_per_image": round(dt_s / n * 1000, 2), "images_per_s": round(n / dt_s, 1)}
+
+
+def bench(fixtures: str, *, batch: int = 8, runs: int = 5, onnx_dir: str = ONNX_DIR, filename: str = ONNX_FILE) -> Dict[str, Any]:
+    from backend.app.services.model_registry import _rss_bytes
+    from backend.app.services.vision.vit_disease import TorchVit
+
+    images = [im for _, im in _fixture_images(fixtures)]
+    out: Dict[str, Any] = {"images": len(images), "batch": batch, "runs": runs}
+    for name, make in (("onnx", lambda: OnnxVit.load(onnx_dir, filename)), ("torch", TorchVit)):
+        rss0 = _rss_bytes()
+        vit = make()
+        rss1 = _rss_bytes()
+        out[name] = _time_backend(vit, images, batch, runs)
+        out[name]["load_rss_mb"] = round((rss1 - rss0) / 2**20, 1) if rss0 is not None and rss1 is not None else None
+        del vit
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX export / parity check / benchmark for the ViT disease model")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("--out", default=ONNX_DIR)
+    p_exp.add_argument("--no-quantize", action="store_true")
+    p_chk = sub.add_parser("check")
+    p_chk.add_argument("--fixtures", required=True, help="directory of leaf images")
+    p_chk.add_argument("--model", default=ONNX_FILE, help="file inside KM_VIT_ONNX_DIR")
+    p_chk.add_argument("--min-top1", type=float, default=0.95, help="exit 1 below this top-1 agreement")
+    p_b = sub.add_parser("bench")
+    p_b.add_argument("--fixtures", required=True)
+    p_b.add_argument("--model", default=ONNX_FILE)
+    p_b.add_argument("--batch", type=int, default=8)
+    p_b.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        print(json.dumps(export(args.out, quantize=not args.no_quantize), indent=2))
+    elif args.cmd == "check":
+        report = check(args.fixtures, filename=args.model)
+        print(json.dumps(report, indent=2))
+        if report["top1_agreement"] < args.min_top1:
+            sys.exit(1)
+    else:
+        print(json.dumps(bench(args.fixtures, batch=args.batch, runs=args.runs, filename=args.model), indent=2))
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, asdict
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+import json
 import math
 import httpx
 
+from backend.app.services.http_clients import get_client
+from backend.app.services.weather_cache import WeatherCache
+
 # This would typically be in a different file, but including it here
 # so the file is runnable for testing if needed.
 # from backend.app.config import get_settings
@@ -50,8 +54,8 @@ def _as_float(x, default=float("nan")) -> float:
     except Exception:
         return default
 
-# ----- Single public API: one request, full normalization -----
-def get_weather(lat: float, lon: float) -> WeatherBundle:
+# ----- HTTP fetch: one request, raw payload -----
+def open_meteo_http_fetcher(lat: float, lon: float) -> Dict:
     """
     One-call Open-Meteo fetch:
       - current: temperature, precipitation, rain, showers, humidity, wind
@@ -72,11 +76,12 @@ def get_weather(lat: float, lon: float) -> WeatherBundle:
         "forecast_days": 7,
     }
 
-    with httpx.Client(timeout=s.http_timeout_seconds) as client:
-        r = client.get(url, params=params)
-        r.raise_for_status()
-        payload: Dict = r.json()
+    r = get_client("open_meteo").get(url, params=params, timeout=s.http_timeout_seconds)
+    r.raise_for_status()
+    return r.json()
 
+# ----- Normalization -----
+def normalize_open_meteo(payload: Dict) -> WeatherBundle:
     # --- normalize current ---
     cur = payload.get("current") or {}
     
@@ -161,6 +166,39 @@ def get_weather(lat: float, lon: float) -> WeatherBundle:
         next24h_total_rain_mm=next24h_total_rain_mm, # This is now correctly rounded
     )
 
+# ----- Cache (see weather_cache.py) -----
+def _bundle_to_json(b: WeatherBundle) -> str:
+    return json.dumps(asdict(b))
+
+def _bundle_from_json(text: str) -> WeatherBundle:
+    d = json.loads(text)
+    return WeatherBundle(
+        latitude=d["latitude"],
+        longitude=d["longitude"],
+        current=CurrentWeather(**d["current"]),
+        daily=[DailyForecast(**x) for x in d["daily"]],
+        next24h_total_rain_mm=d.get("next24h_total_rain_mm", float("nan")),
+    )
+
+WEATHER_CACHE: WeatherCache[WeatherBundle] = WeatherCache(
+    lambda lat, lon: normalize_open_meteo(open_meteo_http_fetcher(lat, lon)),
+    dumps=_bundle_to_json,
+    loads=_bundle_from_json,
+)
+
+# ----- Public API -----
+FetchFunc = Callable[[float, float], Dict]
+
+def get_weather(lat: float, lon: float, fetcher: Optional[FetchFunc] = None) -> WeatherBundle:
+    """
+    Normalized forecast for a point. With the default fetcher the result comes
+    from the grid-cell cache (one Open-Meteo call per cell per hour); a custom
+    fetcher (tests/stubs) bypasses the cache and is called with the exact point.
+    """
+    if fetcher is None or fetcher is open_meteo_http_fetcher:
+        return WEATHER_CACHE.get(lat, lon)
+    return normalize_open_meteo(fetcher(lat, lon))
+
 # ----- Router helper -----
 def to_response_dict(bundle: WeatherBundle) -> Dict:
     out = {
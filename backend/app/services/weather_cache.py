@@ -0,0 +1,122 @@
+# backend/app/services/weather_cache.py
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from backend.app.services.cache import SingleFlight, SqliteTTLStore, TTLCache
+
+# -----------------------------------------------------------------------------
+# Geo-tiled forecast cache.
+# Open-Meteo serves model grid points, so farms a few hundred metres apart get
+# the same forecast. We snap lat/lon to a grid cell, keep one normalized bundle
+# per cell and expire it shortly after the next hourly model update.
+# -----------------------------------------------------------------------------
+
+# ~0.1° ≈ 11 km, the resolution of the models behind Open-Meteo's best_match over India
+GRID_DEG = float(os.getenv("KM_WEATHER_GRID_DEG", "0.1"))
+# Open-Meteo refreshes hourly; give it a few minutes past the hour to publish
+REFRESH_OFFSET_S = float(os.getenv("KM_WEATHER_REFRESH_OFFSET_S", "300"))
+MAXSIZE = int(os.getenv("KM_WEATHER_CACHE_SIZE", "4096"))
+# empty = memory only
+DISK_PATH = os.getenv("KM_WEATHER_CACHE_DB", "")
+
+B = TypeVar("B")
+
+
+def snap_to_cell(lat: float, lon: float, grid_deg: float = GRID_DEG) -> Tuple[int, int]:
+    """Integer cell index for a coordinate."""
+    return (int(round(lat / grid_deg)), int(round(lon / grid_deg)))
+
+def cell_center(cell: Tuple[int, int], grid_deg: float = GRID_DEG) -> Tuple[float, float]:
+    return (round(cell[0] * grid_deg, 6), round(cell[1] * grid_deg, 6))
+
+def next_expiry(now: float, offset_s: float = REFRESH_OFFSET_S) -> float:
+    """Top of the next hour + offset (epoch seconds, UTC aligned)."""
+    return math.floor(now / 3600.0) * 3600.0 + 3600.0 + offset_s
+
+
+class WeatherCache(Generic[B]):
+    """
+    Memory LRU (+ optional SQLite tier) of normalized bundles keyed by grid cell.
+    `loader(lat, lon)` is called with the cell centre on a miss; concurrent
+    misses for the same cell share one upstream call.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[float, float], B],
+        *,
+        dumps: Callable[[B], str],
+        loads: Callable[[str], B],
+        grid_deg: float = GRID_DEG,
+        maxsize: int = MAXSIZE,
+        disk_path: str = DISK_PATH,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._loader = loader
+        self._dumps = dumps
+        self._loads = loads
+        self.grid_deg = grid_deg
+        self._clock = clock
+        self._mem: TTLCache[B] = TTLCache(maxsize=maxsize, clock=clock)
+        self._disk: Optional[SqliteTTLStore] = SqliteTTLStore(disk_path, table="weather_cache") if disk_path else None
+        self._flight = SingleFlight()
+        self.disk_hits = 0
+        self.upstream_calls = 0
+
+    def _disk_key(self, cell: Tuple[int, int]) -> str:
+        return f"{self.grid_deg}:{cell[0]}:{cell[1]}"
+
+    def get(self, lat: float, lon: float) -> B:
+        cell = snap_to_cell(lat, lon, self.grid_deg)
+        hit = self._mem.get(cell)
+        if hit is not None:
+            return hit
+        return self._flight.do(cell, lambda: self._load(cell))
+
+    def _load(self, cell: Tuple[int, int]) -> B:
+        now = self._clock()
+        if self._disk is not None:
+            row = self._disk.get(self._disk_key(cell), now=now)
+            if row is not None:
+                expires_at, text = row
+                bundle = self._loads(text)
+                self._mem.set(cell, bundle, expires_at=expires_at)
+                self.disk_hits += 1
+                return bundle
+
+        lat_c, lon_c = cell_center(cell, self.grid_deg)
+        self.upstream_calls += 1
+        bundle = self._loader(lat_c, lon_c)
+        expires_at = next_expiry(now)
+        self._mem.set(cell, bundle, expires_at=expires_at)
+        if self._disk is not None:
+            try:
+                self._disk.set(self._disk_key(cell), self._dumps(bundle), expires_at)
+            except Exception:
+                pass  # disk tier is best-effort
+        return bundle
+
+    def peek(self, lat: float, lon: float) -> Optional[B]:
+        """In-memory bundle for the cell if still fresh; never calls the loader."""
+        return self._mem.peek(snap_to_cell(lat, lon, self.grid_deg))
+
+    def invalidate(self, lat: float, lon: float) -> None:
+        self._mem.pop(snap_to_cell(lat, lon, self.grid_deg))
+
+    def clear(self) -> None:
+        self._mem.clear()
+
+    def stats(self) -> Dict:
+        out = self._mem.stats()
+        out.update({
+            "grid_deg": self.grid_deg,
+            "disk": self._disk.path if self._disk is not None else None,
+            "disk_hits": self.disk_hits,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self._flight.coalesced,
+        })
+        return out
@@ -1,8 +1,29 @@
 # backend/ingestion/ingest.py
+import argparse
+import json
 import os
-from app.rag.index import build_or_load_index
+
+from backend.app.rag import local_index
+from backend.app.rag.index import sync_index
 
 if __name__ == "__main__":
     os.environ.setdefault("PYTHONWARNINGS", "ignore")
-    build_or_load_index(rebuild=True)
-    print("Rebuilt RAG index.")
+    parser = argparse.ArgumentParser(description="Sync the RAG index with ingestion/seeds (only new/changed files are embedded)")
+    parser.add_argument("--rebuild", action="store_true", help="drop the collection and re-embed every file")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    parser.add_argument("--export-local", action="store_true",
+                        help="also export the local vector index (always on with KM_RAG_BACKEND=local)")
+    args = parser.parse_args()
+
+    report = sync_index(rebuild=args.rebuild)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for r in report["files"]:
+            timing = f"  load+split {r['load_split_s']:>6.2f}s  embed {r['embed_s']:>6.2f}s" if "embed_s" in r else ""
+            print(f"{r['status']:<9} {r.get('chunks', 0):>5} chunks  -{r.get('deleted', 0):<5}{timing}  {r['file']}")
+        print(f"Synced RAG index: +{report['embedded_chunks']} / -{report['deleted_chunks']} chunks, "
+              f"{report['total_chunks']} total, {report['seconds']}s")
+    # with KM_RAG_BACKEND=local the sync has already re-exported
+    if args.export_local and (out := local_index.export_if_stale()) is not None:
+        print(f"Exported local index: {out['count']} x {out['dim']} -> {out['path']}")
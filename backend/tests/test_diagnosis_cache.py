@@ -0,0 +1,66 @@
+# backend/tests/test_diagnosis_cache.py
+import io
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from backend.app.services.vision.diagnosis_cache import DiagnosisCache, dhash, image_hash
+
+
+def _leaf(seed: int, size=(640, 480)) -> Image.Image:
+    # smooth random blobs: enough structure for the gradient hash to be meaningful
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, size=(6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.BICUBIC)
+
+
+def _jpeg(im: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _dist(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def test_dhash_stable_under_recompression_and_resize():
+    im = _leaf(1)
+    h = image_hash(_jpeg(im, 95))
+    assert _dist(h, image_hash(_jpeg(im, 40))) <= 4
+    assert _dist(h, image_hash(_jpeg(im.resize((320, 240)), 80))) <= 4
+    assert _dist(h, dhash(im.filter(ImageFilter.GaussianBlur(1)))) <= 4
+    assert _dist(h, image_hash(_jpeg(_leaf(2), 95))) > 10
+
+
+def test_near_duplicate_reuses_topk_and_distinct_image_misses():
+    cache = DiagnosisCache(hamming_max=6)
+    im = _leaf(3)
+    topk = [("Tomato___Late_blight", 0.9), ("Tomato___Early_blight", 0.05)]
+    cache.store_topk(image_hash(_jpeg(im, 95)), topk)
+
+    assert cache.lookup_topk(image_hash(_jpeg(im, 95))) == (topk, 0)
+    near, d = cache.lookup_topk(image_hash(_jpeg(im.resize((500, 375)), 50)))
+    assert near == topk and d is not None and d <= 6
+    assert cache.lookup_topk(image_hash(_jpeg(_leaf(4), 95))) == (None, None)
+    assert cache.stats()["vit"]["misses"] == 1
+
+
+def test_llm_key_normalizes_notes_and_ignores_probabilities():
+    cache = DiagnosisCache()
+    cache.store_diagnosis([("A", 0.7), ("B", 0.2)], "  Yellow   spots\n", {"diseases": ["A"]})
+    assert cache.lookup_diagnosis([("A", 0.6), ("B", 0.3)], "yellow spots") == {"diseases": ["A"]}
+    assert cache.lookup_diagnosis([("B", 0.6), ("A", 0.3)], "yellow spots") is None
+    assert cache.lookup_diagnosis([("A", 0.7), ("B", 0.2)], None) is None
+
+
+def test_entries_expire():
+    now = [1000.0]
+    cache = DiagnosisCache(vit_ttl_s=60, llm_ttl_s=10, clock=lambda: now[0])
+    cache.store_topk(0b1011, [("A", 1.0)])
+    cache.store_diagnosis([("A", 1.0)], None, {"diseases": ["A"]})
+    now[0] += 30
+    assert cache.lookup_topk(0b1011)[0] == [("A", 1.0)]
+    assert cache.lookup_diagnosis([("A", 1.0)], None) is None
+    now[0] += 31
+    assert cache.lookup_topk(0b1011) == (None, None)
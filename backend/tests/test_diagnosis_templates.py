@@ -0,0 +1,45 @@
+# backend/tests/test_diagnosis_templates.py
+import json
+import os
+
+from backend.app.services.vision.diagnosis_templates import TemplateStore
+
+
+def _write(path, templates, mtime_ns=None):
+    path.write_text(json.dumps({"version": 1, "templates": templates}), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+BLIGHT = {"symptoms": ["dark lesions"], "Treatments": ["copper spray"], "prevention_tips": ["rotate crops"]}
+
+
+def test_confident_top1_uses_template(tmp_path):
+    p = tmp_path / "t.json"
+    _write(p, {"en": {"Tomato___Late_blight": BLIGHT}})
+    store = TemplateStore(str(p))
+    out = store.diagnosis_for([("Tomato___Late_blight", 0.95), ("Tomato___Early_blight", 0.03)], min_prob=0.9)
+    assert out == {"success": True, "diseases": ["Tomato___Late_blight"], "disease_probabilities": [0.95], **BLIGHT}
+    assert store.stats()["hits"] == 1
+
+
+def test_falls_back_below_threshold_with_notes_or_missing_label(tmp_path):
+    p = tmp_path / "t.json"
+    _write(p, {"en": {"Tomato___Late_blight": BLIGHT}})
+    store = TemplateStore(str(p))
+    assert store.diagnosis_for([("Tomato___Late_blight", 0.7)], min_prob=0.9) is None
+    assert store.diagnosis_for([("Tomato___Late_blight", 0.95)], "spots spreading fast", min_prob=0.9) is None
+    assert store.diagnosis_for([("Tomato___Late_blight", 0.95)], lang="hi", min_prob=0.9) is None
+    assert store.diagnosis_for([("Corn___Rust", 0.99)], min_prob=0.9) is None
+    assert store.stats()["misses"] == 2
+
+
+def test_reloads_when_file_changes_and_tolerates_missing_file(tmp_path):
+    p = tmp_path / "t.json"
+    store = TemplateStore(str(p))
+    assert store.get("Tomato___Late_blight") is None
+    _write(p, {"en": {"Tomato___Late_blight": BLIGHT}}, mtime_ns=1_000_000_000)
+    assert store.get("Tomato___Late_blight") == BLIGHT
+    _write(p, {"en": {}, "hi": {"Tomato___Late_blight": BLIGHT}}, mtime_ns=2_000_000_000)
+    assert store.get("Tomato___Late_blight") is None
+    assert store.get("Tomato___Late_blight", "hi") == BLIGHT
@@ -0,0 +1,52 @@
+# backend/tests/test_embedding_cache.py
+from backend.app.rag.embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.doc_calls = []
+        self.query_calls = []
+
+    def _vec(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 0.5]
+
+    def embed_documents(self, texts):
+        self.doc_calls.append(list(texts))
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return self._vec(text)
+
+
+def test_documents_dedup_batch_and_persist(tmp_path):
+    inner = _FakeEmbeddings()
+    store = EmbeddingStore(str(tmp_path / "emb.sqlite"))
+    emb = CachedEmbeddings(inner, "m1", store, batch_size=2)
+
+    out = emb.embed_documents(["a", "bb", "a", "ccc"])
+    assert inner.doc_calls == [["a", "bb"], ["ccc"]]
+    assert out == [inner._vec(t) for t in ["a", "bb", "a", "ccc"]]
+
+    # a fresh wrapper over the same file (e.g. the next rebuild) embeds only new text
+    emb2 = CachedEmbeddings(inner, "m1", EmbeddingStore(str(tmp_path / "emb.sqlite")), batch_size=2)
+    emb2.embed_documents(["bb", "dddd", "a"])
+    assert inner.doc_calls[-1] == ["dddd"]
+    assert emb2.stats()["hits"] == 2 and emb2.stats()["misses"] == 1
+
+
+def test_queries_hit_cache_and_model_is_part_of_key(tmp_path):
+    inner = _FakeEmbeddings()
+    store = EmbeddingStore(str(tmp_path / "emb.sqlite"))
+    emb = CachedEmbeddings(inner, "m1", store)
+    q = "PM-KISAN eligibility"
+    assert emb.embed_query(q) == emb.embed_query(q) == inner._vec(q)
+    assert inner.query_calls == [q]
+    # documents embedded earlier serve identical query text too
+    emb.embed_documents(["KCC interest rate"])
+    emb.embed_query("KCC interest rate")
+    assert inner.query_calls == [q]
+
+    CachedEmbeddings(inner, "m2", store).embed_query(q)
+    assert inner.query_calls == [q, q]
+    assert emb.stats()["hit_ratio"] == 0.5
@@ -0,0 +1,76 @@
+# backend/tests/test_gemini_client.py
+import asyncio
+
+import httpx
+import pytest
+
+pytest.importorskip("backend.app.config")
+
+from backend.app.services import gemini  # noqa: E402
+
+
+def _ok(text="hi", usage=None):
+    body = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    if usage:
+        body["usageMetadata"] = usage
+    return httpx.Response(200, json=body)
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Route the pooled gemini clients to a scripted handler; no sleeping between retries."""
+    calls = []
+    script = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return script.pop(0) if len(script) > 1 else script[0]
+
+    async def ahandler(request: httpx.Request) -> httpx.Response:
+        return handler(request)
+
+    monkeypatch.setattr(gemini, "_api_key", lambda: "test-key")
+    monkeypatch.setattr(gemini, "backoff_s", lambda attempt, retry_after=0.0: 0.0)
+    monkeypatch.setattr(gemini, "get_client", lambda name: httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(
+        gemini, "get_async_client", lambda name: httpx.AsyncClient(transport=httpx.MockTransport(ahandler))
+    )
+    return script, calls
+
+
+def test_retries_429_then_succeeds_and_counts_tokens(fake_gemini):
+    script, calls = fake_gemini
+    script.extend([httpx.Response(429), httpx.Response(503), _ok("done", {"promptTokenCount": 7, "candidatesTokenCount": 3})])
+
+    before = gemini.llm_stats()["purposes"].get("t_retry", {}).get("retries", 0)
+    text = asyncio.run(gemini.agenerate("q", purpose="t_retry"))
+    assert text == "done" and len(calls) == 3
+    st = gemini.llm_stats()["purposes"]["t_retry"]
+    assert st["retries"] == before + 2
+    assert st["prompt_tokens"] >= 7 and st["output_tokens"] >= 3
+
+
+def test_client_errors_are_not_retried(fake_gemini):
+    script, calls = fake_gemini
+    script.append(httpx.Response(400, json={"error": {"message": "bad"}}))
+    with pytest.raises(gemini.GeminiError) as ei:
+        gemini.generate("q", purpose="t_400")
+    assert ei.value.status == 400 and len(calls) == 1
+
+
+def test_deadline_covers_slot_wait(monkeypatch, fake_gemini):
+    script, _ = fake_gemini
+    script.append(_ok())
+    monkeypatch.setattr(gemini, "MAX_CONCURRENCY", 1)
+
+    async def run():
+        gemini._LIMITERS.pop(asyncio.get_running_loop(), None)
+        sem = gemini._limiter()
+        await sem.acquire()             # someone else holds the only slot
+        with pytest.raises(TimeoutError):
+            await gemini.agenerate("q", timeout=0.05, purpose="t_deadline")
+        sem.release()
+        return await gemini.agenerate("q", timeout=1.0, purpose="t_deadline")
+
+    assert asyncio.run(run()) == "hi"
+    assert gemini.llm_stats()["purposes"]["t_deadline"]["timeouts"] >= 1
@@ -0,0 +1,51 @@
+# backend/tests/test_http_clients.py
+import asyncio
+
+import httpx
+import pytest
+
+
+def test_get_client_is_shared_per_upstream():
+    from backend.app.services import http_clients as hc
+
+    a = hc.get_client("open_meteo")
+    b = hc.get_client("open_meteo")
+    assert a is b
+    assert hc.get_client("gemini") is not a
+
+
+def test_unknown_upstream_raises():
+    from backend.app.services import http_clients as hc
+
+    with pytest.raises(KeyError):
+        hc.get_client("nope")
+
+
+def test_pool_stats_counts_requests():
+    from backend.app.services import http_clients as hc
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"ok": True})
+
+    stats = hc._STATS["soilgrids"]
+    before = stats.snapshot()["requests"]
+    client = httpx.Client(
+        transport=httpx.MockTransport(handler),
+        event_hooks={"request": [stats.on_request], "response": [stats.on_response]},
+    )
+    client.get("https://rest.isric.org/x")
+    snap = hc.pool_stats()["upstreams"]["soilgrids"]
+    assert snap["requests"] == before + 1
+    assert snap["status"].get("2xx", 0) >= 1
+    assert snap["host"] == "rest.isric.org"
+
+
+def test_async_client_rebinds_to_new_loop():
+    from backend.app.services import http_clients as hc
+
+    async def grab():
+        return hc.get_async_client("gemini")
+
+    c1 = asyncio.run(grab())
+    c2 = asyncio.run(grab())
+    assert c1 is not c2
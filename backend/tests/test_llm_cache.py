@@ -0,0 +1,103 @@
+# backend/tests/test_llm_cache.py
+import asyncio
+
+from backend.app.services.llm_cache import LLMCache, Semantic, date_bucket, exact_key, snap_coords
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1_000_000.0
+
+    def __call__(self):
+        return self.t
+
+
+def _embed(text):
+    # crude bag-of-words over a tiny vocabulary, enough to tell paraphrases from other questions
+    vocab = ["yellow", "leaves", "paddy", "rice", "price", "onion", "fertilizer"]
+    words = text.replace("?", "").split()
+    return [float(sum(w.startswith(v) for w in words)) for v in vocab] + [0.01]
+
+
+def test_exact_key_ignores_whitespace_but_not_model_or_config():
+    a = exact_key("ask", "m1", "Hello   farmer\n")
+    assert a == exact_key("ask", "m1", "Hello farmer")
+    assert a != exact_key("ask", "m2", "Hello farmer")
+    assert a != exact_key("ask", "m1", "Hello farmer", {"temperature": 0.2})
+    assert snap_coords(22.5712, 88.3639) == snap_coords(22.5688, 88.3601)
+    assert snap_coords(None, 88.0) is None
+    assert date_bucket(now=0) == "1970-01-01"
+
+
+def test_exact_hit_ttl_and_opt_in():
+    clock = _Clock()
+    cache = LLMCache(exact_endpoints=["translate"], semantic_endpoints=[], clock=clock)
+    calls = []
+
+    def call():
+        calls.append(1)
+        return "नमस्ते"
+
+    k = exact_key("translate", "m", "Translate: hello")
+    assert cache.cached("translate", k, call) == "नमस्ते"
+    assert cache.cached("translate", k, call) == "नमस्ते"
+    assert len(calls) == 1
+    clock.t += 31 * 24 * 3600           # past the translate TTL
+    cache.cached("translate", k, call)
+    assert len(calls) == 2
+    # endpoint not opted in: always calls through
+    cache.cached("ask", exact_key("ask", "m", "q"), call)
+    cache.cached("ask", exact_key("ask", "m", "q"), call)
+    assert len(calls) == 4
+    assert cache.stats()["endpoints"]["translate"]["exact_hits"] == 1
+
+
+def test_semantic_reuses_paraphrase_only_in_same_context():
+    cache = LLMCache(exact_endpoints=["ask"], semantic_endpoints=["ask"], threshold=0.9, embed=_embed, clock=_Clock())
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return f"answer {len(calls)}"
+
+    ctx = {"lang": "hi", "cell": "22.600,88.400", "day": "2026-10-17"}
+
+    async def ask(q, context):
+        return await cache.acached("ask", exact_key("ask", "m", f"prompt {q} {context}"), call, Semantic(context=dict(context), text=q))
+
+    async def run():
+        first = await ask("paddy leaves yellow?", ctx)
+        para = await ask("Yellow leaves in paddy", ctx)
+        other_q = await ask("onion price", ctx)
+        other_place = await ask("paddy leaves yellow?", {**ctx, "cell": "19.000,73.000"})
+        return first, para, other_q, other_place
+
+    first, para, other_q, other_place = asyncio.run(run())
+    assert para == first
+    assert other_q != first and other_place != first
+    assert len(calls) == 3
+    assert cache.stats()["endpoints"]["ask"]["semantic_hits"] == 1
+
+
+def test_context_only_semantic_and_embed_failure_is_a_miss():
+    def broken(_):
+        raise RuntimeError("no embeddings key")
+
+    cache = LLMCache(exact_endpoints=[], semantic_endpoints=["recos", "ask"], embed=broken, clock=_Clock())
+    ctx = {"cell": "22.600,88.400", "day": "2026-10-17", "rotation": []}
+    assert cache.cached("recos", "k1", lambda: "[1]", Semantic(context=ctx)) == "[1]"
+    # different prompt (fresh weather numbers), same cell/day: reused without embeddings
+    assert cache.cached("recos", "k2", lambda: "[2]", Semantic(context=ctx)) == "[1]"
+    assert cache.cached("ask", "k3", lambda: "a", Semantic(context=ctx, text="q")) == "a"
+    assert cache.cached("ask", "k4", lambda: "b", Semantic(context=ctx, text="q")) == "b"
+    assert cache.embed_errors >= 1
+
+
+def test_translate_never_matches_semantically():
+    cache = LLMCache(exact_endpoints=["translate"], semantic_endpoints=["translate"], threshold=0.5,
+                     embed=lambda t: [1.0, 0.0], clock=_Clock())
+    assert "translate" not in cache.semantic_endpoints
+    ctx = {"lang": "hi", "model": "m"}
+    first = cache.cached("translate", "k20", lambda: "20 किलो", Semantic(context=ctx, text="apply 20 kg urea"))
+    second = cache.cached("translate", "k30", lambda: "30 किलो", Semantic(context=ctx, text="apply 30 kg urea"))
+    assert (first, second) == ("20 किलो", "30 किलो")
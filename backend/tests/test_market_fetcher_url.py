@@ -20,9 +20,10 @@ def test_agmarknet_http_fetcher_uses_resource_id_and_key(monkeypatch):
         def __init__(self, *a, **kw): pass
         def __enter__(self): return self
         def __exit__(self, *a): return False
-        def get(self, url, params=None):
+        def get(self, url, params=None, timeout=None):
             captured["url"] = url
             captured["params"] = dict(params or {})
+            captured["timeout"] = timeout
             return FakeResponse()
 
     # Monkeypatch httpx.Client to our fake
@@ -38,3 +39,4 @@ def test_agmarknet_http_fetcher_uses_resource_id_and_key(monkeypatch):
     assert captured["params"]["api-key"] == "TEST_KEY"
     assert captured["params"]["format"] == "json"
     assert captured["params"]["filters[district]"] == "Kolkata"
+    assert captured["timeout"] == m.get_settings().http_timeout_seconds
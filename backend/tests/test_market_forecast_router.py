@@ -0,0 +1,79 @@
+# backend/tests/test_market_forecast_router.py
+from __future__ import annotations
+
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+pytest.importorskip("backend.app.config")
+
+
+def build_app_with_stubs(monkeypatch, *, seeds, fail_forecast=False):
+    # Import inside to ensure test isolation
+    from backend.app.routers import market_forecast as mf
+
+    looked_up = []
+    lock = threading.Lock()
+
+    # Stub seed lookup: runs on the executor threads; raises for unknown districts
+    def stub_current_price(district, commodity, mandi):
+        with lock:
+            looked_up.append((district, commodity, mandi))
+        if district not in seeds:
+            raise RuntimeError("agmarknet down")
+        return seeds[district]
+
+    def stub_forecast_batch(items, horizon_days):
+        if fail_forecast:
+            raise RuntimeError("model exploded")
+        return [{"commodity": it["commodity"], "now_price": it["now_price"], "horizon_days": horizon_days}
+                for it in items]
+
+    monkeypatch.setattr(mf, "_current_price", stub_current_price)
+    monkeypatch.setattr(mf, "forecast_batch", stub_forecast_batch)
+
+    app = FastAPI()
+    app.include_router(mf.router)
+    return TestClient(app), looked_up
+
+def test_batch_forecast_seeds_missing_prices_and_keeps_order(monkeypatch):
+    client, looked_up = build_app_with_stubs(monkeypatch, seeds={"Kolkata": 3000.0, "Nadia": None})
+
+    r = client.post("/api/market/forecast/batch", json={
+        "horizon_days": 5,
+        "series": [
+            {"commodity": "Rice", "district": "Kolkata"},
+            {"commodity": "Jute", "now_price": 5000},
+            {"commodity": "Potato", "district": "Nadia"},    # lookup finds no price
+            {"commodity": "Onion", "district": "Hooghly"},   # lookup raises
+        ],
+    })
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data["horizon_days"] == 5
+    res = data["results"]
+    assert res[0] == {"commodity": "Rice", "now_price": 3000.0, "horizon_days": 5}
+    assert res[1] == {"commodity": "Jute", "now_price": 5000.0, "horizon_days": 5}
+    assert "error" in res[2] and "error" in res[3]
+    # only series without now_price were looked up
+    assert sorted(d for d, _, _ in looked_up) == ["Hooghly", "Kolkata", "Nadia"]
+
+def test_batch_forecast_validation(monkeypatch):
+    client, _ = build_app_with_stubs(monkeypatch, seeds={})
+
+    assert client.post("/api/market/forecast/batch", json={"series": []}).status_code == 422
+    too_many = [{"commodity": "Rice", "now_price": 1000}] * 201
+    assert client.post("/api/market/forecast/batch", json={"series": too_many}).status_code == 422
+    bad = {"series": [{"commodity": "R", "now_price": 1000}]}        # commodity too short
+    assert client.post("/api/market/forecast/batch", json=bad).status_code == 422
+    bad = {"series": [{"commodity": "Rice", "now_price": 1000}], "horizon_days": 31}
+    assert client.post("/api/market/forecast/batch", json=bad).status_code == 422
+
+def test_batch_forecast_model_failure_maps_to_502(monkeypatch):
+    client, _ = build_app_with_stubs(monkeypatch, seeds={}, fail_forecast=True)
+
+    r = client.post("/api/market/forecast/batch", json={"series": [{"commodity": "Rice", "now_price": 1000}]})
+    assert r.status_code == 502
+    assert "forecast failed" in r.json()["detail"]
@@ -0,0 +1,105 @@
+# backend/tests/test_model_registry.py
+import threading
+import time
+
+import pytest
+
+from backend.app.services.model_registry import ModelRegistry
+
+
+def test_concurrent_first_requests_load_once():
+    reg = ModelRegistry()
+    loads = []
+    def slow_loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return "model"
+    reg.register("m", slow_loader)
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(reg.get("m"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert out == ["model"] * 8
+    assert len(loads) == 1
+
+
+def test_eager_start_records_failures_and_readiness():
+    reg = ModelRegistry()
+    warmed = []
+    reg.register("m", lambda: "model", warmup=warmed.append)
+    reg.register("bad", lambda: 1 / 0)
+    reg.start("eager")
+
+    st = reg.status()
+    assert warmed == ["model"]
+    assert st["models"]["m"]["state"] == "ready"
+    assert st["models"]["bad"]["state"] == "failed"
+    assert "ZeroDivisionError" in st["models"]["bad"]["error"]
+    assert st["ready"] is False and st["retrying"] is True
+    reg.stop()
+
+    with pytest.raises(KeyError):
+        reg.get("nope")
+
+
+def test_failed_optional_model_does_not_gate_readiness():
+    reg = ModelRegistry()
+    reg.register("vit", lambda: "model")
+    reg.register("forecast", lambda: 1 / 0, required=False)
+    reg.start("eager")
+
+    st = reg.status()
+    assert st["models"]["forecast"]["state"] == "failed"
+    assert st["ready"] is True
+    assert st["degraded"] == ["forecast"]
+
+
+def test_lazy_mode_is_ready_and_reset_reloads():
+    reg = ModelRegistry()
+    loads = []
+    reg.register("m", lambda: loads.append(1) or len(loads))
+    reg.start("lazy")
+    assert reg.ready() is True
+    assert reg.peek("m") is None
+
+    assert reg.get("m") == 1
+    reg.reset("m")
+    assert reg.get("m") == 2
+
+
+def test_background_mode_becomes_ready():
+    reg = ModelRegistry()
+    reg.register("m", lambda: time.sleep(0.02) or "model")
+    reg.start("background")
+    deadline = time.time() + 2
+    while not reg.ready() and time.time() < deadline:
+        time.sleep(0.01)
+    assert reg.ready()
+
+
+def test_failed_required_model_is_retried_until_ready(monkeypatch):
+    from backend.app.services import model_registry
+
+    monkeypatch.setattr(model_registry, "RETRY_S", 0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("weights not mounted yet")
+        return "model"
+
+    reg = ModelRegistry()
+    reg.register("vit", flaky)
+    reg.start("eager")
+    assert reg.ready() is False
+    try:
+        deadline = time.time() + 2
+        while not reg.ready() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        reg.stop()
+    assert reg.ready() and len(attempts) == 3 and reg.status()["retries"] == 2
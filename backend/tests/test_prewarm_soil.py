@@ -0,0 +1,77 @@
+# backend/tests/test_prewarm_soil.py
+import asyncio
+from types import SimpleNamespace
+
+from backend.app.jobs import prewarm_soil as job
+from backend.app.services import soil_store
+from backend.app.services.soil_store import SoilStore
+
+
+def test_prewarm_dedupes_cells_and_counts_hits(tmp_path, monkeypatch):
+    store = SoilStore(str(tmp_path / "soil.sqlite3"))
+    store.put(22.57, 88.36, {"properties": {"layers": []}})   # already warm
+
+    fetched = []
+    async def fake_resolve(lat, lon):
+        fetched.append((lat, lon))
+        if lat > 30:
+            raise RuntimeError("no soil data found in neighborhood")
+        return SimpleNamespace(probe_count=1)
+    monkeypatch.setattr(job, "get_soil_async", fake_resolve)
+
+    pts = [
+        (22.57, 88.36),
+        (22.5701, 88.3601),   # same cell as above
+        (23.10, 88.10),
+        (31.00, 77.00),
+    ]
+    rep = asyncio.run(job.prewarm(pts, concurrency=2, store=store)).as_dict()
+
+    assert rep["points"] == 4
+    assert rep["cells"] == 3
+    assert rep["already_warm"] == 1
+    assert rep["fetched"] == 1
+    assert rep["failed"] == 1
+    assert len(fetched) == 2
+
+
+def test_negative_cell_answered_by_neighbour_is_not_fetched(tmp_path, monkeypatch):
+    store = SoilStore(str(tmp_path / "soil.sqlite3"))
+    store.put(22.57, 88.36, None)                   # known-empty cell
+
+    async def fake_resolve(lat, lon):
+        return SimpleNamespace(probe_count=0)       # stored neighbour answered
+    monkeypatch.setattr(job, "get_soil_async", fake_resolve)
+
+    rep = asyncio.run(job.prewarm([(22.57, 88.36), (23.10, 88.10)], store=store)).as_dict()
+
+    assert rep["negative"] == 1
+    assert rep["resolved_locally"] == 2
+    assert rep["fetched"] == 0
+    assert rep["hit_ratio"] == 1.0
+
+
+def test_fetched_cell_lands_in_the_given_store(tmp_path, monkeypatch):
+    store = SoilStore(str(tmp_path / "soil.sqlite3"))
+    default = SoilStore(str(tmp_path / "default.sqlite3"))
+    monkeypatch.setattr(soil_store, "_STORE", default)
+
+    async def fake_resolve(lat, lon):
+        soil_store.get_store().put(lat, lon, {"properties": {"layers": []}})    # as resolve_soil does
+        return SimpleNamespace(probe_count=1)
+    monkeypatch.setattr(job, "get_soil_async", fake_resolve)
+
+    rep = asyncio.run(job.prewarm([(23.10, 88.10)], store=store)).as_dict()
+    assert rep["fetched"] == 1
+    assert store.lookup(23.10, 88.10) is not None
+    assert default.lookup(23.10, 88.10) is None
+    assert soil_store.get_store() is default        # the previous store is back
+
+    rep = asyncio.run(job.prewarm([(23.10, 88.10)], store=store)).as_dict()
+    assert rep["already_warm"] == 1 and rep["fetched"] == 0
+
+
+def test_centroid_csv(tmp_path):
+    p = tmp_path / "d.csv"
+    p.write_text("district,lat,lon\nKolkata,22.57,88.36\nBad,x,y\n", encoding="utf-8")
+    assert job.centroid_points(str(p)) == [(22.57, 88.36)]
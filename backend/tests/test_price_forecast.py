@@ -0,0 +1,158 @@
+# backend/tests/test_price_forecast.py
+import datetime as dt
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+lgb = pytest.importorskip("lightgbm")
+joblib = pytest.importorskip("joblib")
+
+from backend.app.services import price_forecast as pf
+
+FEATURES = [
+    "doy", "dow", "month",
+    "commodity_id", "state_id", "district_id", "market_id", "variety_id", "grade_id",
+    "lag_1", "lag_7", "lag_14", "lag_28",
+    "rollmean_7", "rollmean_14", "rollmean_28",
+    "rollstd_7", "rollstd_14", "rollstd_28",
+]
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, len(FEATURES))) * 100 + 2000
+    y = X[:, FEATURES.index("lag_1")] * 0.9 + X[:, FEATURES.index("rollstd_7")] + rng.normal(size=400) * 10
+    for q, name in ((0.2, "p20"), (0.5, "p50"), (0.8, "p80")):
+        params = {"objective": "quantile", "alpha": q, "num_leaves": 8, "verbose": -1}
+        m = lgb.train(params, lgb.Dataset(X, y, feature_name=FEATURES), num_boost_round=20)
+        joblib.dump(m, tmp_path / f"model_{name}.joblib")
+    (tmp_path / "meta.json").write_text(json.dumps({"features": FEATURES, "resid_median": 2.5, "resid_std": 500.0}))
+    (tmp_path / "encoder.json").write_text(json.dumps({"commodity": {"Onion": 3}}))
+
+    monkeypatch.setattr(pf, "MODEL_DIR", str(tmp_path))
+    pf.REGISTRY.reset(pf.MODEL_NAME)
+    pf._FORECASTS.clear()
+    return tmp_path
+
+
+def _pandas_features(prices, fdate, ids):
+    # the original per-step builder, kept here as the reference semantics
+    tail = pd.Series(prices, dtype=float)
+    row = {"doy": float(fdate.timetuple().tm_yday), "dow": float(fdate.weekday()), "month": float(fdate.month)}
+    row.update({k: float(v) for k, v in ids.items()})
+    for L in (1, 7, 14, 28):
+        row[f"lag_{L}"] = float(tail.iloc[-1]) if len(tail) < L else float(tail.iloc[-L])
+    for W in (7, 14, 28):
+        tw = tail.iloc[-W:] if len(tail) >= W else tail
+        row[f"rollmean_{W}"] = float(tw.mean())
+        row[f"rollstd_{W}"] = float(tw.std() if len(tw) > 1 else 0.0)
+    return row
+
+
+def test_ring_history_matches_pandas_features():
+    rng = np.random.default_rng(1)
+    prices = list(2000 + rng.normal(size=40) * 150)
+    class _Zero:
+        def predict(self, X):
+            return np.zeros(len(X))
+    engine = pf._Engine((_Zero(),) * 3, {"features": FEATURES})
+    ids = {"commodity_id": 3, "state_id": 0, "district_id": 0, "market_id": 0, "variety_id": 0, "grade_id": 0}
+    X = engine.matrix([ids])
+
+    hist = pf._RingHistory(np.array([prices[0]]))
+    day = dt.date(2025, 1, 1)
+    for n in range(1, len(prices)):
+        engine.fill_step(X, hist, day)
+        ref = _pandas_features(prices[:n], day, ids)
+        np.testing.assert_allclose(X[0], [ref[f] for f in FEATURES], rtol=1e-9, atol=1e-6)
+        hist.push(np.array([prices[n]]))
+
+
+def test_forecast_horizon_matches_reference_loop(artifacts):
+    out = pf.forecast_horizon(now_price=2100.0, now_date=dt.date(2025, 3, 1), commodity="Onion", horizon_days=30)
+    assert len(out["forecast"]) == 30
+    assert out["forecast"][0]["date"] == "2025-03-02"
+
+    models = [joblib.load(artifacts / f"model_{n}.joblib") for n in ("p20", "p50", "p80")]
+    ids = {"commodity_id": 3, "state_id": 0, "district_id": 0, "market_id": 0, "variety_id": 0, "grade_id": 0}
+    prices = [2100.0]
+    for row in out["forecast"]:
+        fdate = dt.date.fromisoformat(row["date"])
+        Xf = pd.DataFrame([_pandas_features(prices, fdate, ids)])[FEATURES].values
+        y20, y50, y80 = (float(m.predict(Xf)[0]) for m in models)
+        assert row["p50"] == int(round(y50))
+        assert row["p20"] == int(round(y20))
+        assert row["p80"] == int(round(y80))
+        assert row["p50_adj"] == int(round(y50 + 2.5))
+        assert row["p20_adj"] <= row["p50_adj"] <= row["p80_adj"]
+        prices.append(y50 + 2.5)
+
+
+def test_forecast_batch_matches_single_series(artifacts):
+    day = dt.date(2025, 3, 1)
+    series = [
+        {"now_price": 2100.0, "commodity": "Onion", "district": "Nashik"},
+        {"now_price": 1500.0, "commodity": "Potato"},
+        {"now_price": 3300.0, "commodity": "Onion", "market": "Lasalgaon"},
+    ]
+    packs = pf.forecast_batch(series, now_date=day, horizon_days=14)
+    assert len(packs) == 3
+    for s, pack in zip(series, packs):
+        single = pf.forecast_horizon(now_date=day, horizon_days=14, **s)
+        assert pack == single
+    assert pf.forecast_batch([], horizon_days=7) == []
+
+
+def _count_predicts(monkeypatch):
+    # one entry per engine step (warmup inferences are not counted)
+    calls = []
+    real = pf._run_engine
+    def counting(ids, seeds, today, horizon_days):
+        calls.extend([len(ids)] * horizon_days)
+        return real(ids, seeds, today, horizon_days)
+    monkeypatch.setattr(pf, "_run_engine", counting)
+    return calls
+
+
+def test_cached_long_run_serves_shorter_horizons(artifacts, monkeypatch):
+    calls = _count_predicts(monkeypatch)
+    day = dt.date(2025, 3, 1)
+    long = pf.forecast_horizon(now_price=2100.0, now_date=day, commodity="Onion", horizon_days=30)
+    assert len(calls) == 30
+
+    short = pf.forecast_horizon(now_price=2100.2, now_date=day, commodity="Onion", horizon_days=7)
+    assert len(calls) == 30                     # prefix of the cached run, same quantized seed
+    assert short["forecast"] == long["forecast"][:7]
+    assert short["context"]["now_price"] == 2100.2
+
+    short["forecast"][0]["p50"] = -1            # callers get copies
+    again = pf.forecast_horizon(now_price=2100.0, now_date=day, commodity="Onion", horizon_days=7)
+    assert again["forecast"][0]["p50"] != -1
+
+    pf.forecast_horizon(now_price=2100.0, now_date=day, commodity="Potato", horizon_days=7)
+    assert len(calls) == 37
+
+
+def test_artifact_change_invalidates_cache(artifacts, monkeypatch):
+    calls = _count_predicts(monkeypatch)
+    day = dt.date(2025, 3, 1)
+    pf.forecast_horizon(now_price=2100.0, now_date=day, commodity="Onion", horizon_days=5)
+    pf.forecast_horizon(now_price=2100.0, now_date=day, commodity="Onion", horizon_days=5)
+    assert len(calls) == 5
+
+    meta = json.loads((artifacts / "meta.json").read_text())
+    meta["resid_median"] = 100.0
+    (artifacts / "meta.json").write_text(json.dumps(meta) + "\n")
+    out = pf.forecast_horizon(now_price=2100.0, now_date=day, commodity="Onion", horizon_days=5)
+    assert len(calls) == 10
+    assert out["forecast"][0]["p50_adj"] == out["forecast"][0]["p50"] + 100
+
+
+def test_artifacts_load_through_registry_with_warmup(artifacts):
+    pf._load_artifacts()
+    st = pf.REGISTRY.status()["models"][pf.MODEL_NAME]
+    assert st["state"] == "ready"
+    assert st["warmup_s"] is not None
@@ -0,0 +1,164 @@
+# backend/tests/test_rag_index_manager.py
+import inspect
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_chroma")
+
+from backend.app.rag import index  # noqa: E402
+
+
+def test_build_or_load_index_is_defined_once_and_goes_through_the_manager(monkeypatch):
+    assert inspect.getsource(index).count("def build_or_load_index(") == 1
+
+    calls = []
+
+    class FakeManager:
+        def refresh(self, rebuild=False):
+            calls.append(("refresh", rebuild))
+
+        def get(self):
+            calls.append("get")
+            return "db"
+
+    monkeypatch.setattr(index, "MANAGER", FakeManager())
+    assert index.build_or_load_index() == "db"
+    assert index.build_or_load_index(rebuild=True) == "db"
+    assert calls == ["get", ("refresh", True), "get"]
+
+
+def _isolate(monkeypatch, tmp_path):
+    monkeypatch.setattr(index, "PERSIST_DIR", tmp_path)
+    monkeypatch.setattr(index, "SYNC_LOCK_PATH", tmp_path / ".sync.lock")
+    monkeypatch.setattr(index, "RETIRED_PATH", tmp_path / ".retired_collections.json")
+
+
+def test_watcher_follows_a_sync_done_by_another_manager(tmp_path, monkeypatch):
+    # two managers stand in for two workers sharing the persisted manifest
+    _isolate(monkeypatch, tmp_path)
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text("v1", encoding="utf-8")
+    monkeypatch.setattr(index, "MANIFEST_PATH", manifest)
+    monkeypatch.setattr(index, "_stat_fingerprint", lambda: "seeds-unchanged")
+    monkeypatch.setattr(index.local_index, "RAG_BACKEND", "chroma")
+
+    def fake_sync(db, name, rebuild):
+        coll = manifest.read_text(encoding="utf-8")         # the manifest names the live collection
+        report = {"embedded_chunks": 0, "deleted_chunks": 0, "total_chunks": 0, "seconds": 0.0}
+        return f"db-{coll}", coll, report, None
+    monkeypatch.setattr(index, "_sync", fake_sync)
+
+    a, b = index.IndexManager(), index.IndexManager()
+    assert a.get() == "db-v1" and b.get() == "db-v1"
+    assert not b.stale()
+
+    manifest.write_text("v2", encoding="utf-8")             # worker a rebuilds into a new collection
+    a.refresh(rebuild=True)
+    assert a.get() == "db-v2" and b.stale()
+
+    b.start_watcher(interval_s=0.01)
+    try:
+        deadline = time.monotonic() + 2.0
+        while b.get() != "db-v2" and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        b.stop_watcher()
+    assert b.get() == "db-v2" and not b.stale()
+
+
+def test_retired_collection_outlives_the_watch_interval_and_the_process(tmp_path, monkeypatch):
+    _isolate(monkeypatch, tmp_path)
+    assert index.RETIRE_GRACE_S >= 2 * index.WATCH_INTERVAL_S
+    dropped = []
+
+    class FakeDB:
+        def __init__(self, name):
+            self.name = name
+
+        def delete_collection(self):
+            dropped.append(self.name)
+
+    monkeypatch.setattr(index, "_open_db", lambda name=index.COLLECTION: FakeDB(name))
+
+    # e.g. `--rebuild` from the CLI: the process records the old collection and exits
+    now = time.time()
+    with index.sync_lock():
+        index.retire_collection("krishi_rag_old", grace_s=600)
+    # any later process drops it once the grace period is over, not before
+    with index.sync_lock():
+        assert index.drop_retired(now=now + 300) == [] and not dropped
+        assert index.drop_retired(now=now + 601) == ["krishi_rag_old"]
+    assert dropped == ["krishi_rag_old"] and index._load_retired() == {}
+
+
+def test_syncs_are_serialized_across_managers(tmp_path, monkeypatch):
+    # separate managers have separate in-process locks; only the file lock keeps them apart
+    _isolate(monkeypatch, tmp_path)
+    monkeypatch.setattr(index, "MANIFEST_PATH", tmp_path / "manifest.json")
+    monkeypatch.setattr(index, "_stat_fingerprint", lambda: "fp")
+    monkeypatch.setattr(index.local_index, "RAG_BACKEND", "chroma")
+    active, overlaps = [0], []
+
+    def fake_sync(db, name, rebuild):
+        active[0] += 1
+        overlaps.append(active[0])
+        time.sleep(0.02)
+        active[0] -= 1
+        return "db", "coll", {"embedded_chunks": 0, "deleted_chunks": 0, "total_chunks": 0, "seconds": 0.0}, None
+    monkeypatch.setattr(index, "_sync", fake_sync)
+
+    threads = [threading.Thread(target=index.IndexManager().refresh) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(overlaps) == 4 and max(overlaps) == 1
+
+
+def _fake_store(monkeypatch, tmp_path):
+    from backend.app.rag.loader import ParsedFile
+    from backend.app.rag.manifest import chunk_id
+
+    _isolate(monkeypatch, tmp_path)
+    seeds = tmp_path / "seeds"
+    seeds.mkdir()
+    monkeypatch.setattr(index, "SEEDS_DIR", seeds)
+    monkeypatch.setattr(index, "MANIFEST_PATH", tmp_path / "manifest.json")
+    monkeypatch.setattr(index, "STAGING_MANIFEST_PATH", tmp_path / "manifest.building.json")
+
+    stored = {}
+
+    class FakeDB:
+        def add_documents(self, docs, ids):
+            stored.update(zip(ids, docs))
+
+        def delete(self, ids):
+            for i in ids:
+                stored.pop(i, None)
+
+    def fake_parsed(jobs):
+        for key, path, sha in jobs:
+            ids = [chunk_id(key, sha, 0, start) for start in (0, 800)]
+            yield ParsedFile(key=key, sha256=sha, docs=[f"{key}@{i}" for i in ids], ids=ids, parse_s=0.0)
+
+    monkeypatch.setattr(index, "_open_db", lambda name=index.COLLECTION: FakeDB())
+    monkeypatch.setattr(index, "iter_parsed", fake_parsed)
+    return seeds, stored
+
+
+def test_removing_one_of_two_identical_seed_files_keeps_the_others_chunks(tmp_path, monkeypatch):
+    seeds, stored = _fake_store(monkeypatch, tmp_path)
+    (seeds / "copy").mkdir()
+    for p in (seeds / "urea.txt", seeds / "copy" / "urea.txt"):
+        p.write_text("same bytes", encoding="utf-8")
+
+    db, name, report, _ = index._sync(None, None, rebuild=False)
+    assert report["total_chunks"] == 4 and len(stored) == 4
+
+    (seeds / "copy" / "urea.txt").unlink()
+    db, name, report, _ = index._sync(db, name, rebuild=False)
+    assert report["deleted_chunks"] == 2 and report["total_chunks"] == 2
+    assert sorted(stored.values()) == sorted(f"urea.txt@{i}" for i in index.Manifest.load(
+        index.MANIFEST_PATH, index._manifest_settings()).files["urea.txt"].ids)
@@ -0,0 +1,49 @@
+# backend/tests/test_rag_loader.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.rag.loader import bounded_imap
+
+
+def test_bounded_imap_keeps_order_and_limits_in_flight():
+    lock = threading.Lock()
+    submitted = []
+    consumed = []
+    peak = [0]
+
+    def work(x):
+        time.sleep(0.001 * (5 - x % 5))      # later items often finish first
+        return x * x
+
+    class _CountingPool(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            with lock:
+                submitted.append(args[0])
+                peak[0] = max(peak[0], len(submitted) - len(consumed))
+            return super().submit(fn, *args)
+
+    with _CountingPool(max_workers=4) as pool:
+        out = []
+        for r in bounded_imap(work, range(20), pool, max_in_flight=3):
+            consumed.append(r)
+            out.append(r)
+    assert out == [x * x for x in range(20)]
+    assert peak[0] <= 3
+
+
+def test_bounded_imap_propagates_worker_errors():
+    def work(x):
+        if x == 2:
+            raise ValueError("bad pdf")
+        return x
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        it = bounded_imap(work, range(5), pool, max_in_flight=2)
+        assert [next(it), next(it)] == [0, 1]
+        try:
+            next(it)
+        except ValueError as e:
+            assert "bad pdf" in str(e)
+        else:
+            raise AssertionError("expected the worker error")
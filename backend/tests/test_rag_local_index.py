@@ -0,0 +1,100 @@
+# backend/tests/test_rag_local_index.py
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from backend.app.rag import local_index
+from backend.app.rag.local_index import LocalIndex, normalize_rows, top_k, write_index
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _corpus(n=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"c{i}" for i in range(n)]
+    items = [{"text": f"chunk {i}", "source": "a.pdf", "title": "A", "page": i // 10} for i in range(n)]
+    return ids, vecs, items
+
+
+def test_top_k_matches_full_sort():
+    _, vecs, _ = _corpus()
+    m = normalize_rows(vecs)
+    q = normalize_rows(np.random.default_rng(1).normal(size=16))
+    idx, scores = top_k(m, q, 5)
+    ref = np.argsort(-(m @ q))[:5]
+    assert idx.tolist() == ref.tolist()
+    assert np.all(np.diff(scores) <= 0)
+    assert top_k(m, q, 500)[0].shape == (200,)
+
+
+def test_export_roundtrip_is_memory_mapped_cosine_search(tmp_path):
+    ids, vecs, items = _corpus()
+    out = str(tmp_path / "local")
+    report = write_index(out, ids, vecs * 3.0, items, embed_model="m", signature="s1", build_hnsw=False)
+    assert report["count"] == 200 and report["dim"] == 16
+
+    idx = LocalIndex.load(out, ann="brute")
+    assert isinstance(idx.vectors, np.memmap)
+    hits = idx.search_vector(vecs[42] * 0.5, k=3)           # scale-invariant: cosine
+    assert hits[0][1]["id"] == "c42" and abs(hits[0][0] - 1.0) < 1e-5
+    assert hits[0][1]["page"] == 4 and len(hits) == 3
+
+    # re-export replaces the directory wholesale
+    write_index(out, ids[:10], vecs[:10], items[:10], embed_model="m", build_hnsw=False)
+    assert len(LocalIndex.load(out).items) == 10
+
+
+def test_empty_export_loads(tmp_path):
+    out = str(tmp_path / "local")
+    write_index(out, [], np.zeros((0, 8), dtype=np.float32), [], embed_model="m", build_hnsw=False)
+    assert LocalIndex.load(out).search_vector(np.ones(8), k=4) == []
+
+
+def test_export_from_another_process_is_picked_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_index, "_LOCAL", None)
+    ids, vecs, items = _corpus(n=20)
+    out = str(tmp_path / "local")
+    write_index(out, ids, vecs, items, embed_model="m", signature="s1", build_hnsw=False)
+    first = local_index.get_local_index(out)
+    assert first.signature == "s1"
+    assert local_index.get_local_index(out) is first            # unchanged on disk: no reload
+
+    # another worker re-exports the same directory
+    code = (
+        "import numpy as np; from backend.app.rag.local_index import write_index; "
+        f"write_index({out!r}, ['x0', 'x1'], np.eye(2, 16, dtype=np.float32), "
+        "[{'text': 'a'}, {'text': 'b'}], embed_model='m', signature='s2', build_hnsw=False)"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True)
+
+    second = local_index.get_local_index(out)
+    assert second.signature == "s2" and len(second.items) == 2
+    # a query that still holds the old index keeps working on its mapping
+    assert first.search_vector(vecs[3], k=1)[0][1]["id"] == "c3"
+
+
+def test_concurrent_exports_do_not_collide(tmp_path):
+    ids, vecs, items = _corpus(n=50)
+    out = str(tmp_path / "local")
+    errors = []
+
+    def run(n):
+        try:
+            write_index(out, ids[:n], vecs[:n], items[:n], embed_model="m", signature=f"s{n}", build_hnsw=False)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in (10, 20, 30, 40, 50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    idx = LocalIndex.load(out)
+    assert len(idx.items) == int(idx.signature[1:])             # one complete export won
+    assert sorted(os.listdir(tmp_path)) == ["local", "local.lock"]
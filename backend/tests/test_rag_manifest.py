@@ -0,0 +1,63 @@
+# backend/tests/test_rag_manifest.py
+import os
+
+from backend.app.rag.manifest import FileEntry, Manifest, chunk_id, file_sha256
+
+SETTINGS = {"embed_model": "m", "chunk_size": 1000, "chunk_overlap": 200}
+
+
+def _seed(tmp_path, name, text):
+    p = tmp_path / name
+    p.write_text(text, encoding="utf-8")
+    return p
+
+
+def _record(m, key, p, ids):
+    st = p.stat()
+    m.files[key] = FileEntry(sha256=file_sha256(p), size=st.st_size, mtime_ns=st.st_mtime_ns, ids=ids)
+
+
+def test_plan_only_changed_new_and_removed_files(tmp_path):
+    a, b, c = _seed(tmp_path, "a.txt", "alpha"), _seed(tmp_path, "b.txt", "beta"), _seed(tmp_path, "c.txt", "gamma")
+    m = Manifest(tmp_path / "manifest.json", SETTINGS)
+    _record(m, "a.txt", a, ["a1"])
+    _record(m, "b.txt", b, ["b1"])
+    _record(m, "gone.txt", c, ["g1"])
+
+    b.write_text("beta v2", encoding="utf-8")
+    plan = m.plan({"a.txt": a, "b.txt": b, "c.txt": c})
+    assert plan.unchanged == ["a.txt"]
+    assert plan.changed == {"b.txt": file_sha256(b), "c.txt": file_sha256(c)}
+    assert plan.removed == ["gone.txt"]
+
+
+def test_touched_but_identical_file_is_unchanged(tmp_path):
+    a = _seed(tmp_path, "a.txt", "alpha")
+    m = Manifest(tmp_path / "manifest.json", SETTINGS)
+    _record(m, "a.txt", a, ["a1"])
+    st = a.stat()
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    plan = m.plan({"a.txt": a})
+    assert plan.unchanged == ["a.txt"] and not plan.changed
+    assert m.files["a.txt"].mtime_ns == a.stat().st_mtime_ns
+
+
+def test_roundtrip_and_settings_change_invalidates(tmp_path):
+    a = _seed(tmp_path, "a.txt", "alpha")
+    path = tmp_path / "manifest.json"
+    m = Manifest(path, SETTINGS, collection="krishi_rag_20250101_000000")
+    _record(m, "a.txt", a, ["a1", "a2"])
+    m.save()
+    loaded = Manifest.load(path, SETTINGS)
+    assert loaded.files == m.files and loaded.collection == "krishi_rag_20250101_000000"
+    assert Manifest.load(path, {**SETTINGS, "embed_model": "other"}).is_empty
+    assert Manifest.load(tmp_path / "missing.json", SETTINGS).is_empty
+
+
+def test_chunk_ids_are_stable_and_content_derived():
+    sha = "ab" * 32
+    assert chunk_id("a.pdf", sha, 3, 1200) == chunk_id("a.pdf", sha, 3, 1200)
+    assert chunk_id("a.pdf", sha, 3, 1200) != chunk_id("a.pdf", sha, 3, 400)
+    assert chunk_id("a.pdf", sha, None, 0) != chunk_id("a.pdf", "cd" * 32, None, 0)
+    # byte-identical copies at different paths get their own ids
+    assert chunk_id("a.pdf", sha, 3, 1200) != chunk_id("copy/a.pdf", sha, 3, 1200)
@@ -0,0 +1,103 @@
+# backend/tests/test_reco_precompute.py
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("backend.app.config")
+
+from backend.app.jobs import precompute_recos  # noqa: E402
+from backend.app.services import reco_precompute as rp  # noqa: E402
+from backend.app.services.crop_recommendation import season_of  # noqa: E402
+
+
+def test_season_of_boundaries():
+    assert season_of(date(2025, 7, 1)) == "kharif-2025"
+    assert season_of(date(2025, 11, 1)) == "rabi-2025"
+    assert season_of(date(2026, 1, 15)) == "rabi-2025"
+    assert season_of(date(2026, 4, 1)) == "zaid-2026"
+
+
+def test_keys_normalize_rotation_and_snap_to_weather_cell():
+    assert rp.rotation_key([" Rice ", "WHEAT", "", "maize", "gram"]) == "rice|wheat|maize"
+    assert rp.rotation_list("") == []
+    a, _, _ = rp.cell_key(18.5201, 73.8201)
+    b, _, _ = rp.cell_key(18.5204, 73.8299)
+    assert a == b
+
+
+def test_classify_fresh_stale_expired():
+    now = datetime(2026, 1, 10, 12)
+    sig = rp.weather_signature({"daily": [{"rain_mm": 0.0, "tmax_c": 30.0}]})
+    assert rp.classify(now - timedelta(hours=2), sig, now=now) == "fresh"
+    assert rp.classify(now - timedelta(hours=2), sig, now=now, current_signature=sig) == "fresh"
+    wetter = rp.weather_signature({"daily": [{"rain_mm": 25.0, "tmax_c": 30.0}]})
+    assert rp.classify(now - timedelta(hours=2), sig, now=now, current_signature=wetter) == "stale"
+    assert rp.classify(now - timedelta(seconds=rp.FRESH_S + 60), sig, now=now) == "stale"
+    assert rp.classify(now - timedelta(seconds=rp.MAX_STALE_S + 60), sig, now=now) == "expired"
+
+
+def test_job_dedupes_keys_and_skips_fresh_rows(monkeypatch):
+    computed = []
+    fresh_cell, _, _ = rp.cell_key(20.0, 75.0)
+
+    def fake_load(cell, season, rotation):
+        if cell == fresh_cell:
+            return {"recommendations": [{"crop": "Wheat", "probability": 0.5}],
+                    "weather_signature": None, "computed_at": rp._utcnow()}
+        return None
+
+    async def fake_compute(lat, lon, rot=None):
+        computed.append((lat, lon, rp.rotation_key(rot)))
+        return []
+
+    monkeypatch.setattr(rp, "load", fake_load)
+    monkeypatch.setattr(rp, "compute_and_store", fake_compute)
+
+    targets = [
+        (18.5201, 73.8201, ["rice"]),
+        (18.5204, 73.8299, ["Rice"]),       # same cell and rotation
+        (18.5201, 73.8201, ["wheat"]),
+        (20.0, 75.0, []),                   # already fresh in the table
+    ]
+    rep = asyncio.run(precompute_recos.precompute(targets, concurrency=2))
+    assert rep.keys == 3 and rep.fresh == 1 and rep.computed == 2
+    assert sorted(r for _, _, r in computed) == ["rice", "wheat"]
+
+
+def test_revalidation_after_a_weather_change_skips_the_semantic_tier(monkeypatch):
+    from backend.app.services import crop_recommendation as cr
+    from backend.app.services import gemini
+    from backend.app.services.llm_cache import LLMCache
+
+    dry = {"current": {}, "daily": [{"rain_mm": 0.0, "tmax_c": 30.0}]}
+    wet = {"current": {}, "daily": [{"rain_mm": 60.0, "tmax_c": 30.0}]}
+    weather = [dry]
+    replies = iter([
+        '[{"crop":"millet","probability":0.8},{"crop":"sorghum","probability":0.6},{"crop":"gram","probability":0.4}]',
+        '[{"crop":"rice","probability":0.8},{"crop":"jute","probability":0.6},{"crop":"taro","probability":0.4}]',
+    ])
+    saved = []
+
+    async def fake_agenerate(prompt, *, model=None, generation_config=None, timeout=45.0, purpose="default"):
+        return next(replies)
+
+    async def no_soil(lat, lon):
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(gemini, "agenerate", fake_agenerate)
+    monkeypatch.setattr(cr, "LLM_CACHE", LLMCache(semantic_endpoints=["recos"]))
+    monkeypatch.setattr(cr, "get_weather", lambda lat, lon: weather[0])
+    monkeypatch.setattr(cr, "weather_to_resp", lambda w: w)
+    monkeypatch.setattr(cr, "get_soil_async", no_soil)
+    monkeypatch.setattr(rp, "save", lambda *a, **kw: saved.append(kw))
+
+    _, c_lat, c_lon = rp.cell_key(18.52, 73.85)
+    live, _ = asyncio.run(cr.arecommend_with_inputs(lat=c_lat, lon=c_lon, rotation_history=[]))
+    assert live[0]["crop"] == "millet"       # today's dry-weather answer now sits in the semantic tier
+
+    weather[0] = wet                         # the row went stale because the forecast changed
+    recos = asyncio.run(rp.compute_and_store(18.52, 73.85))
+    assert recos[0]["crop"] == "rice"
+    assert saved[-1]["weather_signature"] == rp.weather_signature(wet)
+    assert saved[-1]["recommendations"] == recos
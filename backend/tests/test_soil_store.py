@@ -0,0 +1,147 @@
+# backend/tests/test_soil_store.py
+import asyncio
+
+import pytest
+
+from backend.app.services import soil as soil_mod
+from backend.app.services.soil_store import SoilStore, cell_of, set_store
+
+
+def _payload(ph=6.8):
+    return {
+        "geometry": {"coordinates": [88.36, 22.57]},
+        "properties": {"layers": [
+            {"name": "phh2o", "unit_measure": {"d_factor": 1}, "depths": [{"label": "0-5cm", "values": {"mean": ph}}]},
+        ]},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SoilStore(str(tmp_path / "soil.sqlite3"))
+    set_store(s)
+    soil_mod._BUNDLES.clear()
+    yield s
+    set_store(None)
+
+
+def test_store_roundtrip_and_negative_cells(store):
+    store.put(22.57, 88.36, _payload())
+    store.put(22.60, 88.40, None)
+
+    pos = store.lookup(22.5701, 88.3601)      # same 250 m cell
+    assert pos is not None and pos.has_data
+    assert pos.payload()["properties"]["layers"][0]["name"] == "phh2o"
+
+    neg = store.lookup(22.60, 88.40)
+    assert neg is not None and not neg.has_data and neg.payload() is None
+    assert store.lookup(10.0, 10.0) is None
+
+
+def test_store_is_shared_through_the_file(store, tmp_path):
+    store.put(22.57, 88.36, _payload())
+    other = SoilStore(store.path)              # e.g. another uvicorn worker
+    assert other.lookup(22.57, 88.36).has_data
+
+
+def test_negative_cells_expire(tmp_path):
+    s = SoilStore(str(tmp_path / "soil.sqlite3"), negative_ttl_s=0.0)
+    s.put(22.60, 88.40, None)
+    assert s.lookup(22.60, 88.40) is None
+
+
+def test_resolve_soil_hits_store_without_upstream(store, monkeypatch):
+    store.put(22.57, 88.36, _payload(ph=6.1))
+
+    async def boom(client, lat, lon):
+        raise AssertionError("upstream should not be called")
+    monkeypatch.setattr(soil_mod, "_soilgrids_get", boom)
+
+    r = soil_mod.resolve_soil(22.57, 88.36)
+    assert r.bundle.topsoil.ph_h2o == 6.1
+    assert isinstance(r.bundle.layers, tuple)
+    assert r.resolved_distance_m == 0.0
+
+
+def test_resilient_fetcher_returns_independent_copies(store, monkeypatch):
+    calls = []
+    async def fetch(client, lat, lon):
+        calls.append((lat, lon))
+        return _payload()
+    monkeypatch.setattr(soil_mod, "_soilgrids_get", fetch)
+
+    a = soil_mod.resilient_soil_fetcher(22.57, 88.36)
+    a.pop("_resolved_lat")
+    b = soil_mod.resilient_soil_fetcher(22.57, 88.36)
+    assert "_resolved_lat" in b
+    assert a is not b
+    assert len(calls) == 1
+    assert store.lookup(22.57, 88.36).cell == cell_of(22.57, 88.36)
+
+
+def test_coverage_plan_skips_nulls_and_stops_at_known_data(store):
+    from backend.app.services.soil_store import CoverageIndex
+
+    c0 = cell_of(22.57, 88.36)
+    # known-empty ring right next to the point, known data two cells north
+    for dx in (-1, 0, 1):
+        store.put_cell((c0[0] + 1, c0[1] + dx), None)
+    store.put_cell((c0[0] + 2, c0[1]), _payload())
+
+    plan = CoverageIndex(store).plan(22.57, 88.36, 3, exclude={c0})
+    assert plan.nearest_known == (c0[0] + 2, c0[1])
+    assert plan.skipped_null == 3
+    # only cells strictly closer than the known-good one are worth a call
+    assert all(c not in plan.to_probe for c in [(c0[0] + 1, c0[1] + dx) for dx in (-1, 0, 1)])
+    assert len(plan.to_probe) < 12
+
+
+def test_ring_probe_served_from_store_counts_no_calls(store, monkeypatch):
+    c0 = cell_of(22.57, 88.36)
+    store.put_cell(c0, None)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if (dy, dx) != (0, 0):
+                store.put_cell((c0[0] + dy, c0[1] + dx), _payload(ph=5.5) if (dy, dx) == (0, 1) else None)
+
+    async def boom(client, lat, lon):
+        raise AssertionError("upstream should not be called")
+    monkeypatch.setattr(soil_mod, "_soilgrids_get", boom)
+
+    r = soil_mod.resolve_soil(22.57, 88.36)
+    assert r.bundle.topsoil.ph_h2o == 5.5
+    assert r.probe_count == 0
+
+
+def test_get_soil_async_runs_on_caller_loop(store, monkeypatch):
+    async def fetch(client, lat, lon):
+        return _payload(ph=7.2)
+    monkeypatch.setattr(soil_mod, "_soilgrids_get", fetch)
+
+    r = asyncio.run(soil_mod.get_soil_async(22.57, 88.36))
+    assert r.bundle.topsoil.ph_h2o == 7.2
+    assert r.probe_count == 1
+
+    async def nested():
+        return soil_mod.resolve_soil(22.57, 88.36)
+    with pytest.raises(RuntimeError):
+        asyncio.run(nested())
+
+
+def test_timeout_cancels_in_flight_probes(store, monkeypatch):
+    cancelled = []
+    async def hang(client, lat, lon):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append((lat, lon))
+            raise
+    monkeypatch.setattr(soil_mod, "_soilgrids_get", hang)
+
+    async def run():
+        await asyncio.wait_for(soil_mod.get_soil_async(22.57, 88.36), timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert cancelled
+    # nothing half-fetched is recorded
+    assert store.lookup(22.57, 88.36) is None
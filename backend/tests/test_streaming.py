@@ -0,0 +1,102 @@
+# backend/tests/test_streaming.py
+import asyncio
+import json
+
+from backend.app.services.streaming import (
+    StreamStats,
+    emit_progress,
+    gemini_text_deltas,
+    stream_answer,
+    timed_step,
+)
+
+
+def _events(chunks):
+    out = []
+    for c in chunks:
+        if c.startswith(":"):
+            continue
+        head, data = c.strip().split("\n")
+        out.append((head[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+async def _collect(agen):
+    return [c async for c in agen]
+
+
+def test_progress_then_tokens_then_done():
+    async def prepare():
+        async def tool(name, delay):
+            async with timed_step(name):
+                await asyncio.sleep(delay)
+        async def threaded():
+            await asyncio.to_thread(emit_progress, "market", "done")
+        await asyncio.gather(tool("weather", 0.01), tool("soil", 0.0), threaded())
+        return "PROMPT"
+
+    async def tokens(prompt):
+        assert prompt == "PROMPT"
+        for t in ["Ir", "rigate ", "today"]:
+            yield t
+
+    events = _events(asyncio.run(_collect(stream_answer("t1", prepare, tokens))))
+    kinds = [k for k, _ in events]
+    assert kinds[0] == "start" and kinds[-1] == "done"
+    assert {d["step"] for k, d in events if k == "progress"} == {"weather", "soil", "market"}
+    assert max(i for i, k in enumerate(kinds) if k == "progress") < kinds.index("token")
+    assert "".join(d["text"] for k, d in events if k == "token") == "Irrigate today"
+    done = events[-1][1]
+    assert done["chars"] == len("Irrigate today") and done["first_token_ms"] is not None
+
+
+def test_direct_answer_meta_and_errors():
+    async def direct():
+        return {"answer": "Use neem oil.", "meta": {"sources": []}}
+
+    async def never(_):
+        raise AssertionError("LLM must not be called")
+        yield
+
+    events = _events(asyncio.run(_collect(stream_answer("t2", direct, never))))
+    assert [k for k, _ in events] == ["start", "meta", "token", "done"]
+
+    async def broken():
+        async with timed_step("rag"):
+            raise RuntimeError("index offline")
+
+    events = _events(asyncio.run(_collect(stream_answer("t2", broken, never))))
+    assert [k for k, _ in events] == ["start", "progress", "error"]
+    assert events[1][1]["status"] == "error" and events[2][1]["detail"] == "index offline"
+
+
+def test_emit_progress_without_stream_is_noop():
+    emit_progress("weather")        # no sink: must not raise
+
+
+def test_gemini_sse_parsing():
+    lines = [
+        'data: {"candidates":[{"content":{"parts":[{"text":"Hel"}]}}]}',
+        "",
+        'data: {"candidates":[{"content":{"parts":[{"text":"lo"}]},"finishReason":"STOP"}]}',
+        'data: {"usageMetadata":{"totalTokenCount":5}}',
+    ]
+
+    async def gen():
+        for line in lines:
+            yield line
+
+    async def run():
+        return [t async for t in gemini_text_deltas(gen())]
+
+    assert asyncio.run(run()) == ["Hel", "lo"]
+
+
+def test_stream_stats_percentiles():
+    st = StreamStats(window=10)
+    for ms in range(1, 11):
+        st.record("ai", first_token_ms=float(ms), total_ms=100.0, error=False)
+    st.record("ai", first_token_ms=None, total_ms=5.0, error=True)
+    snap = st.snapshot()["ai"]
+    assert snap["streams"] == 11 and snap["errors"] == 1
+    assert snap["first_token_ms_p50"] == 6.0
@@ -0,0 +1,142 @@
+# backend/tests/test_structured.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("backend.app.config")
+
+from backend.app.services import gemini, structured  # noqa: E402
+from backend.app.services.structured import PartialJSON, StructuredOutputError, parse_partial  # noqa: E402
+
+
+def test_strict_json_is_not_a_repair():
+    assert parse_partial('[{"crop":"rice","probability":0.7}]') == ([{"crop": "rice", "probability": 0.7}], False)
+
+
+def test_fences_prose_and_trailing_commas_are_fixed_locally():
+    text = 'Sure! Here you go:\n```json\n[{"crop": "wheat", "probability": 0.8,}, {"crop": "gram", "probability": 0.5},]\n```'
+    val, repaired = parse_partial(text)
+    assert repaired and val == [{"crop": "wheat", "probability": 0.8}, {"crop": "gram", "probability": 0.5}]
+
+
+def test_truncated_array_keeps_complete_items_only():
+    val, repaired = parse_partial('[{"crop":"rice","probability":0.7},{"crop":"whe')
+    assert repaired and val == [{"crop": "rice", "probability": 0.7}]
+
+
+def test_truncated_object_closes_or_drops_the_last_member():
+    assert parse_partial('{"success": true, "diseases": ["blight", "rust"]')[0] == {
+        "success": True, "diseases": ["blight", "rust"]}
+    assert parse_partial('{"success": true, "symptoms": ["yellow le')[0] == {"success": True}
+    assert parse_partial('{"note": "line one\nline two"}')[0] == {"note": "line one\nline two"}
+
+
+def test_incremental_feed_matches_whole_text():
+    text = '[{"crop":"maize","probability":0.6},{"crop":"cotton","probability":0.4}]'
+    p = PartialJSON()
+    for i in range(0, len(text), 7):
+        p.feed(text[i:i + 7])
+    assert p.done and p.value() == (parse_partial(text)[0], False)
+
+    with pytest.raises(StructuredOutputError):
+        parse_partial("no json here")
+
+
+def test_one_call_no_repair_round_trip_and_metrics(monkeypatch):
+    calls = []
+
+    async def fake_agenerate(prompt, *, model=None, generation_config=None, timeout=45.0, purpose="default"):
+        calls.append(generation_config)
+        return '[{"crop":"rice","probability":0.7},{"crop":"wheat","probability":0.6},{"crop":"mus'
+
+    monkeypatch.setattr(gemini, "agenerate", fake_agenerate)
+    before = structured.structured_stats()["purposes"].get("t_recos", {}).get("repaired", 0)
+    val = asyncio.run(structured.agenerate_json("q", schema={"type": "ARRAY"}, expect=list, purpose="t_recos"))
+    assert [v["crop"] for v in val] == ["rice", "wheat"]
+    assert len(calls) == 1 and calls[0]["responseMimeType"] == "application/json"
+    assert structured.structured_stats()["purposes"]["t_recos"]["repaired"] == before + 1
+
+
+def test_schema_rejection_falls_back_once(monkeypatch):
+    calls = []
+
+    async def fake_agenerate(prompt, *, model=None, generation_config=None, timeout=45.0, purpose="default"):
+        calls.append(generation_config or {})
+        if "responseSchema" in (generation_config or {}):
+            raise gemini.GeminiError('Gemini HTTP 400: Unknown name "responseSchema"', 400)
+        return '{"ok": true}'
+
+    monkeypatch.setattr(gemini, "agenerate", fake_agenerate)
+    monkeypatch.setattr(structured, "_schema_supported", True)
+    assert asyncio.run(structured.agenerate_json("q", schema={"type": "OBJECT"}, expect=dict)) == {"ok": True}
+    assert asyncio.run(structured.agenerate_json("q", schema={"type": "OBJECT"}, expect=dict)) == {"ok": True}
+    assert len(calls) == 3 and "responseSchema" not in calls[2]
+
+
+def test_accept_skips_prose_brackets_and_rejects_short_lists():
+    def three_crops(v):
+        return sum(isinstance(x, dict) and bool(x.get("crop")) for x in v) >= 3
+
+    rows = '[{"crop":"rice","probability":0.7},{"crop":"wheat","probability":0.6},{"crop":"gram","probability":0.4}]'
+    val, repaired = parse_partial(f"Top [3] picks: {rows}", lambda v: isinstance(v, list) and three_crops(v))
+    assert repaired and [r["crop"] for r in val] == ["rice", "wheat", "gram"]
+
+    with pytest.raises(StructuredOutputError):
+        structured.parse_reply('[{"crop":"rice","probability":0.7},{"crop":"whe', expect=list,
+                               accept=three_crops, purpose="t_short")
+    assert structured.structured_stats()["purposes"]["t_short"]["failed"] >= 1
+
+
+def test_truncated_recos_fail_and_are_not_cached(monkeypatch):
+    from backend.app.services import crop_recommendation as cr
+
+    calls = []
+
+    async def fake_agenerate(prompt, *, model=None, generation_config=None, timeout=45.0, purpose="default"):
+        calls.append(prompt)
+        return '[{"crop":"rice","probability":0.7},{"crop":"whe'
+
+    def no_weather(lat, lon):
+        raise RuntimeError("offline")
+
+    async def no_soil(lat, lon):
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(gemini, "agenerate", fake_agenerate)
+    monkeypatch.setattr(cr, "get_weather", no_weather)
+    monkeypatch.setattr(cr, "get_soil_async", no_soil)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="LLM parse failed"):
+            asyncio.run(cr.arecommend_top3_crops(lat=12.3, lon=76.6))
+    assert len(calls) == 2      # the failed answer was neither padded nor cached
+
+
+def test_truncated_diagnosis_is_rejected_not_served_or_templated(monkeypatch, tmp_path):
+    from backend.app.services.vision import crop_disease_llm as cdl
+    from backend.app.services.vision import diagnosis_templates as dt
+
+    truncated = ('{"success": true, "diseases": ["Leaf Blight"], "disease_probabilities": [0.8], '
+                 '"symptoms": ["brown spots", "yell')
+
+    async def fake_agenerate(prompt, *, model=None, generation_config=None, timeout=45.0, purpose="default"):
+        return truncated
+
+    def fake_generate(prompt, *, model=None, generation_config=None, timeout=45.0, purpose="default"):
+        return '{"symptoms": ["brown spots"], "Treatments": ["copper spr'
+
+    monkeypatch.setattr(gemini, "agenerate", fake_agenerate)
+    monkeypatch.setattr(gemini, "generate", fake_generate)
+
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(cdl.acall_gemini_json("q", schema=cdl.DIAGNOSIS_SCHEMA))
+
+    full = {"success": True, "diseases": ["Leaf Blight"], "disease_probabilities": [0.8],
+            "symptoms": ["brown spots"], "Treatments": ["copper spray"], "prevention_tips": []}
+    assert cdl.is_complete_diagnosis(full)
+    assert not cdl.is_complete_diagnosis({**full, "disease_probabilities": [0.8, 0.1]})
+
+    path = tmp_path / "templates.json"
+    report = dt.generate(["Leaf Blight"], ["en"], path=str(path))
+    assert report["written"] == 0 and len(report["failed"]) == 1
+    assert dt.TemplateStore(str(path)).get("Leaf Blight") is None
@@ -0,0 +1,75 @@
+# backend/tests/test_vision_batcher.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.app.services.vision.batcher import BatcherOverloaded, MicroBatcher
+
+
+def test_burst_is_served_in_batches_and_results_stay_in_order():
+    sizes = []
+    def run(items):
+        sizes.append(len(items))
+        time.sleep(0.01)
+        return [x * 10 for x in items]
+
+    b = MicroBatcher(run, max_batch=4, max_wait_ms=50)
+    futs = [b.submit(i) for i in range(10)]
+    assert [f.result(timeout=2) for f in futs] == [i * 10 for i in range(10)]
+    assert max(sizes) == 4
+    assert sum(sizes) == 10
+
+    st = b.stats()
+    assert st["items"] == 10
+    assert sum(k * v for k, v in st["batch_size_hist"].items()) == 10
+    assert st["max_queue_depth"] >= 4
+    b.stop()
+
+
+def test_batch_failure_reaches_every_caller():
+    def run(items):
+        raise ValueError("boom")
+
+    b = MicroBatcher(run, max_batch=8, max_wait_ms=20)
+    futs = [b.submit(i) for i in range(3)]
+    for f in futs:
+        with pytest.raises(ValueError):
+            f.result(timeout=2)
+    b.stop()
+
+
+def test_full_queue_is_rejected():
+    gate = threading.Event()
+    def run(items):
+        gate.wait(2)
+        return items
+
+    b = MicroBatcher(run, max_batch=1, max_wait_ms=0, queue_max=2)
+    first = b.submit("a")
+    time.sleep(0.05)            # worker is now blocked inside run()
+    b.submit("b")
+    b.submit("c")
+    with pytest.raises(BatcherOverloaded):
+        b.submit("d")
+    gate.set()
+    assert first.result(timeout=2) == "a"
+    assert b.stats()["rejected"] == 1
+    b.stop()
+
+
+def test_async_callers_share_a_forward_pass():
+    sizes = []
+    def run(items):
+        sizes.append(len(items))
+        return [x + 1 for x in items]
+
+    b = MicroBatcher(run, max_batch=16, max_wait_ms=30)
+
+    async def main():
+        return await asyncio.gather(*(b.infer(i) for i in range(6)))
+
+    assert asyncio.run(main()) == [1, 2, 3, 4, 5, 6]
+    assert sizes == [6]
+    b.stop()
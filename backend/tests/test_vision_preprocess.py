@@ -0,0 +1,53 @@
+# backend/tests/test_vision_preprocess.py
+import io
+
+import numpy as np
+from PIL import Image
+
+from backend.app.services.vision.preprocess import decode_image, pixel_values
+
+META = {
+    "height": 32,
+    "width": 32,
+    "resample": 2,
+    "rescale_factor": 1 / 255,
+    "image_mean": [0.5, 0.4, 0.3],
+    "image_std": [0.2, 0.25, 0.3],
+}
+
+
+def _jpeg(w, h):
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 255, size=(h, w, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def test_pixel_values_match_processor_formula():
+    rng = np.random.default_rng(1)
+    imgs = [Image.fromarray(rng.integers(0, 255, size=(50, 40, 3), dtype=np.uint8)) for _ in range(3)]
+    x = pixel_values(imgs, META)
+    assert x.shape == (3, 3, 32, 32)
+    assert x.dtype == np.float32 and x.flags["C_CONTIGUOUS"]
+
+    ref = np.asarray(imgs[1].resize((32, 32), 2), dtype=np.float32) / 255.0
+    ref = ((ref - np.array(META["image_mean"])) / np.array(META["image_std"])).transpose(2, 0, 1)
+    np.testing.assert_allclose(x[1], ref, rtol=1e-5, atol=1e-5)
+
+
+def test_large_jpeg_is_draft_decoded_but_never_below_model_size():
+    data = _jpeg(2400, 1600)
+    small = decode_image(data, (224, 224))
+    assert small.mode == "RGB"
+    assert small.size[0] < 2400 and min(small.size) >= 224
+
+    full = decode_image(data, (224, 224), draft=False)
+    assert full.size == (2400, 1600)
+
+
+def test_png_bytes_decode_unchanged():
+    buf = io.BytesIO()
+    Image.new("RGBA", (300, 200), (10, 200, 30, 255)).save(buf, format="PNG")
+    im = decode_image(buf.getvalue(), (224, 224))
+    assert im.size == (300, 200) and im.mode == "RGB"
@@ -0,0 +1,38 @@
+# backend/tests/test_vit_onnx.py
+import numpy as np
+from PIL import Image
+
+from backend.app.services.vision.vit_onnx import OnnxVit
+
+META = {
+    "id2label": {"0": "Healthy", "1": "Rust", "2": "Blight"},
+    "height": 32,
+    "width": 32,
+    "resample": 2,
+    "rescale_factor": 1 / 255,
+    "image_mean": [0.5, 0.5, 0.5],
+    "image_std": [0.5, 0.5, 0.5],
+}
+
+
+class _FakeSession:
+    class _In:
+        name = "pixel_values"
+
+    def get_inputs(self):
+        return [self._In()]
+
+    def run(self, outputs, feeds):
+        x = feeds["pixel_values"]
+        # brighter images score as "Healthy"
+        m = x.mean(axis=(1, 2, 3))
+        return [np.stack([m * 4, np.zeros_like(m), -m * 4], axis=1)]
+
+
+def test_onnx_vit_returns_probabilities_per_image():
+    vit = OnnxVit(_FakeSession(), META)
+    p = vit.probs([Image.new("RGB", (8, 8), (250, 250, 250)), Image.new("RGB", (8, 8), (5, 5, 5))])
+    assert p.shape == (2, 3)
+    np.testing.assert_allclose(p.sum(axis=1), 1.0, rtol=1e-6)
+    assert vit.id2label[int(np.argmax(p[0]))] == "Healthy"
+    assert vit.id2label[int(np.argmax(p[1]))] == "Blight"
@@ -0,0 +1,79 @@
+# backend/tests/test_weather_cache.py
+import threading
+import time
+
+from backend.app.services.weather_cache import WeatherCache, next_expiry, snap_to_cell
+
+
+class FakeClock:
+    def __init__(self, t: float):
+        self.t = t
+    def __call__(self) -> float:
+        return self.t
+
+
+def _cache(loader, clock, **kw):
+    return WeatherCache(loader, dumps=lambda b: str(b), loads=lambda s: eval(s), clock=clock, **kw)
+
+
+def test_nearby_farms_share_one_cell():
+    calls = []
+    def loader(lat, lon):
+        calls.append((lat, lon))
+        return {"lat": lat, "lon": lon}
+
+    c = _cache(loader, FakeClock(1_000_000.0), grid_deg=0.1)
+    a = c.get(22.571, 88.361)
+    b = c.get(22.574, 88.358)   # a few hundred metres away
+    assert a is b
+    assert calls == [(22.6, 88.4)]
+    assert snap_to_cell(22.571, 88.361, 0.1) == (226, 884)
+
+
+def test_entries_expire_after_next_hourly_update():
+    clock = FakeClock(3600.0 * 10 + 120)  # 10:02
+    n = {"calls": 0}
+    def loader(lat, lon):
+        n["calls"] += 1
+        return n["calls"]
+
+    c = _cache(loader, clock, grid_deg=0.1)
+    assert c.get(22.5, 88.3) == 1
+    clock.t = next_expiry(3600.0 * 10 + 120) - 1
+    assert c.get(22.5, 88.3) == 1
+    clock.t += 2
+    assert c.get(22.5, 88.3) == 2
+
+
+def test_concurrent_misses_are_coalesced():
+    gate = threading.Event()
+    n = {"calls": 0}
+    def loader(lat, lon):
+        n["calls"] += 1
+        gate.wait(2)
+        return "wx"
+
+    c = _cache(loader, FakeClock(1_000_000.0), grid_deg=0.1)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(c.get(22.5, 88.3))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert out == ["wx"] * 5
+    assert n["calls"] == 1
+
+
+def test_disk_tier_survives_new_process_cache(tmp_path):
+    db = str(tmp_path / "wx.sqlite3")
+    clock = FakeClock(1_000_000.0)
+    c1 = _cache(lambda lat, lon: {"v": 1}, clock, grid_deg=0.1, disk_path=db)
+    c1.get(22.5, 88.3)
+
+    def boom(lat, lon):
+        raise AssertionError("should be served from disk")
+    c2 = _cache(boom, clock, grid_deg=0.1, disk_path=db)
+    assert c2.get(22.5, 88.3) == {"v": 1}
+    assert c2.stats()["disk_hits"] == 1